@@ -1,39 +1,120 @@
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 from openpyxl import load_workbook
 from openpyxl.styles import Alignment
+from openpyxl.utils import column_index_from_string
 
-from AssignmentProgram.Rule import ClientZipcodeInAPServiceAreaRule, RuleProcessing, \
+from AssignmentProgram.Rule import ClientZipcodeInAPServiceAreaRule, RulePipeline, \
     CurrentACCSclientAPorganizationRule, \
     SetACCSRule, FailedAssignmentRule, CurrentPCPClientAPOrganizationRule, FormerCBFSWithoutTransitionACCSRule, \
     ClientOfBehavioralServiceAPRule, ClientOfLTSSatAPRule, ClientNoPriorHistoryZipcodeCapacityMatchRule
 from AssignmentProgram.Capacity import Capacity, CapacityManager
-from AssignmentProgram.Member import Member, Affiliate
+from AssignmentProgram.Member import Member, Affiliate, MemberManager, SERVICE_ACCS, SERVICE_PCP, SERVICE_CBFS, \
+    SERVICE_PACT, SERVICE_RESPITE_OR_CSS, SERVICE_OUT_PATIENT, SERVICE_DAY_TREATMENT, SERVICE_CSP, \
+    SERVICE_EMERGENCY_SVS, SERVICE_LTSS
 from AssignmentProgram.Zipcode import Zipcode, ZipcodeManager
+from AssignmentProgram.InputAdapters import get_input_adapter, PRIORITY_MARKER
+from AssignmentProgram.OutputSinks import AssignmentRecord, get_output_sink
+import atexit
 import logging
-from logging.config import dictConfig
-
-logging_config = dict(
-    version=1,
-    formatters={
-        'f': {'format':
-              '%(asctime)s %(name)-12s %(levelname)-8s %(message)s'}
-        },
-    handlers={
-        'h': {'class': 'logging.StreamHandler',
-              'formatter': 'f',
-              'level': logging.DEBUG}
-        },
-    root={
-        'handlers': ['h'],
-        'level': logging.DEBUG,
-        },
-)
-
-dictConfig(logging_config)
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
 logger = logging.getLogger()
-handler = logging.FileHandler('assignment_program.log')
-logger.addHandler(handler)
+
+
+def configure_logging(level=logging.INFO, log_file_location='assignment_program.log'):
+    """
+    Configure the root logger to write to the console and to a log file.  Records are handed to a QueueListener thread
+    so the console and disk writes do not block the assignment processing.  Records below the level are discarded
+    before their message is formatted.
+    :param level: Integer or String such as "DEBUG" or "INFO"
+    :param log_file_location: String
+    :return: QueueListener
+    """
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            raise ValueError("Error: Unknown logging level: {0}".format(level))
+    formatter = logging.Formatter('%(asctime)s %(name)-12s %(levelname)-8s %(message)s')
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    file_handler = logging.FileHandler(log_file_location)
+    file_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, stream_handler, file_handler)
+    logger.setLevel(level)
+    logger.addHandler(QueueHandler(log_queue))
+    listener.start()
+    # Stopping the listener drains the queue so the last records are not lost when the program exits.
+    atexit.register(listener.stop)
+    return listener
+
+
+# Increment when a change to the parsers alters the objects they produce, so cached objects are not reused.
+PARSER_VERSION = 1
+
+MEMBER_ATTRIBUTES = {
+    "medicaid_id": "A",
+    "member_last_name": "B",
+    "member_first_name": "C",
+    "member_middle_initial": "D",
+    "member_date_of_birth": "F",
+    "residential_address_zipcode_1": "W",
+    "identification_flag": "AT",
+    "affiliate": "AX",
+    "accs": "AY",
+    "pcp": "AZ",
+    "cbfs": "BA",
+    "pact": "BB",
+    "respite_or_ccs": "BC",
+    "out_patient": "BD",
+    "day_treatment": "BE",
+    "csp": "BF",
+    "emergency_svs": "BG",
+    "ltts": "BH",
+    "assigned_to": "BI"
+}
+
+ZIPCODE_BASE_ATTRIBUTES = {
+    "city_town": "A",
+    "zipcode": "B"
+}
+
+ZIPCODE_AP_ATTRIBUTES = {
+    "lynn": "C",
+    "nsmha": "D",
+    "edinburg": "E",
+    "riverside": "F",
+    "uphams": "G",
+    "dimock": "H",
+    "brookline": "I"
+}
+
+CAPACITY_ATTRIBUTES = {
+    "affiliate": "A",
+    "capacity": "B"
+}
+
+MEMBER_SERVICE_FLAGS = {
+    "accs": SERVICE_ACCS,
+    "pcp": SERVICE_PCP,
+    "cbfs": SERVICE_CBFS,
+    "pact": SERVICE_PACT,
+    "respite_or_ccs": SERVICE_RESPITE_OR_CSS,
+    "out_patient": SERVICE_OUT_PATIENT,
+    "day_treatment": SERVICE_DAY_TREATMENT,
+    "csp": SERVICE_CSP,
+    "emergency_svs": SERVICE_EMERGENCY_SVS,
+    "ltts": SERVICE_LTSS
+}
+
+# The respite/CCS and LTSS columns used to be parsed into is_respite_or_ccs and is_ltts, which no rule reads, so the
+# flags of those columns are not kept during ingest to leave the assignments unchanged by the bitmask representation.
+IGNORED_SERVICE_FLAGS = SERVICE_RESPITE_OR_CSS | SERVICE_LTSS
 
 
 def load_excel_workbook(workbook_location):
@@ -42,6 +123,27 @@ def load_excel_workbook(workbook_location):
     return load_workbook(workbook_location).active
 
 
+def get_column_indexes(column_attributes):
+    """
+    Resolve a mapping of attribute names to Excel column letters into a mapping of attribute names to zero based
+    indexes usable against the row tuples produced by an InputAdapter.
+    :param column_attributes: Dict
+    :return: Dict
+    """
+    return {attribute: column_index_from_string(column) - 1 for attribute, column in column_attributes.items()}
+
+
+def load_masshealth_workbook(workbook_location):
+    """
+    Load the MassHealth workbook once for both ingest and writeback, see process_sheet_members and update_member_rows.
+    :param workbook_location: String
+    :return: Workbook
+    """
+    if not os.path.exists(workbook_location):
+        raise FileNotFoundError("Error: Unable to locate file: {0}".format(workbook_location))
+    return load_workbook(workbook_location)
+
+
 def parse_capacity_excel():
     # Temporary way to obscure name of file being read in for privacy concerns.
     # This simple text file should only contain a single line with the full path to the Excel spreadsheet.
@@ -54,10 +156,12 @@ def member_exists(all_members, new_member):
     """
     Look through all parsed members and return True when an identicle member is found based on their last, first name,
     middle initial, date of birth, and medicaid ID.
-    :param all_members:
+    :param all_members: List or MemberManager
     :param new_member:
     :return: Boolean
     """
+    if isinstance(all_members, MemberManager):
+        return all_members.contains_member(new_member)
     for member in all_members:
         if member.medicaid_id == new_member.medicaid_id \
                 and member.last_name == new_member.last_name \
@@ -72,10 +176,12 @@ def member_has_different_medicaid_id(all_members, new_member):
     """
     Look through all members and find matching member criteria such as name and date of birth but the medicaid ID is
     different.
-    :param all_members:
+    :param all_members: List or MemberManager
     :param new_member:
     :return: List
     """
+    if isinstance(all_members, MemberManager):
+        return all_members.get_members_with_different_medicaid_id(new_member)
     members_different_id = []
     for member in all_members:
         if member.last_name == new_member.last_name \
@@ -90,10 +196,12 @@ def member_has_different_medicaid_id(all_members, new_member):
 def get_existing_member(all_members, new_member):
     """
     Look through all members and return the member object if it exists.
-    :param all_members:
+    :param all_members: List or MemberManager
     :param new_member:
     :return: Member
     """
+    if isinstance(all_members, MemberManager):
+        return all_members.get_member(new_member)
     for member in all_members:
         if member.medicaid_id == new_member.medicaid_id \
                 and member.last_name == new_member.last_name \
@@ -121,6 +229,22 @@ def get_record(row, column, active_sheet):
         return val
 
 
+def get_row_record(row_values, index):
+    """
+    Helper function for extracting a record from a row tuple.  Values are normalized the same way as get_record.
+    :param row_values: Tuple
+    :param index: Integer
+    :return:
+    """
+    if index < len(row_values):
+        val = row_values[index]
+        if val:
+            if not isinstance(val, int):
+                val = val.strip().lower()
+            return val
+    return None
+
+
 def get_record_cell(row, column, active_sheet):
     """
     Helper function for extracting a record from an excel sheet.
@@ -185,16 +309,7 @@ def is_affiliate_empty(affiliate_obj):
     :return: Boolean
     """
     if affiliate_obj.affiliate_name is None \
-            and affiliate_obj.is_accs is False \
-            and affiliate_obj.is_pcp is False \
-            and affiliate_obj.is_cbfs is False \
-            and affiliate_obj.is_pact is False \
-            and affiliate_obj.is_respite_or_css is False \
-            and affiliate_obj.is_out_patient is False \
-            and affiliate_obj.is_day_treatment is False \
-            and affiliate_obj.is_csp is False \
-            and affiliate_obj.is_emergency_svs is False \
-            and affiliate_obj.is_ltss is False \
+            and affiliate_obj.service_flags == 0 \
             and affiliate_obj.assigned_to is None:
         return True
     return False
@@ -234,8 +349,8 @@ def is_capacity_empty(capacity):
 def update_member_affiliates(all_members, new_member):
     """
     Update the member affiliates with a new member data.
-    :param all_members: List
-    :param new_member: List
+    :param all_members: List or MemberManager
+    :param new_member: Member
     :return: None
     """
     member = get_existing_member(all_members, new_member)
@@ -243,188 +358,382 @@ def update_member_affiliates(all_members, new_member):
         member.add_affiliate(affiliate)
 
 
-def process_members(member_file_location):
+def get_row_flag(row_values, index):
+    """
+    Helper function for extracting a 0/1 service flag from a row tuple.
+    :param row_values: Tuple
+    :param index: Integer
+    :return: Boolean
+    """
+    return bool(int(get_row_record(row_values, index) or 0))
+
+
+def build_member(row_values, column_indexes):
+    """
+    Build a Member with a single Affiliate from the values of one MassHealth workbook row.
+    :param row_values: Tuple
+    :param column_indexes: Dict
+    :return: Member
+    """
+    new_obj_member = Member(get_row_record(row_values, column_indexes['medicaid_id']),
+                            get_row_record(row_values, column_indexes['member_last_name']),
+                            get_row_record(row_values, column_indexes['member_first_name']),
+                            get_row_record(row_values, column_indexes['member_middle_initial']),
+                            get_row_record(row_values, column_indexes['member_date_of_birth']),
+                            get_row_record(row_values, column_indexes['residential_address_zipcode_1']),
+                            get_row_record(row_values, column_indexes['identification_flag']))
+
+    service_flags = 0
+    for service, service_flag in MEMBER_SERVICE_FLAGS.items():
+        if get_row_flag(row_values, column_indexes[service]):
+            service_flags |= service_flag
+
+    new_obj_affiliate = Affiliate(get_row_record(row_values, column_indexes['affiliate']),
+                                  service_flags & ~IGNORED_SERVICE_FLAGS)
+    new_obj_affiliate.assigned_to = get_row_record(row_values, column_indexes['assigned_to'])
+
+    new_obj_member.add_affiliate(new_obj_affiliate)
+    return new_obj_member
+
+
+def iter_row_members(rows, min_row=2, record_source_rows=False):
+    """
+    Yield a Member holding a single Affiliate for every non-empty MassHealth row.  Column letters are resolved to indexes
+    once rather than per cell.
+    :param rows: Iterable of Tuple of the row values starting at min_row
+    :param min_row: Integer
+    :param record_source_rows: Boolean to record the row number every member was parsed from in its source_rows
+    :return: Generator of Member
+    """
+    column_indexes = get_column_indexes(MEMBER_ATTRIBUTES)
+    for row, row_values in enumerate(rows, start=min_row):
+        new_obj_member = build_member(row_values, column_indexes)
+        if not is_empty_member(new_obj_member):
+            if record_source_rows:
+                new_obj_member.source_rows = [row]
+            yield new_obj_member
+
+
+def iter_members(member_file_location, input_format=None):
+    """
+    Stream the MassHealth file one row at a time and yield a Member holding a single Affiliate for every non-empty row.
+    :param member_file_location: String
+    :param input_format: String, detected from the file extension when None
+    :return: Generator of Member
+    """
+    return iter_row_members(get_input_adapter(member_file_location, input_format).iter_rows(member_file_location))
+
+
+def process_members(member_file_location, member_manager=None, input_format=None):
     """
-    Process all member data from an Excel workbook into Member objects.
+    Process all member data from an Excel workbook, CSV or Parquet file into Member objects.
     :param member_file_location: List
+    :param member_manager: MemberManager to merge the members into, a new one is used when not provided
+    :param input_format: String, detected from the file extension when None
     :return: List
     """
-    active_sheet = load_excel_workbook(member_file_location)
-    obj_members = []
+    if member_manager is None:
+        member_manager = MemberManager()
+    for new_obj_member in iter_members(member_file_location, input_format):
+        member_manager.merge_member(new_obj_member)
+    return member_manager.members
 
-    member_attributes = {
-        "medicaid_id": "A",
-        "member_last_name": "B",
-        "member_first_name": "C",
-        "member_middle_initial": "D",
-        "member_date_of_birth": "F",
-        "residential_address_zipcode_1": "W",
-        "identification_flag": "AT",
-        "affiliate": "AX",
-        "accs": "AY",
-        "pcp": "AZ",
-        "cbfs": "BA",
-        "pact": "BB",
-        "respite_or_ccs": "BC",
-        "out_patient": "BD",
-        "day_treatment": "BE",
-        "csp": "BF",
-        "emergency_svs": "BG",
-        "ltts": "BH",
-        "assigned_to": "BI"
-    }
 
-    for row in range(2, active_sheet.max_row + 1):
-        new_obj_member = Member(get_record(row, member_attributes['medicaid_id'], active_sheet),
-                                get_record(row, member_attributes['member_last_name'], active_sheet),
-                                get_record(row, member_attributes['member_first_name'], active_sheet),
-                                get_record(row, member_attributes['member_middle_initial'], active_sheet),
-                                get_record(row, member_attributes['member_date_of_birth'], active_sheet),
-                                get_record(row, member_attributes['residential_address_zipcode_1'], active_sheet),
-                                get_record(row, member_attributes['identification_flag'], active_sheet))
-
-        new_obj_affiliate = Affiliate(get_record(row, member_attributes['affiliate'], active_sheet))
-        new_obj_affiliate.is_accs = bool(int(get_record(row, member_attributes['accs'], active_sheet) or 0))
-        new_obj_affiliate.is_pcp = bool(int(get_record(row, member_attributes['pcp'], active_sheet) or 0))
-
-        new_obj_affiliate.is_cbfs = bool(int(get_record(row, member_attributes['cbfs'], active_sheet) or 0))
-        new_obj_affiliate.is_pact = bool(int(get_record(row, member_attributes['pact'], active_sheet) or 0))
-        new_obj_affiliate.is_respite_or_ccs = bool(
-            int(get_record(row, member_attributes['respite_or_ccs'], active_sheet) or 0))
-        new_obj_affiliate.is_out_patient = bool(
-            int(get_record(row, member_attributes['out_patient'], active_sheet) or 0))
-        new_obj_affiliate.is_day_treatment = bool(
-            int(get_record(row, member_attributes['day_treatment'], active_sheet) or 0))
-        new_obj_affiliate.is_csp = bool(int(get_record(row, member_attributes['csp'], active_sheet) or 0))
-        new_obj_affiliate.is_emergency_svs = bool(
-            int(get_record(row, member_attributes['emergency_svs'], active_sheet) or 0))
-        new_obj_affiliate.is_ltts = bool(int(get_record(row, member_attributes['ltts'], active_sheet) or 0))
-        new_obj_affiliate.assigned_to = get_record(row, member_attributes['assigned_to'], active_sheet)
-
-        new_obj_member.add_affiliate(new_obj_affiliate)
+def process_sheet_members(active_sheet, member_manager=None):
+    """
+    Process all member data from the active sheet of an already loaded MassHealth workbook into Member objects, so the
+    same workbook can be updated with update_member_rows without loading it a second time.
+    :param active_sheet: Worksheet
+    :param member_manager: MemberManager to merge the members into, a new one is used when not provided
+    :return: List
+    """
+    if member_manager is None:
+        member_manager = MemberManager()
+    for new_obj_member in iter_row_members(active_sheet.iter_rows(min_row=2, values_only=True),
+                                           record_source_rows=True):
+        member_manager.merge_member(new_obj_member)
+    return member_manager.members
 
-        if not is_empty_member(new_obj_member):
-            if member_exists(obj_members, new_obj_member):
-                update_member_affiliates(obj_members, new_obj_member)
-            else:
-                obj_members.append(new_obj_member)
-    return obj_members
 
+def get_row_record_and_priority(row_values, index):
+    """
+    Helper function used to get a record from a row tuple along with whether it is marked as the priority AP.  Values
+    are normalized the same way as get_record_and_priority.
+    :param row_values: Tuple
+    :param index: Integer
+    :return: Dict
+    """
+    priority = False
+    val = None
+    if index < len(row_values) and row_values[index]:
+        cell_val = row_values[index]
+        if cell_val.endswith(PRIORITY_MARKER):
+            cell_val = cell_val[:-len(PRIORITY_MARKER)]
+            priority = True
+        # strip out cells with empty strings so they aren't used as a value.
+        if cell_val.strip():
+            val = cell_val.lower()
+    return {"record": [val, priority]}
+
+
+def build_zipcode(row_values, column_indexes, ap_indexes):
+    """
+    Build a Zipcode from the values of one zip code row.
+    :param row_values: Tuple
+    :param column_indexes: Dict
+    :param ap_indexes: Dict
+    :return: Zipcode
+    """
+    new_zipcode_obj = Zipcode(get_row_record(row_values, column_indexes['city_town']),
+                              get_row_record(row_values, column_indexes['zipcode']))
+
+    new_zipcode_obj.ap_lynn = get_row_record_and_priority(row_values, ap_indexes['lynn'])
+    new_zipcode_obj.ap_nsmha = get_row_record_and_priority(row_values, ap_indexes['nsmha'])
+    new_zipcode_obj.ap_edinburg = get_row_record_and_priority(row_values, ap_indexes['edinburg'])
+    new_zipcode_obj.ap_riverside = get_row_record_and_priority(row_values, ap_indexes['riverside'])
+    new_zipcode_obj.ap_uphams = get_row_record_and_priority(row_values, ap_indexes['uphams'])
+    new_zipcode_obj.ap_dimock = get_row_record_and_priority(row_values, ap_indexes['dimock'])
+    new_zipcode_obj.ap_brookline = get_row_record_and_priority(row_values, ap_indexes['brookline'])
+    return new_zipcode_obj
 
-def process_zipcodes(zipcode_file_location):
+
+def process_zipcodes(zipcode_file_location, input_format=None):
     """
-    Process all Zipcode data from an Excel workbook into Zipcode objects.
+    Process all Zipcode data from an Excel workbook, CSV or Parquet file into Zipcode objects.  The priority AP of a
+    zip code is highlighted in yellow in Excel and written with the PRIORITY_MARKER appended in flat files.
     :param zipcode_file_location: List
+    :param input_format: String, detected from the file extension when None
     :return: List
     """
-    active_sheet = load_excel_workbook(zipcode_file_location)
     obj_zipcodes = []
+    column_indexes = get_column_indexes(ZIPCODE_BASE_ATTRIBUTES)
+    ap_indexes = get_column_indexes(ZIPCODE_AP_ATTRIBUTES)
+    input_adapter = get_input_adapter(zipcode_file_location, input_format)
 
-    zipcode_base_params = {
-        "city_town": "A",
-        "zipcode": "B"
-    }
-
-    zipcode_attributes = {
-        "lynn": "C",
-        "nsmha": "D",
-        "edinburg": "E",
-        "riverside": "F",
-        "uphams": "G",
-        "dimock": "H",
-        "brookline": "I"
-    }
-
-    for row in range(2, active_sheet.max_row + 1):
-        new_zipcode_obj = Zipcode(get_record(row, zipcode_base_params['city_town'], active_sheet),
-                                  get_record(row, zipcode_base_params['zipcode'], active_sheet))
-
-        new_zipcode_obj.ap_lynn = get_record_and_priority(row, zipcode_attributes['lynn'], active_sheet)
-        new_zipcode_obj.ap_nsmha = get_record_and_priority(row, zipcode_attributes['nsmha'], active_sheet)
-        new_zipcode_obj.ap_edinburg = get_record_and_priority(row, zipcode_attributes['edinburg'], active_sheet)
-        new_zipcode_obj.ap_riverside = get_record_and_priority(row, zipcode_attributes['riverside'], active_sheet)
-        new_zipcode_obj.ap_uphams = get_record_and_priority(row, zipcode_attributes['uphams'], active_sheet)
-        new_zipcode_obj.ap_dimock = get_record_and_priority(row, zipcode_attributes['dimock'], active_sheet)
-        new_zipcode_obj.ap_brookline = get_record_and_priority(row, zipcode_attributes['brookline'], active_sheet)
+    for row_values in input_adapter.iter_rows(zipcode_file_location, priority_indexes=set(ap_indexes.values())):
+        new_zipcode_obj = build_zipcode(row_values, column_indexes, ap_indexes)
         if not is_zipcode_empty(new_zipcode_obj):
             obj_zipcodes.append(new_zipcode_obj)
 
     return obj_zipcodes
 
 
-def process_capacity(capacity_file_location):
+def process_capacity(capacity_file_location, input_format=None):
     """
-    Process all Capacity data from an Excel workbook into Capacity objects.
+    Process all Capacity data from an Excel workbook, CSV or Parquet file into Capacity objects.
+    :param capacity_file_location: String
+    :param input_format: String, detected from the file extension when None
     :return: List
     """
-    active_sheet = load_excel_workbook(capacity_file_location)
     obj_capacitys = []
+    column_indexes = get_column_indexes(CAPACITY_ATTRIBUTES)
 
-    capacity_base_params = {
-        "affiliate": "A",
-        "capacity": "B"
-    }
-
-    for row in range(2, active_sheet.max_row + 1):
-        new_capacity_obj = Capacity(get_record(row, capacity_base_params['affiliate'], active_sheet),
-                                    get_record(row, capacity_base_params['capacity'], active_sheet))
+    for row_values in get_input_adapter(capacity_file_location, input_format).iter_rows(capacity_file_location):
+        capacity = get_row_record(row_values, column_indexes['capacity'])
+        # Flat files hold the capacity as text.
+        if isinstance(capacity, str):
+            capacity = int(capacity)
+        new_capacity_obj = Capacity(get_row_record(row_values, column_indexes['affiliate']), capacity)
 
         if not is_capacity_empty(new_capacity_obj):
             obj_capacitys.append(new_capacity_obj)
     return obj_capacitys
 
 
-def process_rules(all_members, capacity_manager, zipcode_manager):
+def build_rule_pipeline(capacity_manager, zipcode_manager, rule_profiler=None):
+    """
+    Create the RulePipeline holding the cascade of rules applied to every member.
+    :param capacity_manager: CapacityManager
+    :param zipcode_manager: ZipcodeManager
+    :param rule_profiler: RuleProfiler used to aggregate per rule statistics, profiling is disabled when None
+    :return: RulePipeline
+    """
+    return RulePipeline([ClientZipcodeInAPServiceAreaRule(),
+                         CurrentACCSclientAPorganizationRule(),
+                         SetACCSRule(),  # TODO Figure out how this rule fits into the cascade
+                         CurrentPCPClientAPOrganizationRule(),
+                         FormerCBFSWithoutTransitionACCSRule(),
+                         ClientOfBehavioralServiceAPRule(),
+                         ClientOfLTSSatAPRule(),
+                         ClientNoPriorHistoryZipcodeCapacityMatchRule(),
+                         FailedAssignmentRule()],
+                        capacity_manager, zipcode_manager, rule_profiler)
+
+
+# Rule pipeline of a process pool worker, see initialize_candidate_worker.
+candidate_worker_rule_pipeline = None
+# Whether the worker times the candidates of every rule for the RuleProfiler.
+candidate_worker_profile_rules = False
+
+
+def initialize_candidate_worker(zipcode_manager, profile_rules=False, log_queue=None, log_level=logging.WARNING):
+    """
+    Process pool initializer building the rule pipeline used by find_members_candidates once per worker.  The log
+    records of the worker are sent to log_queue, a forked worker would otherwise inherit the QueueHandler of
+    configure_logging whose queue is only drained by the listener thread of the parent.
+    :param zipcode_manager: ZipcodeManager
+    :param profile_rules: Boolean to time the candidates of every rule
+    :param log_queue: multiprocessing.Queue drained by a QueueListener in the parent, logging is left as is when None
+    :param log_level: Integer level of the root logger of the parent
+    :return: None
+    """
+    global candidate_worker_rule_pipeline, candidate_worker_profile_rules
+    if log_queue is not None:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(QueueHandler(log_queue))
+        logger.setLevel(log_level)
+    candidate_worker_rule_pipeline = build_rule_pipeline(None, zipcode_manager)
+    candidate_worker_profile_rules = profile_rules
+
+
+def find_members_candidates(members):
     """
-    Establish a Rule Processor and assign new Rules to be parsed.
+    Compute the capacity independent rule candidates of a chunk of members inside a process pool worker.
+    :param members: List
+    :return: List with the candidates of every rule and the seconds spent on each rule, None when the rules are not
+    profiled, for each member
+    """
+    members_candidates = []
+    for member in members:
+        candidate_times = [] if candidate_worker_profile_rules else None
+        members_candidates.append((candidate_worker_rule_pipeline.find_candidates(member, candidate_times),
+                                   candidate_times))
+    return members_candidates
+
+
+def iter_members_candidates(all_members, zipcode_manager, workers, chunk_size=1000, profile_rules=False):
+    """
+    Compute the rule candidates of all members across a process pool.  Tuples of member, candidates and candidate
+    timings are yielded in the original member order as the chunks complete.
+    :param all_members: List
+    :param zipcode_manager: ZipcodeManager
+    :param workers: Integer of worker processes
+    :param chunk_size: Integer of members sent to a worker at a time
+    :param profile_rules: Boolean to time the candidates of every rule in the workers
+    :return: Generator of Tuple
+    """
+    member_chunks = [all_members[start:start + chunk_size] for start in range(0, len(all_members), chunk_size)]
+    # The records logged by the workers are handed to the handlers of the root logger of this process.
+    log_queue = multiprocessing.Queue(-1)
+    log_listener = QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+    log_listener.start()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=initialize_candidate_worker,
+                                 initargs=(zipcode_manager, profile_rules, log_queue, logger.level)) as executor:
+            for members, members_candidates in zip(member_chunks,
+                                                   executor.map(find_members_candidates, member_chunks)):
+                for member, (candidates_by_rule, candidate_times) in zip(members, members_candidates):
+                    yield member, candidates_by_rule, candidate_times
+    finally:
+        log_listener.stop()
+
+
+def process_rules(all_members, capacity_manager, zipcode_manager, rule_profiler=None, workers=1):
+    """
+    Build the rule pipeline once and apply it to every member.
+
+    With more than one worker the rules are evaluated in two phases.  The capacity independent candidates of every
+    member are computed in a process pool, then a single pass in member order consumes capacity using those
+    candidates, which produces the same assignments as the sequential evaluation.  When profiling, the time the workers
+    spent finding the candidates of each rule reached by the cascade is added to the rule, so the profile covers the
+    same work as the sequential evaluation.
     :param all_members: List
     :param capacity_manager: List
     :param zipcode_manager: List
-    :return: None
+    :param rule_profiler: RuleProfiler
+    :param workers: Integer of processes used to compute the rule candidates
+    :return: RulePipeline
     """
-    for member in all_members:
-        rp = RuleProcessing(member, capacity_manager, zipcode_manager)
-        rp.assign_rule(ClientZipcodeInAPServiceAreaRule())
-        rp.assign_rule(CurrentACCSclientAPorganizationRule())
-        rp.assign_rule(SetACCSRule())  # TODO Figure out how this rule fits into the cascade
-        rp.assign_rule(CurrentPCPClientAPOrganizationRule())
-        rp.assign_rule(FormerCBFSWithoutTransitionACCSRule())
-        rp.assign_rule(ClientOfBehavioralServiceAPRule())
-        rp.assign_rule(ClientOfLTSSatAPRule())
-        rp.assign_rule(ClientNoPriorHistoryZipcodeCapacityMatchRule())
-        rp.assign_rule(FailedAssignmentRule())
-        rp.process()
-
-        for rule_exception in rp.member_rule_exceptions:
-            message = "Medicaid ID: {0} | " \
-                      "Member Zipcode: {1} | " \
-                      "Message: {2} | " \
-                      "Rule Class: {3} | " \
-                      "Error Type Class: {4} | " \
-                      "Error Type Description: {5}".format(rule_exception.member.medicaid_id,
-                                                           rule_exception.member.residential_address_zipcode_1,
-                                                           rule_exception.exception_message,
-                                                           rule_exception.rule.__class__.__name__,
-                                                           rule_exception.assignment_error_type.__class__.__name__,
-                                                           rule_exception.assignment_error_type.description)
-            logger.warning(message)
-
-
-def generate_zipcodes_manager(file_location):
-    all_zipcode_objects = process_zipcodes(file_location)
+    rule_pipeline = build_rule_pipeline(capacity_manager, zipcode_manager, rule_profiler)
+    if workers > 1:
+        members_candidates = iter_members_candidates(list(all_members), zipcode_manager, workers,
+                                                     profile_rules=rule_profiler is not None)
+    else:
+        members_candidates = ((member, None, None) for member in all_members)
+    for member, candidates_by_rule, candidate_times in members_candidates:
+        for rule_exception in rule_pipeline.process(member, candidates_by_rule, candidate_times):
+            logger.warning("Medicaid ID: %s | "
+                           "Member Zipcode: %s | "
+                           "Message: %s | "
+                           "Rule Class: %s | "
+                           "Error Type Class: %s | "
+                           "Error Type Description: %s",
+                           rule_exception.member.medicaid_id,
+                           rule_exception.member.residential_address_zipcode_1,
+                           rule_exception.exception_message,
+                           rule_exception.rule.__class__.__name__,
+                           rule_exception.assignment_error_type.__class__.__name__,
+                           rule_exception.assignment_error_type.description)
+    return rule_pipeline
+
+
+def replay_assignments(member_assignments, capacity_manager):
+    """
+    Assign members to the affiliate stored by a previous run and consume the capacity of that affiliate, as the rule
+    which assigned them originally did.
+    :param member_assignments: List of (Member, String) pairs, the affiliate is None for unassigned members
+    :param capacity_manager: CapacityManager
+    :return: Integer of members assigned
+    """
+    members_assigned = 0
+    for member, assigned_to in member_assignments:
+        if assigned_to:
+            member.assign_first_affiliate(assigned_to)
+            capacity_manager.decrement_capacity_from_affiliate(assigned_to)
+            members_assigned += 1
+    return members_assigned
+
+
+def generate_zipcodes_manager(file_location, input_format=None, input_cache=None):
+    if input_cache is not None:
+        all_zipcode_objects = input_cache.load(file_location, process_zipcodes, input_format)
+    else:
+        all_zipcode_objects = process_zipcodes(file_location, input_format)
     return ZipcodeManager(all_zipcode_objects)
 
 
-def generate_capacities_manager(file_location):
-    all_capacities = process_capacity(file_location)
+def generate_capacities_manager(file_location, input_format=None, input_cache=None):
+    if input_cache is not None:
+        all_capacities = input_cache.load(file_location, process_capacity, input_format)
+    else:
+        all_capacities = process_capacity(file_location, input_format)
     return CapacityManager(all_capacities)
 
 
-def generate_members(file_location):
-    all_members = process_members(file_location)
+def generate_members(file_location, member_manager=None, input_format=None):
+    all_members = process_members(file_location, member_manager, input_format)
     return all_members
 
 
+def parse_member_file(member_file_location, input_format=None):
+    """
+    Parse one member file into its own MemberManager.
+    :param member_file_location: String
+    :param input_format: String
+    :return: Tuple of the List of Member and the Integer of rows parsed
+    """
+    member_manager = MemberManager()
+    all_members = process_members(member_file_location, member_manager, input_format)
+    return all_members, member_manager.rows_merged
+
+
+def parse_member_files(member_file_locations, workers=1, input_format=None):
+    """
+    Parse several member files, concurrently in a process pool when more than one worker is given.  The results are
+    returned in the order of member_file_locations whatever order the files finish parsing in.
+    :param member_file_locations: List of String
+    :param workers: Integer of worker processes
+    :param input_format: String
+    :return: List of Tuple from parse_member_file
+    """
+    if workers > 1 and len(member_file_locations) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(parse_member_file, member_file_locations,
+                                     [input_format] * len(member_file_locations)))
+    return [parse_member_file(member_file_location, input_format) for member_file_location in member_file_locations]
+
+
 # zipcode_manager = generate_zipcodes_manager()
 # capacities_manager = generate_capacities_manager()
 # all_members = generate_members()
@@ -443,10 +752,46 @@ def generate_stats(all_members):
             count_unassigned.append(mem)
             # print("Is {0} assigned: {1}".format(mem.first_name, mem.is_assigned))
 
-    logger.info("Total members: {0}".format(len(total_count)))
-    logger.info("Remaining unassigned members: {0}".format(len(count_unassigned)))
-    logger.info("Members with multiple affiliate entries: {0}".format(len(members_with_multiple_affiliates)))
+    logger.info("Total members: %s", len(total_count))
+    logger.info("Remaining unassigned members: %s", len(count_unassigned))
+    logger.info("Members with multiple affiliate entries: %s", len(members_with_multiple_affiliates))
     logger.info("="*80)
+    return {
+        "total_members": len(total_count),
+        "unassigned_members": len(count_unassigned),
+        "members_with_multiple_affiliates": len(members_with_multiple_affiliates)
+    }
+
+
+def get_members_by_medicaid_id(all_members):
+    """
+    Group all members by their medicaid ID while preserving the order of the members within each group.
+    :param all_members: List
+    :return: Dict
+    """
+    members_by_medicaid_id = {}
+    for member in all_members:
+        members_by_medicaid_id.setdefault(member.medicaid_id, []).append(member)
+    return members_by_medicaid_id
+
+
+def get_row_assignment(matching_members):
+    """
+    Mark the members matching a MassHealth row as written and return what the row receives.  The first row of a member
+    receives its assignment while the following rows of the same member are duplicates.
+    :param matching_members: List of Member sharing the medicaid ID of the row
+    :return: Tuple of the affiliate written to the row, None when there is none, and whether the row is a duplicate
+    """
+    assigned_to = None
+    duplicate = False
+    for member in matching_members:
+        if not member.assignment_written:
+            assigned_to = member.get_assigned_affiliate() or ""
+            duplicate = False
+            member.assignment_written = True
+        else:
+            duplicate = True
+    return assigned_to, duplicate
 
 
 def update_masshealth_assignments(all_members, masshealth_file_location, mark_duplicates=False):
@@ -464,20 +809,91 @@ def update_masshealth_assignments(all_members, masshealth_file_location, mark_du
         "assigned_to": "BI"
     }
 
+    members_by_medicaid_id = get_members_by_medicaid_id(all_members)
+    cell_alignment = Alignment(horizontal='center', vertical='center')
+    rows_matched = 0
+
     for row in range(2, active_sheet.max_row + 1):
         medicaid_cell = get_record_cell(row, member_attributes['medicaid_id'], active_sheet)
-        assigned_to_cell = get_record_cell(row, assigned_to_column['assigned_to'], active_sheet)
-        cell_alignment = Alignment(horizontal='center', vertical='center')
         if medicaid_cell.value:
-            for member in all_members:
-                if member.medicaid_id == medicaid_cell.value:
-                    if not member.assignment_written:
-                        assigned_to_cell.value = member.get_assigned_affiliate() or ""
-                        assigned_to_cell.alignment = cell_alignment
-                        member.assignment_written = True
-                    else:
-                        if mark_duplicates:
-                            assigned_to_cell.value = duplication_text_marker
-                            assigned_to_cell.alignment = cell_alignment
-                    logger.debug("Medicaid: {0} | Assigned: {1}".format(medicaid_cell.value, assigned_to_cell.value))
+            matching_members = members_by_medicaid_id.get(medicaid_cell.value)
+            if not matching_members:
+                continue
+            assigned_to_cell = get_record_cell(row, assigned_to_column['assigned_to'], active_sheet)
+            rows_matched += 1
+            assigned_to, duplicate = get_row_assignment(matching_members)
+            if duplicate and mark_duplicates:
+                assigned_to_cell.value = duplication_text_marker
+            elif assigned_to is not None:
+                assigned_to_cell.value = assigned_to
+            else:
+                continue
+            assigned_to_cell.alignment = cell_alignment
+            logger.debug("Medicaid: %s | Assigned: %s", medicaid_cell.value, assigned_to_cell.value)
     wb.save(masshealth_file_location)
+    return rows_matched
+
+
+def iter_assignment_records(all_members, masshealth_file_location, input_format=None):
+    """
+    Stream the medicaid ID column of the MassHealth file and yield an AssignmentRecord for every row matching a
+    member, with the same matching and duplicate handling as update_masshealth_assignments.
+    :param all_members: List
+    :param masshealth_file_location: String
+    :param input_format: String, detected from the file extension when None
+    :return: Generator of AssignmentRecord
+    """
+    medicaid_id_index = get_column_indexes(MEMBER_ATTRIBUTES)['medicaid_id']
+    members_by_medicaid_id = get_members_by_medicaid_id(all_members)
+    input_adapter = get_input_adapter(masshealth_file_location, input_format)
+    for row, row_values in enumerate(input_adapter.iter_rows(masshealth_file_location), start=2):
+        medicaid_id = row_values[medicaid_id_index] if medicaid_id_index < len(row_values) else None
+        if medicaid_id:
+            matching_members = members_by_medicaid_id.get(medicaid_id)
+            if matching_members:
+                assigned_to, duplicate = get_row_assignment(matching_members)
+                yield AssignmentRecord(row, medicaid_id, assigned_to, duplicate)
+
+
+def write_assignment_records(all_members, masshealth_file_location, output_location, input_format=None):
+    """
+    Write the assignments of the MassHealth rows to a separate Excel, CSV or JSONL file chosen by the extension of
+    output_location, leaving the MassHealth file untouched.
+    :param all_members: List
+    :param masshealth_file_location: String
+    :param output_location: String
+    :param input_format: String of the MassHealth file, detected from the file extension when None
+    :return: Integer of rows matched
+    """
+    return get_output_sink(output_location).write(
+        iter_assignment_records(all_members, masshealth_file_location, input_format))
+
+
+def update_member_rows(all_members, active_sheet, mark_duplicates=False):
+    """
+    Write the assignment of every member directly to the rows it was parsed from, without scanning the medicaid ID
+    column.  The first row of a member receives its assignment and the following rows are its duplicates.
+    :param all_members: List of Member parsed by process_sheet_members
+    :param active_sheet: Worksheet the members were parsed from
+    :param mark_duplicates: Boolean
+    :return: Integer of rows written
+    """
+    duplication_text_marker = "DUPLICATE"
+    assigned_to_column = column_index_from_string(MEMBER_ATTRIBUTES['assigned_to'])
+    cell_alignment = Alignment(horizontal='center', vertical='center')
+    rows_written = 0
+
+    for member in all_members:
+        for row_index, row in enumerate(member.source_rows):
+            assigned_to_cell = active_sheet.cell(row=row, column=assigned_to_column)
+            if row_index == 0:
+                assigned_to_cell.value = member.get_assigned_affiliate() or ""
+            elif mark_duplicates:
+                assigned_to_cell.value = duplication_text_marker
+            else:
+                continue
+            assigned_to_cell.alignment = cell_alignment
+            rows_written += 1
+            logger.debug("Medicaid: %s | Assigned: %s", member.medicaid_id, assigned_to_cell.value)
+        member.assignment_written = True
+    return rows_written
@@ -0,0 +1,231 @@
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from AssignmentProgram.AssignmentProcessing import build_rule_pipeline, MEMBER_SERVICE_FLAGS
+from AssignmentProgram.Member import Member, Affiliate
+
+logger = logging.getLogger(__name__)
+
+
+def get_text_value(value):
+    """
+    Normalize a JSON value the same way the input files are, strings are stripped and lower cased.
+    :param value: String, Integer or None
+    :return: String, Integer or None
+    """
+    if isinstance(value, str):
+        return value.strip().lower() or None
+    return value
+
+
+def get_request_value(request, field, value_types=(str, int)):
+    """
+    Return a field of a JSON object normalized with get_text_value, after checking its type.
+    :param request: Dict
+    :param field: String
+    :param value_types: Tuple of the types accepted for the field, None is always accepted
+    :return: String, Integer or None
+    """
+    value = request.get(field)
+    # bool is a subclass of int but true or false is never a valid member field.
+    if value is not None and (isinstance(value, bool) or not isinstance(value, value_types)):
+        raise ValueError("Error: The {0} of the request must be {1}".format(
+            field, " or ".join("a string" if value_type is str else "an integer" for value_type in value_types)))
+    return get_text_value(value)
+
+
+def build_request_member(member_request):
+    """
+    Build a Member from the JSON body of an assignment request, for example:
+        {"medicaid_id": "100012345678", "zipcode": "01902",
+         "affiliates": [{"name": "Lynn", "services": ["accs", "pcp"]}]}
+    The services are the service columns of MEMBER_SERVICE_FLAGS.  A ValueError is raised when a field is missing or
+    has the wrong type.
+    :param member_request: Dict
+    :return: Member
+    """
+    if not isinstance(member_request, dict):
+        raise ValueError("Error: The request body must be a JSON object")
+    zipcode = get_request_value(member_request, "zipcode")
+    if not zipcode:
+        raise ValueError("Error: The request requires a zipcode")
+    member = Member(get_request_value(member_request, "medicaid_id"),
+                    get_request_value(member_request, "last_name"),
+                    get_request_value(member_request, "first_name"),
+                    get_request_value(member_request, "middle_initial"),
+                    get_request_value(member_request, "date_of_birth"),
+                    zipcode,
+                    get_request_value(member_request, "identification_flag", (str,)))
+    affiliate_requests = member_request.get("affiliates") or [{}]
+    if not isinstance(affiliate_requests, list):
+        raise ValueError("Error: The affiliates of the request must be a list")
+    for affiliate_request in affiliate_requests:
+        if not isinstance(affiliate_request, dict):
+            raise ValueError("Error: Every affiliate of the request must be a JSON object")
+        services = affiliate_request.get("services") or []
+        if not isinstance(services, list):
+            raise ValueError("Error: The services of an affiliate must be a list")
+        service_flags = 0
+        for service in services:
+            if not isinstance(service, str) or service not in MEMBER_SERVICE_FLAGS:
+                raise ValueError("Error: Unknown service: {0}".format(service))
+            service_flags |= MEMBER_SERVICE_FLAGS[service]
+        member.add_affiliate(Affiliate(get_request_value(affiliate_request, "name", (str,)), service_flags))
+    return member
+
+
+class AssignmentService(object):
+    """
+    Answers single member assignment requests with the same rule cascade as process_rules.  The rules run against a
+    snapshot of the capacity held by a CapacityLedger, so evaluating a request never consumes capacity and requests are
+    not serialized while the rules run.  With a reservation the slot of the affiliate the member is assigned to is then
+    reserved in the ledger, which checks and decrements the capacity atomically so concurrent requests never get the
+    same slot.  When another request took the last slot after the snapshot was made the rules run again on a fresh
+    snapshot, up to reserve_attempts times, and the member is left unassigned if no slot could be reserved.  The
+    reservation is kept with commit or given back with release.
+    """
+    def __init__(self, zipcode_manager, capacity_ledger, reserve_attempts=3):
+        """
+        :param zipcode_manager: ZipcodeManager
+        :param capacity_ledger: CapacityLedger or SqliteCapacityLedger
+        :param reserve_attempts: Integer of rule cascade runs for a reservation, at least 1
+        """
+        if reserve_attempts < 1:
+            raise ValueError("Error: The reserve attempts must be at least 1, got: {0}".format(reserve_attempts))
+        self.zipcode_manager = zipcode_manager
+        self.capacity_ledger = capacity_ledger
+        self.reserve_attempts = reserve_attempts
+
+    def assign(self, member_request, reserve=False):
+        """
+        Run the rule cascade for the member described by the request.
+        :param member_request: Dict, see build_request_member
+        :param reserve: Boolean to reserve a slot of the affiliate the member is assigned to
+        :return: Dict with the assignment, the reservation ID and the rule exceptions
+        """
+        for attempt in range(1, self.reserve_attempts + 1):
+            # Some rules update the member, so every run starts from the request.
+            member = build_request_member(member_request)
+            capacity_snapshot = self.capacity_ledger.get_capacity_snapshot()
+            rule_exceptions = build_rule_pipeline(capacity_snapshot, self.zipcode_manager).process(member)
+            assigned_to = member.get_assigned_affiliate() if member.is_assigned else None
+            reservation_id = None
+            if not reserve or not assigned_to:
+                break
+            reservation_id = self.capacity_ledger.reserve(assigned_to, member.medicaid_id)
+            if reservation_id is not None:
+                break
+            # Another request took the last slot after the snapshot was made.
+            logger.debug("Unable to reserve a slot of %s for member %s, attempt %s of %s", assigned_to,
+                         member.medicaid_id, attempt, self.reserve_attempts)
+            assigned_to = None
+        return {
+            "medicaid_id": member.medicaid_id,
+            "assigned_to": assigned_to,
+            "reserved": reservation_id is not None,
+            "reservation_id": reservation_id,
+            "rule_exceptions": [{
+                "rule": rule_exception.rule.__class__.__name__ if rule_exception.rule else None,
+                "error_type": rule_exception.assignment_error_type.__class__.__name__,
+                "message": rule_exception.exception_message,
+                "description": rule_exception.assignment_error_type.description
+            } for rule_exception in rule_exceptions]
+        }
+
+    def commit(self, reservation_id):
+        self.capacity_ledger.commit(reservation_id)
+        return {"reservation_id": reservation_id, "status": "committed"}
+
+    def release(self, reservation_id):
+        self.capacity_ledger.release(reservation_id)
+        return {"reservation_id": reservation_id, "status": "released"}
+
+    def get_capacities(self):
+        return [{"ap": capacity.ap,
+                 "capacity": capacity.capacity,
+                 "capacity_available": capacity.capacity_available}
+                for capacity in self.capacity_ledger.get_capacity_snapshot().capacities]
+
+
+class AssignmentRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP endpoints of the AssignmentService:
+        POST /assign    assignment of the member in the JSON body, add "reserve": true to reserve a slot
+        POST /commit    keep the reservation of the JSON body {"reservation_id": 1}
+        POST /release   give back the slot of the JSON body {"reservation_id": 1}
+        GET  /capacity  current capacity of every AP
+    """
+    def send_json(self, status, body):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_server_error(self):
+        logger.exception("Unable to answer %s %s", self.command, self.path)
+        self.send_json(500, {"error": "Error: Unable to process the request"})
+
+    def do_GET(self):
+        if self.path != "/capacity":
+            self.send_json(404, {"error": "Error: Unknown path: {0}".format(self.path)})
+            return
+        try:
+            response = self.server.assignment_service.get_capacities()
+        except Exception:
+            self.send_server_error()
+            return
+        self.send_json(200, response)
+
+    def do_POST(self):
+        if self.path not in ("/assign", "/commit", "/release"):
+            self.send_json(404, {"error": "Error: Unknown path: {0}".format(self.path)})
+            return
+        assignment_service = self.server.assignment_service
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+            request_body = json.loads(self.rfile.read(content_length) or b"{}")
+            if self.path == "/assign":
+                reserve = request_body.get("reserve", False) if isinstance(request_body, dict) else False
+                if not isinstance(reserve, bool):
+                    raise ValueError("Error: The reserve of the request must be true or false")
+                response = assignment_service.assign(request_body, reserve)
+            else:
+                if not isinstance(request_body, dict) or not isinstance(request_body.get("reservation_id"), int):
+                    raise ValueError("Error: The request requires an integer reservation_id")
+                if self.path == "/commit":
+                    response = assignment_service.commit(request_body["reservation_id"])
+                else:
+                    response = assignment_service.release(request_body["reservation_id"])
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError as well.
+            self.send_json(400, {"error": str(e)})
+            return
+        except Exception:
+            self.send_server_error()
+            return
+        self.send_json(200, response)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class AssignmentHTTPServer(ThreadingHTTPServer):
+    # The default backlog of 5 resets connections as soon as a few intake clients send requests at the same time.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def create_assignment_server(assignment_service, host='127.0.0.1', port=8080):
+    """
+    Create the threaded HTTP server answering assignment requests, call serve_forever on it to start serving.
+    :param assignment_service: AssignmentService
+    :param host: String, only local connections are accepted by default
+    :param port: Integer
+    :return: AssignmentHTTPServer
+    """
+    server = AssignmentHTTPServer((host, port), AssignmentRequestHandler)
+    server.assignment_service = assignment_service
+    return server
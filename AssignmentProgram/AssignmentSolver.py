@@ -0,0 +1,224 @@
+import copy
+import logging
+from collections import deque
+
+from AssignmentProgram.AssignmentProcessing import build_rule_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorLoggerAdapter(logging.LoggerAdapter):
+    """
+    Logger adapter only passing on the errors, without changing the level of the logger it wraps.
+    """
+    def isEnabledFor(self, level):
+        return level >= logging.ERROR and self.logger.isEnabledFor(level)
+
+
+class MinCostFlow(object):
+    """
+    Minimum cost maximum flow by the primal-dual method.  Each phase computes the shortest path distances from the
+    source with a Bellman-Ford queue, since the residual edges have negative costs, then saturates every shortest path
+    at once with a blocking flow restricted to the edges on a shortest path.  The number of phases is bounded by the
+    number of distinct path costs rather than by the number of paths, which stays small when the costs are a few rule
+    priorities.
+    """
+    def __init__(self, node_count):
+        self.node_count = node_count
+        # Each edge is a list of [to node, residual capacity, cost, index of the reverse edge in the to node list].
+        self.graph = [[] for _ in range(node_count)]
+
+    def add_edge(self, from_node, to_node, capacity, cost):
+        """
+        :return: List of the forward edge, see get_edge_flow
+        """
+        forward_edge = [to_node, capacity, cost, len(self.graph[to_node])]
+        self.graph[from_node].append(forward_edge)
+        self.graph[to_node].append([from_node, 0, -cost, len(self.graph[from_node]) - 1])
+        return forward_edge
+
+    def get_edge_flow(self, edge):
+        return self.graph[edge[0]][edge[3]][1]
+
+    def get_distances(self, source):
+        distances = [None] * self.node_count
+        in_queue = [False] * self.node_count
+        distances[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            in_queue[node] = False
+            for to_node, capacity, cost, _ in self.graph[node]:
+                if capacity > 0 and (distances[to_node] is None or distances[node] + cost < distances[to_node]):
+                    distances[to_node] = distances[node] + cost
+                    if not in_queue[to_node]:
+                        in_queue[to_node] = True
+                        queue.append(to_node)
+        return distances
+
+    def is_admissible(self, distances, node, edge):
+        return edge[1] > 0 and distances[edge[0]] is not None and distances[node] + edge[2] == distances[edge[0]]
+
+    def get_levels(self, distances, source, sink):
+        levels = [None] * self.node_count
+        levels[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for edge in self.graph[node]:
+                if levels[edge[0]] is None and self.is_admissible(distances, node, edge):
+                    levels[edge[0]] = levels[node] + 1
+                    queue.append(edge[0])
+        return levels if levels[sink] is not None else None
+
+    def push_flow(self, distances, levels, next_edges, node, sink, flow):
+        """
+        Push up to flow units from node to the sink along admissible edges of increasing level.  The recursion depth is
+        the length of the path, which is short for the bipartite graphs built by GlobalAssignmentSolver.
+        """
+        if node == sink:
+            return flow
+        node_edges = self.graph[node]
+        while next_edges[node] < len(node_edges):
+            edge = node_edges[next_edges[node]]
+            if levels[edge[0]] == levels[node] + 1 and self.is_admissible(distances, node, edge):
+                pushed = self.push_flow(distances, levels, next_edges, edge[0], sink, min(flow, edge[1]))
+                if pushed:
+                    edge[1] -= pushed
+                    self.graph[edge[0]][edge[3]][1] += pushed
+                    return pushed
+            next_edges[node] += 1
+        return 0
+
+    def solve(self, source, sink):
+        """
+        Send as much flow as possible from the source to the sink at the lowest total cost.
+        :param source: Integer
+        :param sink: Integer
+        :return: Tuple of the Integer flow and the Integer cost
+        """
+        total_flow = 0
+        total_cost = 0
+        while True:
+            distances = self.get_distances(source)
+            if distances[sink] is None:
+                return total_flow, total_cost
+            # The edges on a shortest path keep a zero reduced cost while the flow of this phase is pushed.
+            while True:
+                levels = self.get_levels(distances, source, sink)
+                if levels is None:
+                    break
+                next_edges = [0] * self.node_count
+                while True:
+                    pushed = self.push_flow(distances, levels, next_edges, source, sink, float('inf'))
+                    if not pushed:
+                        break
+                    total_flow += pushed
+                    total_cost += pushed * distances[sink]
+
+
+class GlobalAssignmentSolver(object):
+    """
+    Alternative to the greedy rule cascade, which consumes capacity in row order so early members can take the slots
+    that later members needed.  The members and APs are modeled as a transportation problem and solved as a minimum
+    cost flow: every AP a rule could assign a member to is an edge costing the priority of the first such rule, and
+    the capacity of each AP bounds its flow.  The solution places as many members as possible, then prefers the
+    highest priority rules.
+
+    Members with the same APs and costs are interchangeable, so they are grouped and the flow graph only holds one node
+    per group, which keeps it to a few thousand nodes for 100k members.  Unlike the cascade a member related to several
+    APs by the same rule is placed at one of them instead of being left for manual processing, and among APs of the
+    same cost the solver does not balance by capacity percentage.
+    """
+    def __init__(self, capacity_manager, zipcode_manager):
+        self.capacity_manager = capacity_manager
+        self.zipcode_manager = zipcode_manager
+        self.rule_pipeline = build_rule_pipeline(capacity_manager, zipcode_manager)
+        self.members_processed = 0
+        self.members_assigned = 0
+        self.member_groups = 0
+        self.total_cost = 0
+
+    def get_member_costs(self, member):
+        """
+        Find the APs the rules could assign a member to, with the priority of the first rule reaching each AP.  APs
+        without capacity left are skipped.
+        :param member: Member
+        :return: Dict of String to Integer
+        """
+        member_costs = {}
+        # Rules updating the member data apply their changes while the candidates are found, so they are found for a
+        # copy and the member is only changed by the assignment.
+        member_copy = copy.copy(member)
+        member_copy.affiliates = [copy.copy(affiliate) for affiliate in member.affiliates]
+        candidates_by_rule = self.rule_pipeline.find_candidates(member_copy)
+        for rule, candidates in zip(self.rule_pipeline.rules, candidates_by_rule):
+            for ap in rule.get_candidate_affiliates(candidates):
+                if ap not in member_costs and self.capacity_manager.does_affiliate_have_capacity(ap):
+                    member_costs[ap] = rule.rule_priority
+        return member_costs
+
+    def count_greedy_assignments(self, all_members):
+        """
+        Count the members the rule cascade would assign, by running it on a copy of the members and the capacity.
+        :param all_members: List
+        :return: Integer
+        """
+        greedy_members, greedy_capacity_manager = copy.deepcopy((list(all_members), self.capacity_manager))
+        greedy_rule_pipeline = build_rule_pipeline(greedy_capacity_manager, self.zipcode_manager)
+        # The rule messages of the dry run would repeat the ones of the members the solver places.
+        greedy_logger = ErrorLoggerAdapter(logging.getLogger(__name__ + '.greedy'), {})
+        greedy_rule_pipeline.logger = greedy_logger
+        for rule in greedy_rule_pipeline.rules:
+            rule.logger = greedy_logger
+        members_assigned = 0
+        for member in greedy_members:
+            if not member.is_assigned:
+                greedy_rule_pipeline.process(member)
+                members_assigned += member.is_assigned
+        return members_assigned
+
+    def solve(self, all_members):
+        """
+        Assign the unassigned members with the minimum cost flow and consume the capacity of their APs.
+        :param all_members: List
+        :return: Integer of members assigned
+        """
+        member_groups = {}
+        for member in all_members:
+            if member.is_assigned:
+                continue
+            self.members_processed += 1
+            member_costs = self.get_member_costs(member)
+            if member_costs:
+                member_groups.setdefault(tuple(sorted(member_costs.items())), []).append(member)
+        self.member_groups = len(member_groups)
+
+        aps = [capacity.ap for capacity in self.capacity_manager.capacities
+               if self.capacity_manager.does_affiliate_have_capacity(capacity.ap)]
+        ap_nodes = {ap: len(member_groups) + 1 + ap_index for ap_index, ap in enumerate(aps)}
+        source = 0
+        sink = len(member_groups) + len(aps) + 1
+        min_cost_flow = MinCostFlow(sink + 1)
+        for ap, ap_node in ap_nodes.items():
+            min_cost_flow.add_edge(ap_node, sink, self.capacity_manager.get_capacity_size_of_affiliate(ap), 0)
+        group_edges = []
+        for group_index, (member_costs, members) in enumerate(member_groups.items()):
+            group_node = group_index + 1
+            min_cost_flow.add_edge(source, group_node, len(members), 0)
+            group_edges.append([(ap, min_cost_flow.add_edge(group_node, ap_nodes[ap], len(members), cost))
+                                for ap, cost in sorted(member_costs, key=lambda ap_cost: ap_cost[1])])
+        members_assigned, self.total_cost = min_cost_flow.solve(source, sink)
+
+        for members, edges in zip(member_groups.values(), group_edges):
+            remaining_members = iter(members)
+            for ap, edge in edges:
+                for _ in range(min_cost_flow.get_edge_flow(edge)):
+                    member = next(remaining_members)
+                    member.assign_first_affiliate(ap)
+                    self.capacity_manager.decrement_capacity_from_affiliate(ap)
+        for member in all_members:
+            if not member.is_assigned:
+                logger.warning("Unable to place member %s with the global assignment", member.medicaid_id)
+        self.members_assigned = members_assigned
+        return members_assigned
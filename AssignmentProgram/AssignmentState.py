@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import sqlite3
+
+from AssignmentProgram.InputCache import get_file_hash
+from AssignmentProgram.Member import MemberManager
+
+CONTEXT_FINGERPRINT_KEY = 'context_fingerprint'
+
+
+def get_member_identity(member):
+    return repr(MemberManager.identity_key(member))
+
+
+def get_member_fingerprint(member):
+    """
+    Return a digest of every input field of a member used by the rules.  The assigned_to column is left out since it
+    is the output written back to the MassHealth workbook by the previous run.  Some rules update the member data, so
+    the fingerprint has to be taken before the rules are applied.
+    :param member: Member
+    :return: String
+    """
+    member_fields = (member.medicaid_id, member.last_name, member.first_name, member.middle_initial,
+                     member.date_of_birth, member.residential_address_zipcode_1, member.identification_flag,
+                     tuple((affiliate.affiliate_name, affiliate.service_flags) for affiliate in member.affiliates))
+    return hashlib.sha256(repr(member_fields).encode()).hexdigest()
+
+
+def get_context_fingerprint(file_locations, parser_version):
+    """
+    Return a digest of the files every assignment depends on, such as the zipcode and capacity files.  Stored
+    assignments are only reused while this fingerprint is unchanged.
+    :param file_locations: List of String
+    :param parser_version: Integer
+    :return: String
+    """
+    context_hash = hashlib.sha256(repr(parser_version).encode())
+    for file_location in file_locations:
+        context_hash.update(get_file_hash(file_location).encode())
+    return context_hash.hexdigest()
+
+
+class AssignmentStateStore(object):
+    """
+    SQLite store of the input fingerprint and the assignment of every member of the previous run.  It is used by the
+    incremental mode to reuse the assignments of the members whose input did not change and only run the rules for
+    new or changed members.
+    """
+    def __init__(self, database_location):
+        self.database_location = database_location
+        self.logger = logging.getLogger(__name__)
+        self._connection = sqlite3.connect(database_location)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS member_state ("
+                                     "identity TEXT PRIMARY KEY, "
+                                     "fingerprint TEXT NOT NULL, "
+                                     "assigned_to TEXT)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS run_state (key TEXT PRIMARY KEY, value TEXT)")
+
+    def close(self):
+        self._connection.close()
+
+    def get_context_fingerprint(self):
+        row = self._connection.execute("SELECT value FROM run_state WHERE key = ?",
+                                       (CONTEXT_FINGERPRINT_KEY,)).fetchone()
+        return row[0] if row else None
+
+    def split_members(self, all_members, member_fingerprints, context_fingerprint):
+        """
+        Split the members into the ones unchanged since the previous run, paired with their stored assignment, and the
+        members which the rules have to process.  Those are the new or changed members, and the unchanged members left
+        unassigned by the previous run since capacity freed by removed or changed members may now place them.  Every
+        member is processed when the context changed.
+        :param all_members: List
+        :param member_fingerprints: List of String from get_member_fingerprint in the order of all_members
+        :param context_fingerprint: String from get_context_fingerprint
+        :return: Tuple of a List of (Member, String) and a List of Member
+        """
+        if context_fingerprint != self.get_context_fingerprint():
+            self.logger.info("The zipcode or capacity input changed, every member is processed by the rules")
+            return [], list(all_members)
+        stored_members = {identity: (fingerprint, assigned_to) for identity, fingerprint, assigned_to in
+                          self._connection.execute("SELECT identity, fingerprint, assigned_to FROM member_state")}
+        unchanged_members = []
+        changed_members = []
+        for member, member_fingerprint in zip(all_members, member_fingerprints):
+            stored_member = stored_members.get(get_member_identity(member))
+            if stored_member is not None and stored_member[0] == member_fingerprint and stored_member[1] is not None:
+                unchanged_members.append((member, stored_member[1]))
+            else:
+                changed_members.append(member)
+        return unchanged_members, changed_members
+
+    def save(self, all_members, member_fingerprints, context_fingerprint):
+        """
+        Replace the stored state with the fingerprint and assignment of every member of this run.
+        :param all_members: List
+        :param member_fingerprints: List of String from get_member_fingerprint in the order of all_members
+        :param context_fingerprint: String from get_context_fingerprint
+        :return: None
+        """
+        with self._connection:
+            self._connection.execute("DELETE FROM member_state")
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO member_state (identity, fingerprint, assigned_to) VALUES (?, ?, ?)",
+                ((get_member_identity(member), member_fingerprint,
+                  member.get_assigned_affiliate() if member.is_assigned else None)
+                 for member, member_fingerprint in zip(all_members, member_fingerprints)))
+            self._connection.execute("INSERT OR REPLACE INTO run_state (key, value) VALUES (?, ?)",
+                                     (CONTEXT_FINGERPRINT_KEY, context_fingerprint))
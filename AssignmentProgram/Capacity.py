@@ -1,4 +1,5 @@
 import logging
+from bisect import bisect_left
 
 
 class Capacity(object):
@@ -6,30 +7,146 @@ class Capacity(object):
     Basic helper class that maps the capacities from the excel workbook into Capacity objects.  The capacity objects
     are typically referenced through a CapacityManager class instance.
     """
+    __slots__ = ('ap', 'capacity_available', 'capacity')
+
     def __init__(self, ap, capacity):
         self.ap = ap
         self.capacity_available = capacity
         self.capacity = capacity
 
     def decrement_capacity(self):
-        self.capacity -= 1
+        if self.capacity > 0:
+            self.capacity -= 1
+
+    def increment_capacity(self):
+        if self.capacity < self.capacity_available:
+            self.capacity += 1
 
     def available_capacity_percentage(self):
         return (self.capacity / self.capacity_available) * 100
 
+    def is_exhausted(self):
+        return not self.capacity or self.capacity <= 0 or not self.capacity_available
+
+
+class CapacityRanking(object):
+    """
+    Keeps the Capacity objects that still have room ordered from the highest to the lowest available capacity
+    percentage.  The ranking is updated as capacity is consumed so the AP with the highest percentage does not require
+    re-sorting all capacities for every member.  Exhausted capacities are dropped from the ranking.
+
+    The ranking is a sorted list, an update finds a capacity with a binary search but moving it shifts the list, and a
+    lookup walks the ranking from the top until it reaches one of the requested affiliates.  Both are linear in the
+    number of APs, which is a handful, so the list is cheaper than a heap in practice.
+    """
+    def __init__(self, all_capacities=None):
+        self._ranking_keys = []
+        self._ranked_capacities = []
+        self._keys_by_affiliate = {}
+        self._sequence = 0
+        for capacity in all_capacities or []:
+            self.add_capacity(capacity)
+
+    def __len__(self):
+        return len(self._ranked_capacities)
+
+    def add_capacity(self, capacity):
+        if capacity.ap is None or capacity.ap in self._keys_by_affiliate or capacity.is_exhausted():
+            return
+        # The sequence number keeps keys unique so a capacity can be located again with a binary search.
+        self._sequence += 1
+        self._insert((-capacity.available_capacity_percentage(), self._sequence), capacity)
+
+    def update_capacity(self, capacity):
+        """
+        Move a capacity to its new position after it has changed, or drop it once it is exhausted.
+        :param capacity: Capacity
+        :return: None
+        """
+        key = self._keys_by_affiliate.get(capacity.ap)
+        if key is None:
+            # An exhausted capacity re-enters the ranking once capacity is released.
+            self.add_capacity(capacity)
+            return
+        index = bisect_left(self._ranking_keys, key)
+        del self._ranking_keys[index]
+        del self._ranked_capacities[index]
+        del self._keys_by_affiliate[capacity.ap]
+        if not capacity.is_exhausted():
+            self._insert((-capacity.available_capacity_percentage(), key[1]), capacity)
+
+    def _insert(self, key, capacity):
+        index = bisect_left(self._ranking_keys, key)
+        self._ranking_keys.insert(index, key)
+        self._ranked_capacities.insert(index, capacity)
+        self._keys_by_affiliate[capacity.ap] = key
+
+    def get_highest_percentage_by_affiliates(self, affiliates):
+        """
+        Find the capacity with the highest available percentage among the given affiliates.  When several affiliates
+        share the highest percentage the one listed first in affiliates is returned.
+        :param affiliates: List
+        :return: Capacity
+        """
+        affiliate_positions = {}
+        for position, ap in enumerate(affiliates):
+            affiliate_positions.setdefault(ap, position)
+
+        highest_capacity = None
+        highest_key = None
+        for key, capacity in zip(self._ranking_keys, self._ranked_capacities):
+            if highest_key is not None and key[0] != highest_key[0]:
+                break
+            if capacity.ap in affiliate_positions:
+                if highest_capacity is None \
+                        or affiliate_positions[capacity.ap] < affiliate_positions[highest_capacity.ap]:
+                    highest_capacity = capacity
+                    highest_key = key
+        return highest_capacity
+
 
 class CapacityManager(object):
     """
     Class used to manage one or more Capacity objects and offer helper functions for interacting with capacities.
     """
     def __init__(self, all_capacities):
-        self.capacities = all_capacities
+        self._capacities = []
+        self._capacities_by_affiliate = {}
+        self._capacity_ranking = CapacityRanking()
         self.logger = logging.getLogger(__name__)
+        self.capacities = all_capacities
+
+    @property
+    def capacities(self):
+        return self._capacities
+
+    @capacities.setter
+    def capacities(self, all_capacities):
+        self._capacities = []
+        self._capacities_by_affiliate = {}
+        self._capacity_ranking = CapacityRanking()
+        for capacity in all_capacities:
+            self.add_capacity(capacity)
+
+    def __len__(self):
+        return len(self._capacities)
+
+    def add_capacity(self, capacity):
+        self.check_capacity_has_affiliate_conflict(capacity)
+        self._capacities.append(capacity)
+        self._capacities_by_affiliate[capacity.ap] = capacity
+        self._capacity_ranking.add_capacity(capacity)
+
+    def check_capacity_has_affiliate_conflict(self, new_capacity):
+        existing_capacity = self._capacities_by_affiliate.get(new_capacity.ap)
+        if existing_capacity:
+            raise ValueError("Error: Multiple capacities {0} and {1} are defined for the same affiliate: {2}.".format(
+                existing_capacity.capacity, new_capacity.capacity, new_capacity.ap))
 
     def get_capacity_size_of_affiliate(self, affiliate):
-        for capacity in self.capacities:
-            if capacity.ap == affiliate:
-                return capacity.capacity
+        capacity_obj = self.get_capacity_by_affiliate(affiliate)
+        if capacity_obj:
+            return capacity_obj.capacity
 
     def does_affiliate_have_capacity(self, affiliate_name):
         capacity_obj = self.get_capacity_by_affiliate(affiliate_name)
@@ -38,9 +155,7 @@ class CapacityManager(object):
         return False
 
     def get_capacity_by_affiliate(self, affiliate):
-        for capacity in self.capacities:
-            if capacity.ap == affiliate:
-                return capacity
+        return self._capacities_by_affiliate.get(affiliate)
 
     def get_highest_capacity_by_affiliates(self, affiliates):
         capacities = []
@@ -52,19 +167,30 @@ class CapacityManager(object):
         return None
 
     def get_highest_capacity_percentage_by_affiliates(self, affiliates):
-        capacities = []
-        for ap in affiliates:
-            capacities.append(self.get_capacity_by_affiliate(ap))
-
-        for cap in capacities:
-            self.logger.debug("Capacity of {0} is {1}.".format(cap.ap, cap.available_capacity_percentage()))
-        highest_capacities = sorted(capacities, key=lambda x: x.available_capacity_percentage(), reverse=True)
-        if highest_capacities:
-            self.logger.debug("Returning the highest capacity ap: {0}".format(highest_capacities[0].ap))
-            return highest_capacities[0]
-        return None
+        """
+        Return the capacity with the highest available percentage among the given affiliates.  Affiliates that are
+        exhausted or have no capacity defined are skipped.
+        :param affiliates: List
+        :return: Capacity
+        """
+        highest_capacity = self._capacity_ranking.get_highest_percentage_by_affiliates(affiliates)
+        if highest_capacity:
+            self.logger.debug("Returning the highest capacity ap: %s", highest_capacity.ap)
+        return highest_capacity
 
     def decrement_capacity_from_affiliate(self, affiliate):
         capacity_obj = self.get_capacity_by_affiliate(affiliate)
         if capacity_obj:
             capacity_obj.decrement_capacity()
+            self._capacity_ranking.update_capacity(capacity_obj)
+
+    def release_capacity_from_affiliate(self, affiliate):
+        """
+        Give back one unit of capacity consumed from an affiliate, up to the capacity it started with.
+        :param affiliate: String
+        :return: None
+        """
+        capacity_obj = self.get_capacity_by_affiliate(affiliate)
+        if capacity_obj:
+            capacity_obj.increment_capacity()
+            self._capacity_ranking.update_capacity(capacity_obj)
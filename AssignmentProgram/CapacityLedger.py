@@ -0,0 +1,180 @@
+import copy
+import itertools
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+from AssignmentProgram.Capacity import Capacity, CapacityManager
+
+RESERVED = 'reserved'
+COMMITTED = 'committed'
+RELEASED = 'released'
+
+# One change of a capacity slot recorded by a ledger, in the order the changes were made.
+AuditEntry = namedtuple('AuditEntry', ['timestamp', 'action', 'reservation_id', 'ap', 'medicaid_id'])
+
+
+class CapacityLedger(object):
+    """
+    Thread-safe ledger of the capacity of a CapacityManager.  A slot is taken with reserve, which atomically checks
+    and decrements the capacity of the AP, then the reservation is either kept with commit or given back with release.
+    Every reservation, commit and release is recorded in the audit trail with the member the slot is for.
+    """
+    def __init__(self, capacity_manager):
+        self.capacity_manager = capacity_manager
+        self._lock = threading.Lock()
+        self._reservations = {}
+        self._reservation_ids = itertools.count(1)
+        self.audit_trail = []
+
+    def _audit(self, action, reservation_id, ap, medicaid_id):
+        self.audit_trail.append(AuditEntry(datetime.now().isoformat(), action, reservation_id, ap, medicaid_id))
+
+    def _get_reserved(self, reservation_id):
+        reservation = self._reservations.get(reservation_id)
+        if reservation is None or reservation["status"] != RESERVED:
+            raise ValueError("Error: Reservation {0} is not reserved.".format(reservation_id))
+        return reservation
+
+    def reserve(self, ap, medicaid_id=None):
+        """
+        Take one slot of an AP for a member when the AP still has capacity.
+        :param ap: String
+        :param medicaid_id: String of the member the slot is reserved for
+        :return: Integer reservation ID, None when the AP has no capacity left
+        """
+        with self._lock:
+            if not self.capacity_manager.does_affiliate_have_capacity(ap):
+                return None
+            self.capacity_manager.decrement_capacity_from_affiliate(ap)
+            reservation_id = next(self._reservation_ids)
+            self._reservations[reservation_id] = {"ap": ap, "medicaid_id": medicaid_id, "status": RESERVED}
+            self._audit(RESERVED, reservation_id, ap, medicaid_id)
+            return reservation_id
+
+    def commit(self, reservation_id):
+        with self._lock:
+            reservation = self._get_reserved(reservation_id)
+            reservation["status"] = COMMITTED
+            self._audit(COMMITTED, reservation_id, reservation["ap"], reservation["medicaid_id"])
+
+    def release(self, reservation_id):
+        """
+        Give the slot of a reservation that was not committed back to its AP.
+        :param reservation_id: Integer
+        :return: None
+        """
+        with self._lock:
+            reservation = self._get_reserved(reservation_id)
+            self.capacity_manager.release_capacity_from_affiliate(reservation["ap"])
+            reservation["status"] = RELEASED
+            self._audit(RELEASED, reservation_id, reservation["ap"], reservation["medicaid_id"])
+
+    def get_capacity_snapshot(self):
+        """
+        Return a copy of the current capacity, for evaluating the rules without consuming the ledger capacity.
+        :return: CapacityManager
+        """
+        with self._lock:
+            return copy.deepcopy(self.capacity_manager)
+
+
+class SqliteCapacityLedger(object):
+    """
+    CapacityLedger keeping the capacity, the reservations and the audit trail in a SQLite database, so several
+    processes can share the same capacity.  Every change runs in an immediate transaction and the check-and-decrement
+    of reserve is a single conditional UPDATE, so a slot can never be reserved twice.
+    """
+    def __init__(self, database_location, all_capacities=None):
+        """
+        :param database_location: String
+        :param all_capacities: List of Capacity initializing the APs missing from the database
+        """
+        self.database_location = database_location
+        self._lock = threading.Lock()
+        # Transactions are started explicitly with BEGIN IMMEDIATE, see _transaction.
+        self._connection = sqlite3.connect(database_location, timeout=30, isolation_level=None,
+                                           check_same_thread=False)
+        with self._transaction() as cursor:
+            cursor.execute("CREATE TABLE IF NOT EXISTS capacity ("
+                           "ap TEXT PRIMARY KEY, capacity INTEGER NOT NULL, capacity_available INTEGER NOT NULL)")
+            cursor.execute("CREATE TABLE IF NOT EXISTS reservation ("
+                           "reservation_id INTEGER PRIMARY KEY AUTOINCREMENT, ap TEXT NOT NULL, medicaid_id TEXT, "
+                           "status TEXT NOT NULL)")
+            cursor.execute("CREATE TABLE IF NOT EXISTS audit ("
+                           "entry_id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, action TEXT NOT NULL, "
+                           "reservation_id INTEGER, ap TEXT, medicaid_id TEXT)")
+            for capacity in all_capacities or []:
+                if capacity.ap is not None:
+                    cursor.execute("INSERT OR IGNORE INTO capacity (ap, capacity, capacity_available) VALUES (?, ?, ?)",
+                                   (capacity.ap, capacity.capacity, capacity.capacity_available))
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    @staticmethod
+    def _audit(cursor, action, reservation_id, ap, medicaid_id):
+        cursor.execute("INSERT INTO audit (timestamp, action, reservation_id, ap, medicaid_id) VALUES (?, ?, ?, ?, ?)",
+                       (datetime.now().isoformat(), action, reservation_id, ap, medicaid_id))
+
+    @staticmethod
+    def _get_reserved(cursor, reservation_id):
+        row = cursor.execute("SELECT ap, medicaid_id, status FROM reservation WHERE reservation_id = ?",
+                             (reservation_id,)).fetchone()
+        if row is None or row[2] != RESERVED:
+            raise ValueError("Error: Reservation {0} is not reserved.".format(reservation_id))
+        return row[0], row[1]
+
+    def close(self):
+        self._connection.close()
+
+    def reserve(self, ap, medicaid_id=None):
+        with self._transaction() as cursor:
+            cursor.execute("UPDATE capacity SET capacity = capacity - 1 WHERE ap = ? AND capacity > 0", (ap,))
+            if cursor.rowcount != 1:
+                return None
+            cursor.execute("INSERT INTO reservation (ap, medicaid_id, status) VALUES (?, ?, ?)",
+                           (ap, medicaid_id, RESERVED))
+            reservation_id = cursor.lastrowid
+            self._audit(cursor, RESERVED, reservation_id, ap, medicaid_id)
+            return reservation_id
+
+    def commit(self, reservation_id):
+        with self._transaction() as cursor:
+            ap, medicaid_id = self._get_reserved(cursor, reservation_id)
+            cursor.execute("UPDATE reservation SET status = ? WHERE reservation_id = ?", (COMMITTED, reservation_id))
+            self._audit(cursor, COMMITTED, reservation_id, ap, medicaid_id)
+
+    def release(self, reservation_id):
+        with self._transaction() as cursor:
+            ap, medicaid_id = self._get_reserved(cursor, reservation_id)
+            cursor.execute("UPDATE capacity SET capacity = MIN(capacity + 1, capacity_available) WHERE ap = ?", (ap,))
+            cursor.execute("UPDATE reservation SET status = ? WHERE reservation_id = ?", (RELEASED, reservation_id))
+            self._audit(cursor, RELEASED, reservation_id, ap, medicaid_id)
+
+    def get_capacity_snapshot(self):
+        capacities = []
+        with self._transaction() as cursor:
+            for ap, capacity, capacity_available in cursor.execute(
+                    "SELECT ap, capacity, capacity_available FROM capacity ORDER BY rowid"):
+                capacity_obj = Capacity(ap, capacity_available)
+                capacity_obj.capacity = capacity
+                capacities.append(capacity_obj)
+        return CapacityManager(capacities)
+
+    @property
+    def audit_trail(self):
+        with self._transaction() as cursor:
+            return [AuditEntry(*row) for row in cursor.execute(
+                "SELECT timestamp, action, reservation_id, ap, medicaid_id FROM audit ORDER BY entry_id")]
@@ -0,0 +1,140 @@
+import csv
+import os
+from itertools import islice
+
+from openpyxl import load_workbook
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    # pyarrow is optional, Parquet files cannot be read without it.
+    pq = None
+
+# Yellow fill used in the zip code Excel sheet to indicate the priority AP of a zip code.
+PRIORITY_FILL_COLOR = 'FFFFFF00'
+# Flat files cannot carry a fill, the priority AP of a zip code is written with this marker appended, e.g. "Lynn*".
+PRIORITY_MARKER = '*'
+
+
+def check_file_exists(file_location):
+    if not os.path.exists(file_location):
+        raise FileNotFoundError("Error: Unable to locate file: {0}".format(file_location))
+
+
+class InputAdapter(object):
+    """
+    Base class of the input adapters.  An input adapter streams the data rows of an input file as tuples of cell values
+    ordered by column, so the column letters of the existing column maps resolve to the same index whatever the file
+    format is.
+    """
+    def iter_rows(self, file_location, min_row=2, priority_indexes=None):
+        """
+        Stream the row values of a file starting at min_row, using the row numbering of a spreadsheet where the first
+        row holds the column headers.
+        :param file_location: String
+        :param min_row: Integer
+        :param priority_indexes: Set of column indexes whose priority fill is converted into the PRIORITY_MARKER
+        :return: Generator of Tuple
+        """
+        raise NotImplementedError
+
+
+class ExcelInputAdapter(InputAdapter):
+    """
+    Stream the active sheet of an Excel workbook using openpyxl's read-only mode.  Only the row currently being parsed
+    is held in memory and the workbook is closed once all rows have been consumed.
+    """
+    def iter_rows(self, file_location, min_row=2, priority_indexes=None):
+        check_file_exists(file_location)
+        wb = load_workbook(file_location, read_only=True)
+        try:
+            active_sheet = wb.active
+            # The dimensions stored in the file are not trusted since a stale value would silently truncate the rows.
+            active_sheet.reset_dimensions()
+            if not priority_indexes:
+                for row_values in active_sheet.iter_rows(min_row=min_row, values_only=True):
+                    yield row_values
+                return
+            for row_cells in active_sheet.iter_rows(min_row=min_row):
+                yield tuple(self.get_cell_value(cell, index in priority_indexes)
+                            for index, cell in enumerate(row_cells))
+        finally:
+            wb.close()
+
+    @staticmethod
+    def get_cell_value(cell, check_priority):
+        value = cell.value
+        if check_priority and value and isinstance(value, str) \
+                and cell.fill.start_color.index == PRIORITY_FILL_COLOR:
+            return value + PRIORITY_MARKER
+        return value
+
+
+class CsvInputAdapter(InputAdapter):
+    """
+    Stream a CSV file with the csv module.  Every cell is read as text and empty cells are None.
+    """
+    def iter_rows(self, file_location, min_row=2, priority_indexes=None):
+        check_file_exists(file_location)
+        # utf-8-sig drops the byte order mark Excel writes at the start of a CSV file.
+        with open(file_location, newline='', encoding='utf-8-sig') as f:
+            for row in islice(csv.reader(f), min_row - 1, None):
+                yield tuple(value or None for value in row)
+
+
+class ParquetInputAdapter(InputAdapter):
+    """
+    Stream a Parquet file one record batch at a time using pyarrow.  The column headers are part of the Parquet schema,
+    so the first record is the second row of the equivalent spreadsheet.
+    """
+    def iter_rows(self, file_location, min_row=2, priority_indexes=None):
+        if pq is None:
+            raise ImportError("Error: pyarrow is required to read Parquet file: {0}".format(file_location))
+        check_file_exists(file_location)
+        parquet_file = pq.ParquetFile(file_location)
+        rows = (row_values for batch in parquet_file.iter_batches()
+                for row_values in zip(*(column.to_pylist() for column in batch.columns)))
+        for row_values in islice(rows, min_row - 2, None):
+            yield row_values
+
+
+INPUT_ADAPTERS = {
+    "excel": ExcelInputAdapter(),
+    "csv": CsvInputAdapter(),
+    "parquet": ParquetInputAdapter()
+}
+
+INPUT_FORMAT_EXTENSIONS = {
+    ".xlsx": "excel",
+    ".xlsm": "excel",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet"
+}
+
+
+def get_input_format(file_location, input_format=None):
+    """
+    Return the name of the input format of a file, either the one given or the one matching the file extension.
+    :param file_location: String
+    :param input_format: String such as "excel", "csv" or "parquet", detected from the file extension when empty
+    :return: String
+    """
+    if not input_format:
+        extension = os.path.splitext(file_location)[1].lower()
+        input_format = INPUT_FORMAT_EXTENSIONS.get(extension)
+        if input_format is None:
+            raise ValueError("Error: Unable to determine the input format of file: {0}".format(file_location))
+    if input_format not in INPUT_ADAPTERS:
+        raise ValueError("Error: Unknown input format: {0}".format(input_format))
+    return input_format
+
+
+def get_input_adapter(file_location, input_format=None):
+    """
+    Return the InputAdapter reading a file, see get_input_format.
+    :param file_location: String
+    :param input_format: String
+    :return: InputAdapter
+    """
+    return INPUT_ADAPTERS[get_input_format(file_location, input_format)]
@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+import pickle
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIRECTORY = '.assignment_cache'
+DEFAULT_MAX_SIZE_BYTES = 256 * 2 ** 20
+CACHE_FILE_EXTENSION = '.pickle'
+
+
+def get_file_hash(file_location, chunk_size=2 ** 20):
+    """
+    Return the SHA-256 hex digest of the content of a file.
+    :param file_location: String
+    :param chunk_size: Integer of bytes read at a time
+    :return: String
+    """
+    file_hash = hashlib.sha256()
+    with open(file_location, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class ParsedInputCache(object):
+    """
+    On-disk cache of the objects parsed from an input file such as the zipcode or capacity workbook.  Entries are
+    pickled and keyed by the content hash of the file, the parser and the parser version, so an unchanged file is
+    loaded without being parsed again while any change to the file or to the parser misses the cache.  The least
+    recently used entries are evicted once the cache grows beyond max_size_bytes.
+    """
+    def __init__(self, cache_directory=DEFAULT_CACHE_DIRECTORY, parser_version=1, max_size_bytes=DEFAULT_MAX_SIZE_BYTES,
+                 rebuild=False):
+        """
+        :param cache_directory: String
+        :param parser_version: Integer, part of every key so a parser change invalidates the cached objects
+        :param max_size_bytes: Integer
+        :param rebuild: Boolean to parse every file again and replace its cached objects
+        """
+        self.cache_directory = cache_directory
+        self.parser_version = parser_version
+        self.max_size_bytes = max_size_bytes
+        self.rebuild = rebuild
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, file_location, parse, input_format=None):
+        key_hash = hashlib.sha256()
+        for key_part in (get_file_hash(file_location), parse.__module__, parse.__name__, input_format,
+                         self.parser_version):
+            key_hash.update(repr(key_part).encode())
+        return key_hash.hexdigest()
+
+    def get_cache_location(self, key):
+        return os.path.join(self.cache_directory, key + CACHE_FILE_EXTENSION)
+
+    def load(self, file_location, parse, input_format=None):
+        """
+        Return the objects parsed from a file, from the cache when an entry exists for its current content.  On a miss
+        the file is parsed with parse(file_location, input_format) and the result is added to the cache.
+        :param file_location: String
+        :param parse: Function such as process_zipcodes or process_capacity
+        :param input_format: String
+        :return: Objects returned by parse
+        """
+        if not os.path.exists(file_location):
+            raise FileNotFoundError("Error: Unable to locate file: {0}".format(file_location))
+        cache_location = self.get_cache_location(self.get_key(file_location, parse, input_format))
+        if not self.rebuild and os.path.exists(cache_location):
+            try:
+                with open(cache_location, 'rb') as f:
+                    parsed_objects = pickle.load(f)
+            except Exception as e:
+                logger.warning("Unable to read cache entry %s, parsing %s again: %s", cache_location, file_location, e)
+            else:
+                self.hits += 1
+                # The modification time orders the entries for eviction.
+                os.utime(cache_location)
+                logger.debug("Loaded %s from cache entry %s", file_location, cache_location)
+                return parsed_objects
+
+        self.misses += 1
+        parsed_objects = parse(file_location, input_format)
+        try:
+            self.store(cache_location, parsed_objects)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.warning("Unable to cache the objects parsed from %s: %s", file_location, e)
+        return parsed_objects
+
+    def store(self, cache_location, parsed_objects):
+        os.makedirs(self.cache_directory, exist_ok=True)
+        # Written to a temporary file first so a concurrent or interrupted run never reads a partial entry.
+        temporary_location = "{0}.{1}.tmp".format(cache_location, os.getpid())
+        try:
+            with open(temporary_location, 'wb') as f:
+                pickle.dump(parsed_objects, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            os.remove(temporary_location)
+            raise
+        os.replace(temporary_location, cache_location)
+        self.evict(keep_location=cache_location)
+
+    def evict(self, keep_location=None):
+        """
+        Remove the least recently used entries until the cache fits in max_size_bytes.
+        :param keep_location: String of an entry never removed, such as the one just written
+        :return: Integer of entries removed
+        """
+        entries = []
+        for file_name in os.listdir(self.cache_directory):
+            if file_name.endswith(CACHE_FILE_EXTENSION):
+                entry_location = os.path.join(self.cache_directory, file_name)
+                entry_stat = os.stat(entry_location)
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, entry_location))
+        cache_size = sum(entry_size for _, entry_size, _ in entries)
+        removed = 0
+        for _, entry_size, entry_location in sorted(entries):
+            if cache_size <= self.max_size_bytes:
+                break
+            if entry_location == keep_location:
+                continue
+            os.remove(entry_location)
+            cache_size -= entry_size
+            removed += 1
+        return removed
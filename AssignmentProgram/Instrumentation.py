@@ -0,0 +1,193 @@
+import json
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # The resource module is not available on Windows, peak RSS is reported as unknown there.
+    resource = None
+
+
+def get_peak_rss_bytes():
+    """
+    Return the peak resident set size of the current process in bytes, or None when it cannot be determined.
+    :return: Integer
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else.
+    if sys.platform == 'darwin':
+        return peak_rss
+    return peak_rss * 1024
+
+
+class StageMetrics(object):
+    """
+    Timings and counters recorded for a single stage of an assignment run.  The peak RSS of a process only ever grows,
+    so max_rss_so_far_bytes is the peak of the process up to the end of the stage, which may have been reached by an
+    earlier stage, and max_rss_growth_bytes is how much the stage raised that peak.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.wall_time = None
+        self.cpu_time = None
+        self.max_rss_so_far_bytes = None
+        self.max_rss_growth_bytes = None
+        self.counters = {}
+
+    def count(self, counter, value):
+        self.counters[counter] = value
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "max_rss_so_far_bytes": self.max_rss_so_far_bytes,
+            "max_rss_growth_bytes": self.max_rss_growth_bytes,
+            "counters": dict(self.counters)
+        }
+
+
+class RunReport(object):
+    """
+    Collects StageMetrics for each stage of an assignment run so a slow run can be attributed to a stage without
+    attaching a profiler.  The report can be written as JSON and summarized on the console.
+    """
+    def __init__(self):
+        self.started = datetime.now()
+        self.stages = []
+        self.rule_profiler = None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager measuring the wall time, CPU time and peak RSS growth of the enclosed stage.  The yielded
+        StageMetrics is used to record the counters of the stage.
+        :param name: String
+        :return: StageMetrics
+        """
+        metrics = StageMetrics(name)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        max_rss_start = get_peak_rss_bytes()
+        try:
+            yield metrics
+        finally:
+            metrics.wall_time = time.perf_counter() - wall_start
+            metrics.cpu_time = time.process_time() - cpu_start
+            metrics.max_rss_so_far_bytes = get_peak_rss_bytes()
+            if max_rss_start is not None:
+                metrics.max_rss_growth_bytes = metrics.max_rss_so_far_bytes - max_rss_start
+            self.stages.append(metrics)
+
+    def get_stage(self, name):
+        for metrics in self.stages:
+            if metrics.name == name:
+                return metrics
+        return None
+
+    def to_dict(self):
+        peak_rss = [metrics.max_rss_so_far_bytes for metrics in self.stages if metrics.max_rss_so_far_bytes is not None]
+        return {
+            "started": self.started.isoformat(),
+            "wall_time": sum(metrics.wall_time for metrics in self.stages),
+            "cpu_time": sum(metrics.cpu_time for metrics in self.stages),
+            "peak_rss_bytes": max(peak_rss) if peak_rss else None,
+            "stages": [metrics.to_dict() for metrics in self.stages],
+            "rules": self.rule_profiler.to_dict() if self.rule_profiler else None
+        }
+
+    def write_json(self, report_location):
+        with open(report_location, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary_lines(self):
+        """
+        Format one line per stage with its timings, peak RSS growth and counters.
+        :return: List of String
+        """
+        lines = []
+        for metrics in self.stages:
+            max_rss_growth = "n/a"
+            if metrics.max_rss_growth_bytes is not None:
+                max_rss_growth = "+{0:.1f} MiB".format(metrics.max_rss_growth_bytes / 2 ** 20)
+            counters = ", ".join("{0}={1}".format(counter, value) for counter, value in metrics.counters.items())
+            lines.append("{0:<32} wall {1:>9.3f}s | cpu {2:>9.3f}s | rss growth {3:>11} | {4}".format(
+                metrics.name, metrics.wall_time, metrics.cpu_time, max_rss_growth, counters))
+        report = self.to_dict()
+        peak_rss = "n/a"
+        if report["peak_rss_bytes"] is not None:
+            peak_rss = "{0:.1f} MiB".format(report["peak_rss_bytes"] / 2 ** 20)
+        lines.append("{0:<32} wall {1:>9.3f}s | cpu {2:>9.3f}s | peak rss {3:>11}".format(
+            "total", report["wall_time"], report["cpu_time"], peak_rss))
+        if self.rule_profiler:
+            lines.extend(self.rule_profiler.summary_lines())
+        return lines
+
+
+class RuleProfile(object):
+    """
+    Statistics aggregated for every evaluation of one Rule class.
+    """
+    def __init__(self, rule_name):
+        self.rule_name = rule_name
+        self.invocations = 0
+        self.matches = 0
+        self.cumulative_time = 0.0
+        self.exceptions = Counter()
+
+    def to_dict(self):
+        return {
+            "invocations": self.invocations,
+            "matches": self.matches,
+            "cumulative_time": self.cumulative_time,
+            "exceptions": dict(self.exceptions)
+        }
+
+
+class RuleProfiler(object):
+    """
+    Optional hook for RuleProcessing and RulePipeline that aggregates, per Rule class, how often the rule is evaluated,
+    how often it is met, the rule exceptions it registers by AssignmentError type and the time spent in process_rule.
+    FailedAssignmentRule ends the cascade without a match, so its evaluations count the members left unassigned.
+    """
+    def __init__(self):
+        self.rule_profiles = {}
+
+    def record_rule(self, rule, elapsed):
+        """
+        Record one evaluation of a rule, called right after its process_rule returns.
+        :param rule: Rule
+        :param elapsed: Float of CPU seconds spent in process_rule.  CPU time rather than wall time keeps the timings
+        comparable when process pool workers finding the candidates share the CPUs with the main process.
+        :return: None
+        """
+        rule_name = rule.__class__.__name__
+        rule_profile = self.rule_profiles.get(rule_name)
+        if rule_profile is None:
+            rule_profile = self.rule_profiles[rule_name] = RuleProfile(rule_name)
+        rule_profile.invocations += 1
+        rule_profile.cumulative_time += elapsed
+        if rule.rule_match:
+            rule_profile.matches += 1
+        for rule_exception in rule.get_all_rule_exceptions():
+            rule_profile.exceptions[rule_exception.assignment_error_type.__class__.__name__] += 1
+
+    def to_dict(self):
+        return {rule_name: rule_profile.to_dict() for rule_name, rule_profile in self.rule_profiles.items()}
+
+    def summary_lines(self):
+        lines = []
+        for rule_profile in self.rule_profiles.values():
+            exceptions = ", ".join("{0}={1}".format(error_type, count)
+                                   for error_type, count in sorted(rule_profile.exceptions.items()))
+            lines.append("{0:<45} calls {1:>9} | matches {2:>9} | time {3:>9.3f}s | {4}".format(
+                rule_profile.rule_name, rule_profile.invocations, rule_profile.matches, rule_profile.cumulative_time,
+                exceptions))
+        return lines
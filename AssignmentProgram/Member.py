@@ -4,6 +4,10 @@ class Member(object):
     Affiliate objects to represent that data.  This is used to condense the multiple duplicated rows for a given member
     and put the data that differs as new Affiliate objects associated to any given instance of a member object.
     """
+    __slots__ = ('affiliates', 'medicaid_id', 'last_name', 'first_name', 'middle_initial', 'date_of_birth',
+                 'residential_address_zipcode_1', 'identification_flag', 'is_assigned', 'assignment_written',
+                 'source_rows')
+
     def __init__(self, medicaid_id, last_name, first_name, middle_initial, date_of_birth, residential_address_zipcode_1,
                  identification_flag):
         self.affiliates = []
@@ -16,6 +20,8 @@ class Member(object):
         self.identification_flag = identification_flag
         self.is_assigned = False
         self.assignment_written = False
+        # Row numbers of the MassHealth rows the member was parsed from, only recorded for the single-pass writeback.
+        self.source_rows = None
 
     def add_affiliate(self, affiliate):
         self.affiliates.append(affiliate)
@@ -47,24 +53,62 @@ class Member(object):
         self.is_assigned = False
 
 
+# Service flags packed into the Affiliate.service_flags bitmask, one bit per service column of the workbook.
+SERVICE_ACCS = 1 << 0
+SERVICE_PCP = 1 << 1
+SERVICE_CBFS = 1 << 2
+SERVICE_PACT = 1 << 3
+SERVICE_RESPITE_OR_CSS = 1 << 4
+SERVICE_OUT_PATIENT = 1 << 5
+SERVICE_DAY_TREATMENT = 1 << 6
+SERVICE_CSP = 1 << 7
+SERVICE_EMERGENCY_SVS = 1 << 8
+SERVICE_LTSS = 1 << 9
+
+BEHAVIORAL_HEALTH_SERVICES = SERVICE_PACT | SERVICE_RESPITE_OR_CSS | SERVICE_OUT_PATIENT | SERVICE_DAY_TREATMENT \
+    | SERVICE_CSP | SERVICE_EMERGENCY_SVS
+
+
+def service_flag_property(service_flag):
+    """
+    Build a boolean property that reads and writes a single bit of Affiliate.service_flags.
+    :param service_flag: Integer
+    :return: property
+    """
+    def get_flag(self):
+        return bool(self.service_flags & service_flag)
+
+    def set_flag(self, val):
+        if val:
+            self.service_flags |= service_flag
+        else:
+            self.service_flags &= ~service_flag
+    return property(get_flag, set_flag)
+
+
 class Affiliate(object):
     """
     A composition class associated with members as a way to condense and manage a member with multiple rows in the
-    workbook.
+    workbook.  The service columns of a row are stored as bits of a single integer so a rule can test a set of services
+    with one mask operation.  The is_* properties remain available for reading and writing individual services.
     """
-    def __init__(self, affiliate_name):
+    __slots__ = ('_affiliate_name', 'service_flags', 'assigned_to')
+
+    is_accs = service_flag_property(SERVICE_ACCS)
+    is_pcp = service_flag_property(SERVICE_PCP)
+    is_cbfs = service_flag_property(SERVICE_CBFS)
+    is_pact = service_flag_property(SERVICE_PACT)
+    is_respite_or_css = service_flag_property(SERVICE_RESPITE_OR_CSS)
+    is_out_patient = service_flag_property(SERVICE_OUT_PATIENT)
+    is_day_treatment = service_flag_property(SERVICE_DAY_TREATMENT)
+    is_csp = service_flag_property(SERVICE_CSP)
+    is_emergency_svs = service_flag_property(SERVICE_EMERGENCY_SVS)
+    is_ltss = service_flag_property(SERVICE_LTSS)
+
+    def __init__(self, affiliate_name, service_flags=0):
         self._affiliate_name = None
         self.affiliate_name = affiliate_name
-        self.is_accs = False
-        self.is_pcp = False
-        self.is_cbfs = False
-        self.is_pact = False
-        self.is_respite_or_css = False
-        self.is_out_patient = False
-        self.is_day_treatment = False
-        self.is_csp = False
-        self.is_emergency_svs = False
-        self.is_ltss = False
+        self.service_flags = service_flags
         self.assigned_to = None
 
     @property
@@ -75,3 +119,82 @@ class Affiliate(object):
     def affiliate_name(self, val):
         if val:
             self._affiliate_name = val.strip().lower()
+
+    def has_any_service(self, service_flags):
+        return bool(self.service_flags & service_flags)
+
+    def has_services(self, service_flags, without_service_flags=0):
+        """
+        Check that every service in service_flags is set and none of the services in without_service_flags are.
+        :param service_flags: Integer
+        :param without_service_flags: Integer
+        :return: Boolean
+        """
+        return self.service_flags & (service_flags | without_service_flags) == service_flags
+
+
+class MemberManager(object):
+    """
+    Helper class used to manage the unique Member objects parsed from the MassHealth workbook.  Members are indexed by
+    their identity (medicaid ID, last name, first name, middle initial and date of birth) and by their name and date of
+    birth alone so that duplicate detection during ingest does not have to scan every previously parsed member.
+    """
+    def __init__(self, members=None):
+        self._members = []
+        self._members_by_identity = {}
+        self._members_by_name_and_dob = {}
+        self.rows_merged = 0
+        for member in members or []:
+            self.add_member(member)
+
+    @staticmethod
+    def identity_key(member):
+        return (member.medicaid_id, member.last_name, member.first_name, member.middle_initial,
+                member.date_of_birth)
+
+    @staticmethod
+    def name_and_dob_key(member):
+        return member.last_name, member.first_name, member.middle_initial, member.date_of_birth
+
+    @property
+    def members(self):
+        return self._members
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def __len__(self):
+        return len(self._members)
+
+    def add_member(self, member):
+        self._members.append(member)
+        self._members_by_identity[self.identity_key(member)] = member
+        self._members_by_name_and_dob.setdefault(self.name_and_dob_key(member), []).append(member)
+
+    def contains_member(self, member):
+        return self.identity_key(member) in self._members_by_identity
+
+    def get_member(self, member):
+        return self._members_by_identity.get(self.identity_key(member))
+
+    def get_members_with_different_medicaid_id(self, member):
+        return [existing_member for existing_member in
+                self._members_by_name_and_dob.get(self.name_and_dob_key(member), [])
+                if existing_member.medicaid_id != member.medicaid_id]
+
+    def merge_member(self, member):
+        """
+        Add the member when it has not been seen before, otherwise append its affiliates to the existing member.
+        :param member: Member
+        :return: Member
+        """
+        self.rows_merged += 1
+        existing_member = self.get_member(member)
+        if existing_member is None:
+            self.add_member(member)
+            return member
+        for affiliate in member.affiliates:
+            existing_member.add_affiliate(affiliate)
+        if member.source_rows is not None:
+            existing_member.source_rows.extend(member.source_rows)
+        return existing_member
@@ -0,0 +1,85 @@
+import csv
+import json
+import os
+from collections import namedtuple
+
+from openpyxl import Workbook
+
+# One MassHealth row matched to a member.  assigned_to is the affiliate written for the row, None when the row only
+# duplicates a member already written, and duplicate is True when the row is a duplicate of a member.
+AssignmentRecord = namedtuple('AssignmentRecord', ['row', 'medicaid_id', 'assigned_to', 'duplicate'])
+
+
+class AssignmentSink(object):
+    """
+    Base class of the output sinks streaming AssignmentRecord tuples to a file, as an alternative to rewriting the
+    MassHealth workbook in place.  Only the records are held by the sink, never the source workbook.
+    """
+    def __init__(self, output_location):
+        self.output_location = output_location
+
+    def write(self, records):
+        """
+        Write the records to the output file.
+        :param records: Iterable of AssignmentRecord
+        :return: Integer of records written
+        """
+        raise NotImplementedError
+
+
+class ExcelAssignmentSink(AssignmentSink):
+    """
+    Stream the records to a write-only openpyxl workbook, one row per record below a header row.
+    """
+    def write(self, records):
+        wb = Workbook(write_only=True)
+        active_sheet = wb.create_sheet()
+        active_sheet.append(AssignmentRecord._fields)
+        records_written = 0
+        for record in records:
+            active_sheet.append(record)
+            records_written += 1
+        wb.save(self.output_location)
+        return records_written
+
+
+class CsvAssignmentSink(AssignmentSink):
+    def write(self, records):
+        records_written = 0
+        with open(self.output_location, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(AssignmentRecord._fields)
+            for record in records:
+                writer.writerow(record)
+                records_written += 1
+        return records_written
+
+
+class JsonlAssignmentSink(AssignmentSink):
+    def write(self, records):
+        records_written = 0
+        with open(self.output_location, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record._asdict(), default=str))
+                f.write('\n')
+                records_written += 1
+        return records_written
+
+
+OUTPUT_SINK_EXTENSIONS = {
+    ".xlsx": ExcelAssignmentSink,
+    ".csv": CsvAssignmentSink,
+    ".jsonl": JsonlAssignmentSink
+}
+
+
+def get_output_sink(output_location):
+    """
+    Return the AssignmentSink matching the extension of the output file.
+    :param output_location: String
+    :return: AssignmentSink
+    """
+    extension = os.path.splitext(output_location)[1].lower()
+    if extension not in OUTPUT_SINK_EXTENSIONS:
+        raise ValueError("Error: Unable to determine the output format of file: {0}".format(output_location))
+    return OUTPUT_SINK_EXTENSIONS[extension](output_location)
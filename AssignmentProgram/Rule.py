@@ -24,12 +24,24 @@ Assignment Criteria, in order of importance:
 assigned to the program that matches the Zip code and which has the highest percentage of current capacity.
 """
 import logging
+from time import process_time
+
+from AssignmentProgram.Member import BEHAVIORAL_HEALTH_SERVICES, SERVICE_ACCS, SERVICE_CBFS
 
 
 class Rule(object):
     """
     Base class used for generic Rule management.
+
+    A rule is evaluated in two steps.  find_candidates only reads the member and the zipcode manager and returns the
+    affiliates the rule could assign, then apply_candidates checks and consumes capacity for those candidates.  Because
+    the first step never touches capacity it can be computed ahead of time, e.g. in a process pool, and handed to
+    apply_candidates later with the same outcome as process_rule.
     """
+    # Rules that only update member data, without consuming capacity, are applied while finding candidates so the
+    # candidates of later rules reflect their update.
+    updates_member_only = False
+
     def __init__(self):
         self.rule_priority_base_multiplier = 100
         self.rule_priority = None
@@ -43,8 +55,50 @@ class Rule(object):
         self.logger = logging.getLogger(__name__)
 
     def process_rule(self):
+        self.apply_candidates(self.find_candidates())
+
+    def find_candidates(self):
+        """
+        Capacity independent part of the rule.  The returned value must be picklable.
+        :return: Object passed to apply_candidates
+        """
+        return None
+
+    def apply_candidates(self, candidates):
         raise NotImplementedError("Error: This method should be implemented in child class!")
 
+    def get_candidate_affiliates(self, candidates):
+        """
+        Names of the affiliates the rule could assign the member to whatever their capacity, used by the global
+        assignment solver.  Rules that never assign a member return an empty list.
+        :param candidates: Object returned by find_candidates for the current member
+        :return: List of String
+        """
+        return []
+
+    def get_affiliate_names(self, affiliate_indexes):
+        return [self.member.affiliates[index].affiliate_name for index in affiliate_indexes
+                if self.member.affiliates[index].affiliate_name]
+
+    def get_affiliate_indexes(self, condition):
+        """
+        Find the position of every member affiliate meeting a condition.
+        :param condition: Function taking an Affiliate and returning a Boolean
+        :return: List of Integer
+        """
+        return [index for index, affiliate in enumerate(self.member.affiliates) if condition(affiliate)]
+
+    def reset(self, member):
+        """
+        Clear the state left by the previous member so a single Rule instance can be evaluated for many members.
+        :param member: Member
+        :return: None
+        """
+        self.member = member
+        self.rule_match = False
+        self._rule_exceptions = []
+        self.assigned_member_affiliate_name = None
+
     def is_rule_met(self):
         return self.rule_match
 
@@ -86,6 +140,15 @@ class Rule(object):
     def zipcode_manager(self, val):
         self._zipcode_manager = val
 
+    def release_member_assignment(self):
+        """
+        Remove the assignments of the member and give back the capacity its assignment by this rule consumed.
+        :return: None
+        """
+        if self.member.is_assigned:
+            self.capacity_manager.release_capacity_from_affiliate(self.member.affiliates[0].assigned_to)
+        self.member.remove_all_affiliate_assignments()
+
     def register_rule_exception(self, member_rule_exception):
         self._rule_exceptions.append(member_rule_exception)
 
@@ -115,45 +178,52 @@ class ClientZipcodeInAPServiceAreaRule(Rule):
         super().__init__()
         self.rule_priority = priority * self.rule_priority_base_multiplier
 
-    def process_rule(self):
-        self.logger.debug(
-            'Rule {0} being processed for member {1}'.format(self.__class__.__name__, self.member.medicaid_id))
+    def find_candidates(self):
         member_zipcode = self.member.residential_address_zipcode_1
         if member_zipcode:
             affiliates_in_zipcode = self._zipcode_manager.get_affiliates_from_zipcode(member_zipcode)
-            if not affiliates_in_zipcode:
+            return bool(affiliates_in_zipcode), [ap for ap in affiliates_in_zipcode
+                                                 if self.member.has_affiliate_relationship(ap)]
+        return None
+
+    def get_candidate_affiliates(self, candidates):
+        return list(candidates[1]) if candidates else []
+
+    def apply_candidates(self, candidates):
+        self.logger.debug('Rule %s being processed for member %s', self.__class__.__name__, self.member.medicaid_id)
+        member_zipcode = self.member.residential_address_zipcode_1
+        if candidates:
+            has_affiliates_in_zipcode, related_aps = candidates
+            if not has_affiliates_in_zipcode:
                 message = "The member zipcode: {0} does not have any matching affiliates.".format(member_zipcode)
                 self.register_rule_exception(MemberRuleException(self.member,
                                                                  NoMatchingAffiliateAssignmentError(message),
                                                                  rule=self))
 
-            for ap in affiliates_in_zipcode:
-                if self.member.has_affiliate_relationship(ap):
-                    self.assigned_member_affiliate_name = ap
-                    if self.does_ap_have_capacity():
-                        if not self.member.is_assigned:
-                            self.member.assign_first_affiliate(ap)
-                            self.capacity_manager.decrement_capacity_from_affiliate(ap)
-                            self.rule_match = True
-                        else:
-                            message = "Member {0} has multiple assigned affiliates and needs manual processing.".format(
-                                self.member.medicaid_id)
-                            self.register_rule_exception(MemberRuleException(self.member,
-                                                                             MultipleAffiliateAssignmentError(message),
-                                                                             rule=self))
-                            self.logger.debug(
-                                'Warning, rule {0} met an exception with message: {1}.'.format(self.__class__.__name__,
-                                                                                               message))
-                            self.member.remove_all_affiliate_assignments()
-                            return
+            for ap in related_aps:
+                self.assigned_member_affiliate_name = ap
+                if self.does_ap_have_capacity():
+                    if not self.member.is_assigned:
+                        self.member.assign_first_affiliate(ap)
+                        self.capacity_manager.decrement_capacity_from_affiliate(ap)
+                        self.rule_match = True
                     else:
-                        message = "The assigned affiliate: {0} does not have capacity.".format(ap)
+                        message = "Member {0} has multiple assigned affiliates and needs manual processing.".format(
+                            self.member.medicaid_id)
                         self.register_rule_exception(MemberRuleException(self.member,
-                                                                         NoCapacityAssignmentError(message),
+                                                                         MultipleAffiliateAssignmentError(message),
                                                                          rule=self))
-                        self.logger.debug(
-                            'Warning, rule {0} met an exception with message: {1}'.format(self.__class__.__name__,
-                                                                                          message))
+                        self.logger.debug('Warning, rule %s met an exception with message: %s.',
+                                          self.__class__.__name__, message)
+                        self.release_member_assignment()
+                        return
+                else:
+                    message = "The assigned affiliate: {0} does not have capacity.".format(ap)
+                    self.register_rule_exception(MemberRuleException(self.member,
+                                                                     NoCapacityAssignmentError(message),
+                                                                     rule=self))
+                    self.logger.debug('Warning, rule %s met an exception with message: %s',
+                                      self.__class__.__name__, message)
 
 
 class CurrentACCSclientAPorganizationRule(Rule):
@@ -168,34 +238,44 @@ class CurrentACCSclientAPorganizationRule(Rule):
         super().__init__()
         self.rule_priority = priority * self.rule_priority_base_multiplier
 
-    def process_rule(self):
-        self.logger.debug(
-            'Rule {0} being processed for member {1}'.format(self.__class__.__name__, self.member.medicaid_id))
+    def find_candidates(self):
         # look for ACCS field in Affiliates
-        for affiliate in self.member.affiliates:
-            if affiliate.is_accs:
-                self.process_match_and_capacity(affiliate)
+        return self.get_affiliate_indexes(lambda affiliate: affiliate.is_accs)
+
+    def get_candidate_affiliates(self, candidates):
+        return self.get_affiliate_names(candidates)
+
+    def apply_candidates(self, candidates):
+        self.logger.debug('Rule %s being processed for member %s', self.__class__.__name__, self.member.medicaid_id)
+        for index in candidates:
+            self.process_match_and_capacity(self.member.affiliates[index])
 
 
 class SetACCSRule(Rule):
     """
     Rule used for handling the assignments of members based on numerous conditions and priorities outlined below:
     """
+    updates_member_only = True
+
     def __init__(self, priority=250):
         super().__init__()
         self.rule_priority = priority
 
-    def process_rule(self):
-        self.logger.debug(
-            'Rule {0} being processed for member {1}'.format(self.__class__.__name__, self.member.medicaid_id))
-        for affiliate in self.member.affiliates:
-            if affiliate.is_accs is False \
-                    and affiliate.affiliate_name is None \
-                    and affiliate.is_cbfs is True:
-                if self.member.identification_flag.lower() == "accs":
-                    # TODO - change to logger instead of printing to stdout
-                    # print("Rule met and set accs to True for {0}".format(self.member.first_name))
-                    affiliate.is_accs = True
+    def find_candidates(self):
+        affiliate_indexes = []
+        for index, affiliate in enumerate(self.member.affiliates):
+            if affiliate.affiliate_name is None \
+                    and affiliate.has_services(SERVICE_CBFS, without_service_flags=SERVICE_ACCS):
+                if self.member.identification_flag and self.member.identification_flag.lower() == "accs":
+                    affiliate_indexes.append(index)
+        return affiliate_indexes
+
+    def apply_candidates(self, candidates):
+        self.logger.debug('Rule %s being processed for member %s', self.__class__.__name__, self.member.medicaid_id)
+        for index in candidates:
+            # TODO - change to logger instead of printing to stdout
+            # print("Rule met and set accs to True for {0}".format(self.member.first_name))
+            self.member.affiliates[index].is_accs = True
 
 
 class CurrentPCPClientAPOrganizationRule(Rule):
@@ -207,12 +287,16 @@ class CurrentPCPClientAPOrganizationRule(Rule):
         super().__init__()
         self.rule_priority = priority * self.rule_priority_base_multiplier
 
-    def process_rule(self):
-        self.logger.debug(
-            'Rule {0} being processed for member {1}'.format(self.__class__.__name__, self.member.medicaid_id))
-        for affiliate in self.member.affiliates:
-            if affiliate.is_pcp:
-                self.process_match_and_capacity(affiliate)
+    def find_candidates(self):
+        return self.get_affiliate_indexes(lambda affiliate: affiliate.is_pcp)
+
+    def get_candidate_affiliates(self, candidates):
+        return self.get_affiliate_names(candidates)
+
+    def apply_candidates(self, candidates):
+        self.logger.debug('Rule %s being processed for member %s', self.__class__.__name__, self.member.medicaid_id)
+        for index in candidates:
+            self.process_match_and_capacity(self.member.affiliates[index])
 
 
 class FormerCBFSWithoutTransitionACCSRule(Rule):
@@ -228,12 +312,17 @@ class FormerCBFSWithoutTransitionACCSRule(Rule):
         super().__init__()
         self.rule_priority = priority * self.rule_priority_base_multiplier
 
-    def process_rule(self):
-        self.logger.debug(
-            'Rule {0} being processed for member {1}'.format(self.__class__.__name__, self.member.medicaid_id))
-        for affiliate in self.member.affiliates:
-            if affiliate.is_cbfs and not affiliate.is_accs:
-                self.process_match_and_capacity(affiliate)
+    def find_candidates(self):
+        return self.get_affiliate_indexes(
+            lambda affiliate: affiliate.has_services(SERVICE_CBFS, without_service_flags=SERVICE_ACCS))
+
+    def get_candidate_affiliates(self, candidates):
+        return self.get_affiliate_names(candidates)
+
+    def apply_candidates(self, candidates):
+        self.logger.debug('Rule %s being processed for member %s', self.__class__.__name__, self.member.medicaid_id)
+        for index in candidates:
+            self.process_match_and_capacity(self.member.affiliates[index])
 
 
 class ClientOfBehavioralServiceAPRule(Rule):
@@ -251,25 +340,24 @@ class ClientOfBehavioralServiceAPRule(Rule):
         super().__init__()
         self.rule_priority = priority * self.rule_priority_base_multiplier
 
-    def process_rule(self):
-        self.logger.debug(
-            'Rule {0} being processed for member {1}'.format(self.__class__.__name__, self.member.medicaid_id))
-        for affiliate in self.member.affiliates:
-            if affiliate.is_pact \
-                    or affiliate.is_respite_or_css \
-                    or affiliate.is_out_patient \
-                    or affiliate.is_day_treatment \
-                    or affiliate.is_csp \
-                    or affiliate.is_emergency_svs:
-                if not self.rule_match:
-                    self.process_match_and_capacity(affiliate)
-                else:
-                    message = "Member {0} has multiple assigned affiliates and needs manual processing.".format(
-                        self.member.medicaid_id)
-                    self.register_rule_exception(MemberRuleException(self.member,
-                                                                     MultipleAffiliateAssignmentError(message),
-                                                                     rule=self))
-                    self.member.remove_all_affiliate_assignments()
+    def find_candidates(self):
+        return self.get_affiliate_indexes(lambda affiliate: affiliate.has_any_service(BEHAVIORAL_HEALTH_SERVICES))
+
+    def get_candidate_affiliates(self, candidates):
+        return self.get_affiliate_names(candidates)
+
+    def apply_candidates(self, candidates):
+        self.logger.debug('Rule %s being processed for member %s', self.__class__.__name__, self.member.medicaid_id)
+        for index in candidates:
+            if not self.rule_match:
+                self.process_match_and_capacity(self.member.affiliates[index])
+            else:
+                message = "Member {0} has multiple assigned affiliates and needs manual processing.".format(
+                    self.member.medicaid_id)
+                self.register_rule_exception(MemberRuleException(self.member,
+                                                                 MultipleAffiliateAssignmentError(message),
+                                                                 rule=self))
+                self.release_member_assignment()
 
 
 class ClientOfLTSSatAPRule(Rule):
@@ -281,12 +369,16 @@ class ClientOfLTSSatAPRule(Rule):
         super().__init__()
         self.rule_priority = priority * self.rule_priority_base_multiplier
 
-    def process_rule(self):
-        self.logger.debug(
-            'Rule {0} being processed for member {1}'.format(self.__class__.__name__, self.member.medicaid_id))
-        for affiliate in self.member.affiliates:
-            if affiliate.is_ltss:
-                self.process_match_and_capacity(affiliate)
+    def find_candidates(self):
+        return self.get_affiliate_indexes(lambda affiliate: affiliate.is_ltss)
+
+    def get_candidate_affiliates(self, candidates):
+        return self.get_affiliate_names(candidates)
+
+    def apply_candidates(self, candidates):
+        self.logger.debug('Rule %s being processed for member %s', self.__class__.__name__, self.member.medicaid_id)
+        for index in candidates:
+            self.process_match_and_capacity(self.member.affiliates[index])
 
 
 class ClientNoPriorHistoryZipcodeCapacityMatchRule(Rule):
@@ -300,32 +392,43 @@ class ClientNoPriorHistoryZipcodeCapacityMatchRule(Rule):
         self.rule_priority = priority * self.rule_priority_base_multiplier
         self._affiliate_partner_list = ["riverside", "lynn", "nsmha", "edinburg", "uphams", "dimock", "brookline"]
 
-    def process_rule(self):
-        self.logger.debug(
-            'Rule {0} being processed for member {1}'.format(self.__class__.__name__, self.member.medicaid_id))
-        for affiliate in self.member.affiliates:
-            if affiliate.affiliate_name not in self._affiliate_partner_list:
-                # Match zipcode then find AP with highest current capacity
-                member_zipcode = self.member.residential_address_zipcode_1
-                if member_zipcode:
-                    affiliates_in_zipcode = self._zipcode_manager.get_affiliates_from_zipcode(member_zipcode)
-                    if not affiliates_in_zipcode:
-                        message = "The member zipcode: {0} does not have any matching affiliates."\
-                            .format(member_zipcode)
-                        self.register_rule_exception(MemberRuleException(self.member,
-                                                                         NoMatchingAffiliateAssignmentError(message),
-                                                                         rule=self))
-                    highest_capacity_ap = self.capacity_manager.get_highest_capacity_percentage_by_affiliates(
-                        affiliates_in_zipcode)
-                    if highest_capacity_ap:
-                        self.member.assign_first_affiliate(highest_capacity_ap.ap)
-                        self.capacity_manager.decrement_capacity_from_affiliate(highest_capacity_ap.ap)
-                        self.rule_match = True
-                    else:
-                        message = "No capacity found for affiliate: {0}.".format(affiliates_in_zipcode)
-                        self.register_rule_exception(MemberRuleException(self.member,
-                                                                         NoCapacityAssignmentError(message),
-                                                                         rule=self))
+    def find_candidates(self):
+        non_partner_affiliates = len(self.get_affiliate_indexes(
+            lambda affiliate: affiliate.affiliate_name not in self._affiliate_partner_list))
+        affiliates_in_zipcode = None
+        member_zipcode = self.member.residential_address_zipcode_1
+        if non_partner_affiliates and member_zipcode:
+            affiliates_in_zipcode = self._zipcode_manager.get_affiliates_from_zipcode(member_zipcode)
+        return non_partner_affiliates, affiliates_in_zipcode
+
+    def get_candidate_affiliates(self, candidates):
+        non_partner_affiliates, affiliates_in_zipcode = candidates
+        return list(affiliates_in_zipcode) if non_partner_affiliates and affiliates_in_zipcode else []
+
+    def apply_candidates(self, candidates):
+        self.logger.debug('Rule %s being processed for member %s', self.__class__.__name__, self.member.medicaid_id)
+        non_partner_affiliates, affiliates_in_zipcode = candidates
+        member_zipcode = self.member.residential_address_zipcode_1
+        for _ in range(non_partner_affiliates):
+            # Match zipcode then find AP with highest current capacity
+            if affiliates_in_zipcode is not None:
+                if not affiliates_in_zipcode:
+                    message = "The member zipcode: {0} does not have any matching affiliates."\
+                        .format(member_zipcode)
+                    self.register_rule_exception(MemberRuleException(self.member,
+                                                                     NoMatchingAffiliateAssignmentError(message),
+                                                                     rule=self))
+                highest_capacity_ap = self.capacity_manager.get_highest_capacity_percentage_by_affiliates(
+                    affiliates_in_zipcode)
+                if highest_capacity_ap:
+                    self.member.assign_first_affiliate(highest_capacity_ap.ap)
+                    self.capacity_manager.decrement_capacity_from_affiliate(highest_capacity_ap.ap)
+                    self.rule_match = True
+                else:
+                    message = "No capacity found for affiliate: {0}.".format(list(affiliates_in_zipcode))
+                    self.register_rule_exception(MemberRuleException(self.member,
+                                                                     NoCapacityAssignmentError(message),
+                                                                     rule=self))
 
 
 class FailedAssignmentRule(Rule):
@@ -340,9 +443,8 @@ class FailedAssignmentRule(Rule):
         super().__init__()
         self.rule_priority = priority
 
-    def process_rule(self):
-        self.logger.warning(
-            'Rule {0} being processed for member {1}'.format(self.__class__.__name__, self.member.medicaid_id))
+    def apply_candidates(self, candidates):
+        self.logger.warning('Rule %s being processed for member %s', self.__class__.__name__, self.member.medicaid_id)
         message = "Warning: Failed member assignment.  Unable to process member after using all registered rules."
         self.register_rule_exception(MemberRuleException(self.member, AssignmentError(message), rule=self))
         self.rule_match = False
@@ -374,11 +476,12 @@ class RuleProcessing(object):
     Also managed the rule exceptions that are generated through processing and can be called to process after rules
     are run.  This class holds handles to the member, capacity manager, and zipcode manager.
     """
-    def __init__(self, member, capacity_manager, zipcode_manager):
+    def __init__(self, member, capacity_manager, zipcode_manager, rule_profiler=None):
         self._rules = []
         self.member = member
         self.capacity_manager = capacity_manager
         self.zipcode_manager = zipcode_manager
+        self.rule_profiler = rule_profiler
         self._member_rule_exceptions = []
         self.logger = logging.getLogger(__name__)
 
@@ -412,14 +515,110 @@ class RuleProcessing(object):
     def process(self):
         if not self.member.is_assigned:
             for rule in self.get_rules_prioritized():
-                rule.process_rule()
+                if self.rule_profiler is None:
+                    rule.process_rule()
+                else:
+                    started = process_time()
+                    rule.process_rule()
+                    self.rule_profiler.record_rule(rule, process_time() - started)
                 self.member_rule_exceptions = rule.get_all_rule_exceptions()
                 if rule.is_rule_met():
-                    self.logger.info(
-                        'Rule selected: {0} | Member: {1}'.format(rule.__class__.__name__, self.member.medicaid_id))
+                    # FailedAssignmentRule ends the cascade without selecting an affiliate.
+                    if rule.rule_match:
+                        self.logger.info('Rule selected: %s | Member: %s', rule.__class__.__name__,
+                                         self.member.medicaid_id)
                     return
 
 
+class RulePipeline(object):
+    """
+    A reusable alternative to RuleProcessing for applying the same set of rules to many members.  The rules are
+    validated for priority conflicts and sorted once when the pipeline is built, then every member is evaluated against
+    the same Rule instances which are reset between members instead of being created again.
+    """
+    def __init__(self, rules, capacity_manager, zipcode_manager, rule_profiler=None):
+        self.capacity_manager = capacity_manager
+        self.zipcode_manager = zipcode_manager
+        self.rule_profiler = rule_profiler
+        self.check_rules_have_priority_conflict(rules)
+        for rule in rules:
+            rule.zipcode_manager = zipcode_manager
+            rule.capacity_manager = capacity_manager
+        self._rules = tuple(sorted(rules, key=lambda x: x.rule_priority))
+        self.logger = logging.getLogger(__name__)
+        self.members_processed = 0
+        self.rule_evaluations = 0
+        self.rule_exceptions = 0
+
+    @staticmethod
+    def check_rules_have_priority_conflict(rules):
+        rules_by_priority = {}
+        for rule in rules:
+            if rule.rule_priority in rules_by_priority:
+                raise Exception("Multiple rules {0} and {1} conflict with the same priority.".format(
+                    rules_by_priority[rule.rule_priority], rule))
+            rules_by_priority[rule.rule_priority] = rule
+
+    @property
+    def rules(self):
+        return self._rules
+
+    def find_candidates(self, member, candidate_times=None):
+        """
+        Run the capacity independent part of every rule for a member.  Rules that only update member data are applied
+        so the candidates of the rules after them match what they would see during process.
+        :param member: Member
+        :param candidate_times: List receiving the CPU seconds spent finding the candidates of each rule, not timed
+        when None
+        :return: List with the candidates of each prioritized rule
+        """
+        candidates_by_rule = []
+        for rule in self._rules:
+            started = process_time() if candidate_times is not None else None
+            rule.reset(member)
+            candidates = rule.find_candidates()
+            if rule.updates_member_only:
+                rule.apply_candidates(candidates)
+            if started is not None:
+                candidate_times.append(process_time() - started)
+            candidates_by_rule.append(candidates)
+        return candidates_by_rule
+
+    def process(self, member, candidates_by_rule=None, candidate_times=None):
+        """
+        Apply the prioritized rules to a member until one of them is met.
+        :param member: Member
+        :param candidates_by_rule: List from find_candidates computed ahead of time, rules find their own when None
+        :param candidate_times: List of seconds from find_candidates, added to the profiled time of each rule applied
+        so the profile matches the one of rules finding their own candidates
+        :return: List of MemberRuleException
+        """
+        member_rule_exceptions = []
+        self.members_processed += 1
+        if not member.is_assigned:
+            for rule_index, rule in enumerate(self._rules):
+                rule.reset(member)
+                started = process_time() if self.rule_profiler is not None else None
+                if candidates_by_rule is None:
+                    rule.process_rule()
+                else:
+                    rule.apply_candidates(candidates_by_rule[rule_index])
+                if started is not None:
+                    elapsed = process_time() - started
+                    if candidate_times is not None:
+                        elapsed += candidate_times[rule_index]
+                    self.rule_profiler.record_rule(rule, elapsed)
+                self.rule_evaluations += 1
+                member_rule_exceptions.extend(rule.get_all_rule_exceptions())
+                if rule.is_rule_met():
+                    # FailedAssignmentRule ends the cascade without selecting an affiliate.
+                    if rule.rule_match:
+                        self.logger.info('Rule selected: %s | Member: %s', rule.__class__.__name__, member.medicaid_id)
+                    break
+        self.rule_exceptions += len(member_rule_exceptions)
+        return member_rule_exceptions
+
+
 class AssignmentError(object):
     """
     Basic parent error type to be extended to manage errors by class type
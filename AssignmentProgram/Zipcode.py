@@ -1,9 +1,15 @@
+from types import MappingProxyType
+
+
 class Zipcode(object):
     """
     Class used to represent Zipcodes defined in the Excel workbook.  An instance of a Zipcode will have helper method
     properties to act on the data defined within a Zipcode object.  A ZipcodeManager class instance is typically
     used for managing one or more Zipcode object throughout the processing.
     """
+    __slots__ = ('city_town', '_zipcode', '_ap_lynn', '_ap_nsmha', '_ap_edinburg', '_ap_riverside', '_ap_uphams',
+                 '_ap_dimock', '_ap_brookline', '_ap_priority', '_all_available_aps')
+
     def __init__(self, city_town, zipcode):
         self.city_town = city_town
         self._zipcode = None
@@ -28,11 +34,12 @@ class Zipcode(object):
 
     @property
     def all_available_aps(self):
-        # Moving the ap marked as priority to the first in the list
+        # The ap marked as priority is ordered first, followed by the remaining aps in column order.
         if self._ap_priority:
-            self._all_available_aps.insert(0, self._all_available_aps.pop(
-                self._all_available_aps.index(self._ap_priority)))
-        return self._all_available_aps
+            priority_index = self._all_available_aps.index(self._ap_priority)
+            return (self._ap_priority,) + tuple(self._all_available_aps[:priority_index]) \
+                + tuple(self._all_available_aps[priority_index + 1:])
+        return tuple(self._all_available_aps)
 
     @property
     def zipcode(self):
@@ -136,25 +143,31 @@ class Zipcode(object):
 
 class ZipcodeManager(object):
     """
-    Helper class used to manage one or more Zipcode objects.
+    Helper class used to manage one or more Zipcode objects.  The priority ordered aps of each zipcode are resolved
+    once when the manager is created so lookups during rule processing do not scan or reorder the Zipcode objects.
     """
     def __init__(self, zipcode_objects):
         self._all_zipcode_objects = zipcode_objects
+        zipcodes_by_zipcode = {}
+        for zipcode_object in zipcode_objects:
+            # The first row defined for a zipcode wins, matching the previous linear lookups.
+            zipcodes_by_zipcode.setdefault(zipcode_object.zipcode, zipcode_object)
+        self._zipcodes_by_zipcode = MappingProxyType(zipcodes_by_zipcode)
+        self._affiliates_by_zipcode = MappingProxyType(
+            {zipcode: zipcode_object.all_available_aps for zipcode, zipcode_object in zipcodes_by_zipcode.items()})
+
+    def __len__(self):
+        return len(self._zipcodes_by_zipcode)
+
+    def __reduce__(self):
+        # The read-only mappings cannot be pickled, they are rebuilt from the Zipcode objects instead.
+        return self.__class__, (self._all_zipcode_objects,)
 
     def contains_zipcode(self, requested_zipcode):
-        for zipcode_object in self._all_zipcode_objects:
-            if zipcode_object.zipcode == requested_zipcode:
-                return True
-        return False
+        return requested_zipcode in self._zipcodes_by_zipcode
 
     def get_zipcode(self, requested_zipcode):
-        for zipcode_object in self._all_zipcode_objects:
-            if zipcode_object.zipcode == requested_zipcode:
-                return zipcode_object
-        return None
+        return self._zipcodes_by_zipcode.get(requested_zipcode)
 
     def get_affiliates_from_zipcode(self, requested_zipcode):
-        zipcode_object = self.get_zipcode(requested_zipcode)
-        if zipcode_object:
-            return zipcode_object.all_available_aps
-        return []
+        return self._affiliates_by_zipcode.get(requested_zipcode, ())
@@ -1,8 +1,28 @@
 import argparse
+import copy
+import glob
+import logging
 import os
+import time
 import toml
 from AssignmentProgram.AssignmentProcessing import generate_zipcodes_manager, generate_capacities_manager, \
-    generate_members, process_rules, generate_stats, update_masshealth_assignments
+    generate_members, process_rules, generate_stats, update_masshealth_assignments, configure_logging, PARSER_VERSION, \
+    replay_assignments, write_assignment_records, load_masshealth_workbook, process_sheet_members, update_member_rows, \
+    parse_member_files, process_capacity
+from AssignmentProgram.Capacity import CapacityManager
+from AssignmentProgram.CapacityLedger import CapacityLedger, SqliteCapacityLedger
+from AssignmentProgram.AssignmentSolver import GlobalAssignmentSolver
+from AssignmentProgram.AssignmentServer import AssignmentService, create_assignment_server
+from AssignmentProgram.AssignmentState import AssignmentStateStore, get_context_fingerprint, get_member_fingerprint
+from AssignmentProgram.InputAdapters import get_input_format, INPUT_FORMAT_EXTENSIONS
+from AssignmentProgram.InputCache import ParsedInputCache, DEFAULT_CACHE_DIRECTORY, DEFAULT_MAX_SIZE_BYTES
+from AssignmentProgram.Instrumentation import RunReport, RuleProfiler
+from AssignmentProgram.Member import MemberManager
+
+logger = logging.getLogger(__name__)
+
+# Suffix of the default assignments file written next to a MassHealth file.
+ASSIGNMENTS_FILE_SUFFIX = '_assignments'
 
 
 def set_args():
@@ -36,6 +56,103 @@ def set_args():
                            metavar="zipcode.xlsx",
                            nargs=1,
                            type=str)
+    parser.add_argument("-B", "--batch",
+                        help='Process every MassHealth file in a directory or matching a glob pattern against the '
+                             'same zipcode and capacity files, one assignments file is written per MassHealth file.',
+                        action="store",
+                        dest='batch',
+                        metavar="masshealth_directory",
+                        nargs=1,
+                        type=str)
+    parser.add_argument("--watch",
+                        help='Keep running and process every MassHealth file landing in this inbox directory.',
+                        action="store",
+                        dest='watch',
+                        metavar="inbox_directory",
+                        nargs=1,
+                        type=str)
+    parser.add_argument("--serve",
+                        help='Serve single member assignment requests over HTTP on this local port.',
+                        action="store",
+                        dest='serve',
+                        metavar="8080",
+                        nargs=1,
+                        type=int)
+    parser.add_argument("--capacity-ledger",
+                        help='SQLite file holding the capacity, reservations and audit trail of the served requests, '
+                             'shared by every server using the same file.',
+                        action="store",
+                        dest='capacityledger',
+                        metavar="capacity_ledger.sqlite",
+                        nargs=1,
+                        type=str)
+    parser.add_argument("--poll-interval",
+                        help='Seconds between two polls of the inbox directory in watch mode.',
+                        action="store",
+                        dest='pollinterval',
+                        metavar="5",
+                        default=5.0,
+                        type=float)
+    parser.add_argument("-R", "--run-report",
+                        help='Write the per stage timings and counters of the run to a JSON file, in watch mode '
+                             'the report of the last file processed.',
+                        action="store",
+                        dest='runreport',
+                        metavar="run_report.json",
+                        nargs=1,
+                        type=str)
+    parser.add_argument("-P", "--profile-rules",
+                        help='Collect per rule invocations, matches, exceptions and timings for the run report.',
+                        action="store_true",
+                        dest='profilerules')
+    parser.add_argument("-W", "--workers",
+                        help='Number of processes used to find the rule candidates of the members.',
+                        action="store",
+                        dest='workers',
+                        metavar="1",
+                        default=1,
+                        type=int)
+    parser.add_argument("-G", "--global-assignment",
+                        help='Assign the members with a minimum cost flow over all members and APs instead of the '
+                             'rule cascade in row order, and report how many more members are placed.',
+                        action="store_true",
+                        dest='globalassignment')
+    parser.add_argument("-I", "--incremental",
+                        help='Reuse the assignments of the members unchanged since the previous run stored in this '
+                             'SQLite file and only apply the rules to new or changed members.',
+                        action="store",
+                        dest='incremental',
+                        metavar="assignment_state.sqlite",
+                        nargs=1,
+                        type=str)
+    output_group = parser.add_mutually_exclusive_group(required=False)
+    output_group.add_argument("-O", "--output-file",
+                              help='Write the row, medicaid ID, assignment and duplicate flag of every matched '
+                                   'MassHealth row to an Excel, CSV or JSONL file.  Defaults to '
+                                   '<masshealth>_assignments.xlsx.',
+                              action="store",
+                              dest='outputfile',
+                              metavar="assignments.xlsx",
+                              nargs=1,
+                              type=str)
+    output_group.add_argument("--in-place",
+                              help='Write the assignments into the MassHealth workbook instead of an output file.',
+                              action="store_true",
+                              dest='inplace')
+    output_group.add_argument("--single-pass",
+                              help='Load the MassHealth workbook once and write the assignments into it directly at '
+                                   'the rows each member was parsed from.',
+                              action="store_true",
+                              dest='singlepass')
+    cache_group = parser.add_mutually_exclusive_group(required=False)
+    cache_group.add_argument("--no-cache",
+                             help='Parse the zipcode and capacity files without using the parsed input cache.',
+                             action="store_true",
+                             dest='nocache')
+    cache_group.add_argument("--rebuild-cache",
+                             help='Parse the zipcode and capacity files again and replace their cached objects.',
+                             action="store_true",
+                             dest='rebuildcache')
     group = parser.add_mutually_exclusive_group(required=False)
     group.add_argument("-C", "--config-file",
                        help='Path to the configuration file used to define the source files.',
@@ -66,6 +183,16 @@ def main():
     zipcode_file_location = None
     apply_capacities = True
     mark_member_duplicates = False
+    log_level = 'INFO'
+    log_file_location = 'assignment_program.log'
+    run_report_location = None
+    input_format = None
+    cache_directory = DEFAULT_CACHE_DIRECTORY
+    cache_max_size_bytes = DEFAULT_MAX_SIZE_BYTES
+    input_cache = None
+    state_location = None
+    output_location = None
+    in_place = False
 
     if args.test:
         # Establishing that this works on a basic level.  This will eventually become useful.
@@ -93,6 +220,14 @@ def main():
                 zipcode_file_location = config['files_config']['zipcode_location']
                 apply_capacities = config['assignment_options']['apply_capacities']
                 mark_member_duplicates = config['assignment_options']['mark_member_duplicates']
+                input_format = config['files_config'].get('input_format') or None
+                output_location = config.get('output', {}).get('output_location') or None
+                in_place = config.get('output', {}).get('in_place', in_place)
+                log_level = config.get('logging', {}).get('level', log_level)
+                log_file_location = config.get('logging', {}).get('log_file_location', log_file_location)
+                cache_directory = config.get('cache', {}).get('cache_directory', cache_directory)
+                if 'max_size_mb' in config.get('cache', {}):
+                    cache_max_size_bytes = config['cache']['max_size_mb'] * 2 ** 20
 
                 print("found these: "
                       "\nMassHealth: {0}\n"
@@ -107,21 +242,473 @@ def main():
     if args.markduplicates:
         mark_member_duplicates = True
 
+    if args.runreport:
+        run_report_location = args.runreport[0]
+
+    if args.incremental:
+        state_location = args.incremental[0]
+
+    if args.outputfile:
+        output_location = args.outputfile[0]
+        in_place = False
+    elif args.inplace:
+        in_place = True
+
+    if (args.batch or args.watch) and (args.outputfile or args.incremental or args.singlepass):
+        parser.error("--output-file, --incremental and --single-pass apply to a single MassHealth file and cannot be "
+                     "used with --batch or --watch")
+
+    if args.singlepass and masshealth_file_location and \
+            get_input_format(masshealth_file_location, input_format) != 'excel':
+        parser.error("--single-pass writes the assignments into the MassHealth workbook and requires an Excel input, "
+                     "use --output-file for CSV or Parquet input")
+
+    if in_place or args.singlepass:
+        output_location = None
+    elif not output_location and masshealth_file_location:
+        output_location = get_default_output_location(masshealth_file_location)
+
+    if not args.nocache:
+        input_cache = ParsedInputCache(cache_directory, PARSER_VERSION, cache_max_size_bytes, args.rebuildcache)
+
+    configure_logging(log_level, log_file_location)
+
+    if args.serve:
+        capacities_manager = generate_capacities_manager(capacity_file_location, input_format, input_cache)
+        if args.capacityledger:
+            capacity_ledger = SqliteCapacityLedger(args.capacityledger[0], capacities_manager.capacities)
+        else:
+            capacity_ledger = CapacityLedger(capacities_manager)
+        assignment_service = AssignmentService(
+            generate_zipcodes_manager(zipcode_file_location, input_format, input_cache), capacity_ledger)
+        server = create_assignment_server(assignment_service, port=args.serve[0])
+        logger.info("Serving assignment requests on http://%s:%s", *server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return
+
+    if args.watch:
+        InboxWatcher(args.watch[0], zipcode_file_location, capacity_file_location, args.pollinterval,
+                     mark_member_duplicates, args.workers, input_format, input_cache, args.globalassignment,
+                     run_report_location, args.profilerules, in_place).run()
+        return
+
+    if args.batch:
+        process_batch(zipcode_file_location, capacity_file_location, get_member_file_locations(args.batch[0]),
+                      mark_member_duplicates, run_report_location, args.profilerules, args.workers, input_format,
+                      input_cache, in_place, args.globalassignment)
+        return
+
     # TODO - check if all config parsing is good, run the program...
     process_all(zipcode_file_location, capacity_file_location,
-                masshealth_file_location, apply_capacities, mark_member_duplicates)
+                masshealth_file_location, apply_capacities, mark_member_duplicates, run_report_location,
+                args.profilerules, args.workers, input_format, input_cache, state_location,
+                output_location, args.singlepass, global_assignment=args.globalassignment)
+
+
+def get_default_output_location(masshealth_file_location):
+    """
+    Return the location of the assignments file written next to the MassHealth file when none is given.
+    :param masshealth_file_location: String
+    :return: String
+    """
+    return "{0}{1}.xlsx".format(os.path.splitext(masshealth_file_location)[0], ASSIGNMENTS_FILE_SUFFIX)
+
+
+def get_stage_name(name, member_file_location=None):
+    """
+    Return the run report stage name of a stage, qualified by the member file it processed in a batch.  The full
+    location is used since member files of different directories may share their file name.
+    :param name: String
+    :param member_file_location: String
+    :return: String
+    """
+    if member_file_location is None:
+        return name
+    return "{0} {1}".format(name, member_file_location)
+
+
+def generate_managers(run_report, zipcode_excel_location, capacity_excel_location, input_format=None,
+                      input_cache=None):
+    """
+    Parse the zipcode and capacity files into their managers, recording a stage for each.
+    :param run_report: RunReport
+    :param zipcode_excel_location: String
+    :param capacity_excel_location: String
+    :param input_format: String
+    :param input_cache: ParsedInputCache
+    :return: Tuple of ZipcodeManager and CapacityManager
+    """
+    with run_report.stage('generate_zipcodes_manager') as stage:
+        cache_hits = input_cache.hits if input_cache is not None else 0
+        zipcode_manager = generate_zipcodes_manager(zipcode_excel_location, input_format, input_cache)
+        stage.count('zipcodes', len(zipcode_manager))
+        if input_cache is not None:
+            stage.count('cache_hit', input_cache.hits > cache_hits)
+
+    with run_report.stage('generate_capacities_manager') as stage:
+        cache_hits = input_cache.hits if input_cache is not None else 0
+        capacities_manager = generate_capacities_manager(capacity_excel_location, input_format, input_cache)
+        stage.count('capacities', len(capacities_manager))
+        if input_cache is not None:
+            stage.count('cache_hit', input_cache.hits > cache_hits)
+    return zipcode_manager, capacities_manager
+
+
+def apply_rules(run_report, members, capacities_manager, zipcode_manager, workers=1, member_file_location=None,
+                global_assignment=False):
+    if global_assignment:
+        solve_global_assignment(run_report, members, capacities_manager, zipcode_manager, member_file_location)
+        return
+    with run_report.stage(get_stage_name('process_rules', member_file_location)) as stage:
+        rule_pipeline = process_rules(members, capacities_manager, zipcode_manager, run_report.rule_profiler, workers)
+        stage.count('members', rule_pipeline.members_processed)
+        stage.count('rule_evaluations', rule_pipeline.rule_evaluations)
+        stage.count('rule_exceptions', rule_pipeline.rule_exceptions)
+
+
+def solve_global_assignment(run_report, members, capacities_manager, zipcode_manager, member_file_location=None):
+    """
+    Assign the members with the GlobalAssignmentSolver instead of the rule cascade, and report how many more members
+    it places than the cascade would with the same capacity.
+    """
+    with run_report.stage(get_stage_name('solve_global_assignment', member_file_location)) as stage:
+        solver = GlobalAssignmentSolver(capacities_manager, zipcode_manager)
+        greedy_members_assigned = solver.count_greedy_assignments(members)
+        members_assigned = solver.solve(members)
+        stage.count('members', solver.members_processed)
+        stage.count('member_groups', solver.member_groups)
+        stage.count('members_assigned', members_assigned)
+        stage.count('greedy_members_assigned', greedy_members_assigned)
+        stage.count('additional_members_assigned', members_assigned - greedy_members_assigned)
+    logger.info("The global assignment placed %s members, %s more than the rule cascade",
+                members_assigned, members_assigned - greedy_members_assigned)
+
+
+def record_stats(run_report, all_members, member_file_location=None):
+    with run_report.stage(get_stage_name('generate_stats', member_file_location)) as stage:
+        for counter, value in generate_stats(all_members).items():
+            stage.count(counter, value)
+
+
+def write_assignments(run_report, all_members, masshealth_excel_location, mark_duplicates=False, input_format=None,
+                      output_location=None, member_file_location=None):
+    """
+    Write the assignments to the output file, or into the MassHealth workbook in place when there is none.
+    :param run_report: RunReport
+    :param all_members: List
+    :param masshealth_excel_location: String
+    :param mark_duplicates: Boolean
+    :param input_format: String
+    :param output_location: String
+    :param member_file_location: String qualifying the stage names in a batch
+    :return: None
+    """
+    if output_location:
+        with run_report.stage(get_stage_name('write_assignment_records', member_file_location)) as stage:
+            stage.count('rows', write_assignment_records(all_members, masshealth_excel_location, output_location,
+                                                         input_format))
+    elif get_input_format(masshealth_excel_location, input_format) == 'excel':
+        with run_report.stage(get_stage_name('update_masshealth_assignments', member_file_location)) as stage:
+            stage.count('rows', update_masshealth_assignments(all_members, masshealth_excel_location, mark_duplicates))
+    else:
+        logger.warning("Assignments are only written back to an Excel MassHealth workbook, %s was not updated",
+                       masshealth_excel_location)
+
+
+def finish_run_report(run_report, run_report_location=None):
+    for line in run_report.summary_lines():
+        logger.info(line)
+    if run_report_location:
+        run_report.write_json(run_report_location)
 
 
 def process_all(zipcode_excel_location, capacity_excel_location, masshealth_excel_location,
-                apply_capacities=True, mark_duplicates=False):
+                apply_capacities=True, mark_duplicates=False, run_report_location=None, profile_rules=False,
+                workers=1, input_format=None, input_cache=None, state_location=None, output_location=None,
+                single_pass=False, zipcode_manager=None, capacities_manager=None, global_assignment=False):
+    """
+    Run every stage of the assignment program, recording the timings and counters of each stage in a RunReport.
+    :param zipcode_excel_location: String
+    :param capacity_excel_location: String
+    :param masshealth_excel_location: String
+    :param apply_capacities: Boolean
+    :param mark_duplicates: Boolean
+    :param run_report_location: String location of the JSON run report, not written when None
+    :param profile_rules: Boolean to add per rule statistics to the run report
+    :param workers: Integer of processes used to evaluate the rules, see process_rules
+    :param input_format: String forcing the format of the input files, detected from each file extension when None
+    :param input_cache: ParsedInputCache used for the zipcode and capacity files, they are always parsed when None
+    :param state_location: String location of the AssignmentStateStore enabling the incremental mode, every member is
+    processed by the rules when None
+    :param output_location: String location of the Excel, CSV or JSONL file receiving the assignments, the MassHealth
+    workbook is updated in place when None
+    :param single_pass: Boolean to load the MassHealth workbook once for the ingest and for the writeback in place,
+    only supported for an Excel MassHealth workbook
+    :param zipcode_manager: ZipcodeManager already parsed from the zipcode file, see InboxWatcher
+    :param capacities_manager: CapacityManager already parsed from the capacity file, its capacity is consumed
+    :param global_assignment: Boolean to assign the members with the GlobalAssignmentSolver instead of the rule cascade
+    :return: RunReport
+    """
     # TODO - add in code to control capacity management flag: apply_capacities
-    zipcode_manager = generate_zipcodes_manager(zipcode_excel_location)
-    capacities_manager = generate_capacities_manager(capacity_excel_location)
-    all_members = generate_members(masshealth_excel_location)
+    if single_pass and get_input_format(masshealth_excel_location, input_format) != 'excel':
+        raise ValueError("Error: The single-pass mode requires an Excel MassHealth workbook: {0}".format(
+            masshealth_excel_location))
+    run_report = RunReport()
+    if profile_rules:
+        run_report.rule_profiler = RuleProfiler()
+    if zipcode_manager is None or capacities_manager is None:
+        zipcode_manager, capacities_manager = generate_managers(run_report, zipcode_excel_location,
+                                                                capacity_excel_location, input_format, input_cache)
+
+    with run_report.stage('generate_members') as stage:
+        member_manager = MemberManager()
+        if single_pass:
+            masshealth_workbook = load_masshealth_workbook(masshealth_excel_location)
+            all_members = process_sheet_members(masshealth_workbook.active, member_manager)
+        else:
+            all_members = generate_members(masshealth_excel_location, member_manager, input_format)
+        stage.count('rows', member_manager.rows_merged)
+        stage.count('members', len(all_members))
+
+    members_to_process = all_members
+    if state_location:
+        with run_report.stage('replay_assignments') as stage:
+            assignment_state = AssignmentStateStore(state_location)
+            context_fingerprint = get_context_fingerprint([zipcode_excel_location, capacity_excel_location],
+                                                          PARSER_VERSION)
+            member_fingerprints = [get_member_fingerprint(member) for member in all_members]
+            unchanged_members, members_to_process = assignment_state.split_members(all_members, member_fingerprints,
+                                                                                   context_fingerprint)
+            stage.count('unchanged_members', len(unchanged_members))
+            stage.count('members_assigned', replay_assignments(unchanged_members, capacities_manager))
+
+    apply_rules(run_report, members_to_process, capacities_manager, zipcode_manager, workers,
+                global_assignment=global_assignment)
+
+    if state_location:
+        with run_report.stage('save_assignment_state') as stage:
+            assignment_state.save(all_members, member_fingerprints, context_fingerprint)
+            assignment_state.close()
+            stage.count('members', len(all_members))
+
+    record_stats(run_report, all_members)
+
+    if single_pass:
+        with run_report.stage('update_member_rows') as stage:
+            stage.count('rows', update_member_rows(all_members, masshealth_workbook.active, mark_duplicates))
+            masshealth_workbook.save(masshealth_excel_location)
+    else:
+        write_assignments(run_report, all_members, masshealth_excel_location, mark_duplicates, input_format,
+                          output_location)
+
+    finish_run_report(run_report, run_report_location)
+    return run_report
+
+
+class InboxWatcher(object):
+    """
+    Long running service polling an inbox directory for MassHealth files and running process_all on each of them as
+    they land.  The zipcode and capacity files are parsed once and kept in memory, they are only parsed again when
+    their modification time or size changes, so the work per file is limited to the members.
+
+    A file is processed once its size and modification time are unchanged between two polls, which leaves time for
+    an upload to complete.  It is then moved to the processed directory, where its assignments file is written, or
+    to the failed directory when processing raises an exception.  The run report at run_report_location is written
+    again after every file, so it always holds the report of the last file processed.
+    """
+    def __init__(self, inbox_directory, zipcode_file_location, capacity_file_location, poll_interval=5.0,
+                 mark_duplicates=False, workers=1, input_format=None, input_cache=None, global_assignment=False,
+                 run_report_location=None, profile_rules=False, in_place=False):
+        self.inbox_directory = inbox_directory
+        self.processed_directory = os.path.join(inbox_directory, 'processed')
+        self.failed_directory = os.path.join(inbox_directory, 'failed')
+        self.zipcode_file_location = zipcode_file_location
+        self.capacity_file_location = capacity_file_location
+        self.poll_interval = poll_interval
+        self.mark_duplicates = mark_duplicates
+        self.workers = workers
+        self.input_format = input_format
+        self.input_cache = input_cache
+        self.global_assignment = global_assignment
+        self.run_report_location = run_report_location
+        self.profile_rules = profile_rules
+        self.in_place = in_place
+        self.files_processed = 0
+        self._zipcode_manager = None
+        self._capacities = None
+        self._manager_signatures = None
+        self._pending_signatures = {}
+
+    @staticmethod
+    def get_file_signature(file_location):
+        file_stat = os.stat(file_location)
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    def load_managers(self):
+        """
+        Parse the zipcode and capacity files when they changed since they were last parsed.
+        :return: Boolean, True when the files were parsed
+        """
+        manager_signatures = (self.get_file_signature(self.zipcode_file_location),
+                              self.get_file_signature(self.capacity_file_location))
+        if manager_signatures == self._manager_signatures:
+            return False
+        logger.info("Loading zipcode file %s and capacity file %s", self.zipcode_file_location,
+                    self.capacity_file_location)
+        self._zipcode_manager = generate_zipcodes_manager(self.zipcode_file_location, self.input_format,
+                                                          self.input_cache)
+        if self.input_cache is not None:
+            self._capacities = self.input_cache.load(self.capacity_file_location, process_capacity, self.input_format)
+        else:
+            self._capacities = process_capacity(self.capacity_file_location, self.input_format)
+        self._manager_signatures = manager_signatures
+        return True
+
+    def get_ready_files(self):
+        """
+        Return the member files of the inbox whose signature did not change since the previous poll.  A file removed or
+        renamed after the inbox was listed is skipped.
+        :return: List of String
+        """
+        ready_files = []
+        pending_signatures = {}
+        for member_file_location in get_member_file_locations(self.inbox_directory):
+            try:
+                signature = self.get_file_signature(member_file_location)
+            except FileNotFoundError:
+                logger.info("Member file removed before it was processed: %s", member_file_location)
+                continue
+            if self._pending_signatures.get(member_file_location) == signature:
+                ready_files.append(member_file_location)
+            else:
+                pending_signatures[member_file_location] = signature
+        self._pending_signatures = pending_signatures
+        return ready_files
+
+    def process_file(self, member_file_location):
+        """
+        Move a member file to the processed directory and run process_all on it with the warm managers.  Every file
+        starts from the full capacity, as a separate run of the program would.
+        :param member_file_location: String
+        :return: RunReport, None when the file was removed or processing failed
+        """
+        os.makedirs(self.processed_directory, exist_ok=True)
+        processed_location = os.path.join(self.processed_directory, os.path.basename(member_file_location))
+        try:
+            os.replace(member_file_location, processed_location)
+        except FileNotFoundError:
+            logger.info("Member file removed before it was processed: %s", member_file_location)
+            return None
+        try:
+            self.load_managers()
+            output_location = None if self.in_place else get_default_output_location(processed_location)
+            run_report = process_all(self.zipcode_file_location, self.capacity_file_location, processed_location,
+                                     mark_duplicates=self.mark_duplicates, run_report_location=self.run_report_location,
+                                     profile_rules=self.profile_rules, workers=self.workers,
+                                     input_format=self.input_format, output_location=output_location,
+                                     zipcode_manager=self._zipcode_manager,
+                                     capacities_manager=CapacityManager(copy.deepcopy(self._capacities)),
+                                     global_assignment=self.global_assignment)
+        except Exception:
+            logger.exception("Unable to process member file: %s", processed_location)
+            os.makedirs(self.failed_directory, exist_ok=True)
+            os.replace(processed_location, os.path.join(self.failed_directory, os.path.basename(processed_location)))
+            return None
+        self.files_processed += 1
+        return run_report
+
+    def poll(self):
+        """
+        Process the member files ready in the inbox, in sorted order.
+        :return: List of String of the member files processed
+        """
+        ready_files = self.get_ready_files()
+        for member_file_location in ready_files:
+            logger.info("Processing member file: %s", member_file_location)
+            self.process_file(member_file_location)
+        return ready_files
+
+    def run(self, max_polls=None):
+        """
+        Poll the inbox every poll_interval seconds until interrupted, or for max_polls polls when given.
+        :param max_polls: Integer
+        :return: None
+        """
+        self.load_managers()
+        logger.info("Watching %s for member files", self.inbox_directory)
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                self.poll()
+                polls += 1
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            logger.info("Stopped watching %s after processing %s files", self.inbox_directory, self.files_processed)
+
+
+def get_member_file_locations(member_files):
+    """
+    Resolve a directory or a glob pattern into the sorted locations of the member files it holds.  Assignment files
+    written by a previous run next to the member files are skipped.
+    :param member_files: String of a directory or a glob pattern
+    :return: List of String
+    """
+    if os.path.isdir(member_files):
+        member_file_locations = [os.path.join(member_files, file_name) for file_name in os.listdir(member_files)
+                                 if os.path.splitext(file_name)[1].lower() in INPUT_FORMAT_EXTENSIONS]
+    else:
+        member_file_locations = glob.glob(member_files)
+    return sorted(member_file_location for member_file_location in member_file_locations
+                  if not os.path.splitext(member_file_location)[0].endswith(ASSIGNMENTS_FILE_SUFFIX))
+
+
+def process_batch(zipcode_excel_location, capacity_excel_location, member_file_locations, mark_duplicates=False,
+                  run_report_location=None, profile_rules=False, workers=1, input_format=None, input_cache=None,
+                  in_place=False, global_assignment=False):
+    """
+    Run the assignment program over several MassHealth files, such as one extract per ACO or MCO.  The zipcode and
+    capacity files are parsed once and the member files are parsed concurrently, then the rules are applied file by
+    file in the given order so every file consumes the same capacity and the result does not depend on which parse
+    finished first.  All stages are recorded in one RunReport.
+    :param zipcode_excel_location: String
+    :param capacity_excel_location: String
+    :param member_file_locations: List of String, see get_member_file_locations
+    :param mark_duplicates: Boolean
+    :param run_report_location: String location of the JSON run report, not written when None
+    :param profile_rules: Boolean to add per rule statistics to the run report
+    :param workers: Integer of processes used to parse the member files and to evaluate the rules
+    :param input_format: String forcing the format of the input files, detected from each file extension when None
+    :param input_cache: ParsedInputCache used for the zipcode and capacity files, they are always parsed when None
+    :param in_place: Boolean to update each MassHealth workbook instead of writing <masshealth>_assignments.xlsx
+    :param global_assignment: Boolean to assign the members with the GlobalAssignmentSolver instead of the rule cascade
+    :return: RunReport
+    """
+    run_report = RunReport()
+    if profile_rules:
+        run_report.rule_profiler = RuleProfiler()
+    zipcode_manager, capacities_manager = generate_managers(run_report, zipcode_excel_location,
+                                                            capacity_excel_location, input_format, input_cache)
+
+    with run_report.stage('generate_members') as stage:
+        parsed_member_files = parse_member_files(member_file_locations, workers, input_format)
+        stage.count('files', len(member_file_locations))
+        stage.count('rows', sum(rows_merged for _, rows_merged in parsed_member_files))
+        stage.count('members', sum(len(all_members) for all_members, _ in parsed_member_files))
+
+    for member_file_location, (all_members, _) in zip(member_file_locations, parsed_member_files):
+        logger.info("Processing member file: %s", member_file_location)
+        apply_rules(run_report, all_members, capacities_manager, zipcode_manager, workers, member_file_location,
+                    global_assignment)
+        record_stats(run_report, all_members, member_file_location)
+        output_location = None if in_place else get_default_output_location(member_file_location)
+        write_assignments(run_report, all_members, member_file_location, mark_duplicates, input_format,
+                          output_location, member_file_location)
 
-    process_rules(all_members, capacities_manager, zipcode_manager)
-    generate_stats(all_members)
-    update_masshealth_assignments(all_members, masshealth_excel_location, mark_duplicates)
+    finish_run_report(run_report, run_report_location)
+    return run_report
 
 
 if __name__ == '__main__':
@@ -0,0 +1,120 @@
+"""
+Memory benchmark for the slot based domain records.  A synthetic MassHealth, zipcode and capacity workbook set is
+written with generate_workbooks, then parsed twice through process_members, process_zipcodes and process_capacity:
+once with the Member, Affiliate, Zipcode and Capacity classes and once with copies of those classes that store their
+attributes in a per-instance __dict__ the way they did before __slots__ was introduced.  tracemalloc measures the
+memory still held by the parsed records and the peak reached while parsing.
+
+Usage:
+    python -m AssignmentProgram.benchmarks.record_memory --rows 150000
+"""
+import argparse
+import gc
+import shutil
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+
+from AssignmentProgram import AssignmentProcessing
+from AssignmentProgram.AssignmentProcessing import process_members, process_zipcodes, process_capacity
+from AssignmentProgram.Capacity import Capacity
+from AssignmentProgram.Member import Member, Affiliate, MemberManager
+from AssignmentProgram.Zipcode import Zipcode
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+
+def without_slots(cls):
+    """
+    Create a copy of a slot based class that keeps all of its methods and properties but stores its attributes in a
+    per-instance __dict__.
+    :param cls: Class
+    :return: Class
+    """
+    slot_names = set(cls.__dict__.get('__slots__', ()))
+    namespace = {name: value for name, value in cls.__dict__.items()
+                 if name not in slot_names and name not in ('__slots__', '__dict__', '__weakref__')}
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+@contextmanager
+def record_classes(member_cls, affiliate_cls, zipcode_cls, capacity_cls):
+    """
+    Make the parse functions of AssignmentProcessing build their records with the given classes.
+    """
+    original_classes = (AssignmentProcessing.Member, AssignmentProcessing.Affiliate, AssignmentProcessing.Zipcode,
+                        AssignmentProcessing.Capacity)
+    AssignmentProcessing.Member, AssignmentProcessing.Affiliate, AssignmentProcessing.Zipcode, \
+        AssignmentProcessing.Capacity = member_cls, affiliate_cls, zipcode_cls, capacity_cls
+    try:
+        yield
+    finally:
+        AssignmentProcessing.Member, AssignmentProcessing.Affiliate, AssignmentProcessing.Zipcode, \
+            AssignmentProcessing.Capacity = original_classes
+
+
+def measure_parse(workbooks, member_cls, affiliate_cls, zipcode_cls, capacity_cls):
+    """
+    Parse the workbooks with one set of record classes and measure the memory allocated.
+    :param workbooks: Dict of workbook locations from generate_workbooks
+    :return: Tuple of the Integer of members, the Integer of bytes held by the records and the Integer of peak bytes
+    """
+    gc.collect()
+    with record_classes(member_cls, affiliate_cls, zipcode_cls, capacity_cls):
+        tracemalloc.start()
+        try:
+            records = (process_members(workbooks["masshealth"], MemberManager()),
+                       process_zipcodes(workbooks["zipcode"]),
+                       process_capacity(workbooks["capacity"]))
+            gc.collect()
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    member_count = len(records[0])
+    del records
+    return member_count, retained, peak
+
+
+def run_benchmark(workbooks):
+    """
+    Compare the memory used by the slot based records against the same records backed by __dict__.
+    :param workbooks: Dict of workbook locations from generate_workbooks
+    :return: Dict
+    """
+    member_count, dict_bytes, dict_peak_bytes = measure_parse(
+        workbooks, without_slots(Member), without_slots(Affiliate), without_slots(Zipcode), without_slots(Capacity))
+    _, slots_bytes, slots_peak_bytes = measure_parse(workbooks, Member, Affiliate, Zipcode, Capacity)
+    return {
+        "members": member_count,
+        "dict_bytes": dict_bytes,
+        "slots_bytes": slots_bytes,
+        "dict_peak_bytes": dict_peak_bytes,
+        "slots_peak_bytes": slots_peak_bytes,
+        "saved_percentage": (1 - slots_bytes / dict_bytes) * 100
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the memory saved by the slot based domain records.')
+    parser.add_argument("-r", "--rows", help='Number of MassHealth rows to generate, 150000 rows hold about 100k '
+                                             'members with the default generator settings.', type=int, default=150000)
+    parser.add_argument("-s", "--seed", help='Seed used for the synthetic workbooks.', type=int, default=0)
+    parser.add_argument("-d", "--directory", help='Directory the workbooks are written to and kept in, a temporary '
+                                                  'directory removed afterwards when not given.', default=None)
+    args = parser.parse_args()
+
+    output_directory = args.directory or tempfile.mkdtemp(prefix="record_memory_")
+    try:
+        result = run_benchmark(generate_workbooks(output_directory, row_count=args.rows, seed=args.seed))
+    finally:
+        if not args.directory:
+            shutil.rmtree(output_directory)
+    print("Members: {0}".format(result["members"]))
+    print("__dict__ records: {0:.1f} MiB, parse peak {1:.1f} MiB".format(result["dict_bytes"] / 2 ** 20,
+                                                                       result["dict_peak_bytes"] / 2 ** 20))
+    print("__slots__ records: {0:.1f} MiB, parse peak {1:.1f} MiB".format(result["slots_bytes"] / 2 ** 20,
+                                                                        result["slots_peak_bytes"] / 2 ** 20))
+    print("Saved: {0:.1f}%".format(result["saved_percentage"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+pytest-benchmark suite timing each stage of process_all on synthetic workbooks of increasing size.  The peak memory
+allocated by a stage is measured with tracemalloc and stored in the extra_info of the benchmark, so it is saved next to
+the timings in the JSON written by pytest-benchmark.
+
+Requires the pytest-benchmark plugin (pip install pytest-benchmark).  A baseline is committed in
+AssignmentProgram/benchmarks/baseline, compare a run to it and fail when the fastest round of a stage is more than 25%
+slower.  The fastest round is compared rather than the mean since the smallest stages only take microseconds:
+    python -m pytest AssignmentProgram/benchmarks --benchmark-storage=AssignmentProgram/benchmarks/baseline \
+        --benchmark-compare=0001 --benchmark-compare-fail=min:25%
+
+The timings depend on the machine, so record a baseline on the machine running the comparison when it is not the one
+the committed baseline was recorded on, and commit it when the expected timings change:
+    python -m pytest AssignmentProgram/benchmarks \
+        --benchmark-json=AssignmentProgram/benchmarks/baseline/0001_baseline.json
+
+The dataset sizes default to 1000 and 5000 MassHealth rows and can be changed with a comma separated list of row counts
+in the ASSIGNMENT_BENCHMARK_ROWS environment variable.
+"""
+import os
+import shutil
+import tracemalloc
+
+import pytest
+
+from AssignmentProgram.AssignmentProcessing import generate_zipcodes_manager, generate_capacities_manager, \
+    generate_members, process_rules, generate_stats, update_masshealth_assignments
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+pytest.importorskip("pytest_benchmark")
+
+BENCHMARK_ROWS = [int(rows) for rows in os.environ.get("ASSIGNMENT_BENCHMARK_ROWS", "1000,5000").split(",")]
+BENCHMARK_ROUNDS = 3
+
+
+@pytest.fixture(scope="module", params=BENCHMARK_ROWS, ids=lambda rows: "{0}_rows".format(rows))
+def workbooks(request, tmp_path_factory):
+    output_directory = str(tmp_path_factory.mktemp("workbooks_{0}".format(request.param)))
+    return generate_workbooks(output_directory, row_count=request.param, seed=0)
+
+
+def measure_peak_memory(stage, *args):
+    """
+    Run a stage once under tracemalloc and return the peak number of bytes allocated while it ran.
+    :return: Integer
+    """
+    tracemalloc.start()
+    try:
+        stage(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_stage(benchmark, stage, setup):
+    """
+    Benchmark a stage with fresh inputs for every round and record its peak memory.
+    :param benchmark: pytest-benchmark fixture
+    :param stage: Function
+    :param setup: Function returning the arguments of the stage
+    :return: None
+    """
+    benchmark.extra_info["peak_memory_bytes"] = measure_peak_memory(stage, *setup())
+    benchmark.pedantic(stage, setup=lambda: (setup(), {}), rounds=BENCHMARK_ROUNDS, iterations=1)
+
+
+def test_generate_zipcodes_manager(benchmark, workbooks):
+    run_stage(benchmark, generate_zipcodes_manager, lambda: (workbooks["zipcode"],))
+
+
+def test_generate_capacities_manager(benchmark, workbooks):
+    run_stage(benchmark, generate_capacities_manager, lambda: (workbooks["capacity"],))
+
+
+def test_generate_members(benchmark, workbooks):
+    run_stage(benchmark, generate_members, lambda: (workbooks["masshealth"],))
+
+
+def test_process_rules(benchmark, workbooks):
+    zipcode_manager = generate_zipcodes_manager(workbooks["zipcode"])
+
+    def setup():
+        return (generate_members(workbooks["masshealth"]), generate_capacities_manager(workbooks["capacity"]),
+                zipcode_manager)
+    run_stage(benchmark, process_rules, setup)
+
+
+def test_generate_stats(benchmark, workbooks):
+    all_members = generate_members(workbooks["masshealth"])
+    process_rules(all_members, generate_capacities_manager(workbooks["capacity"]),
+                  generate_zipcodes_manager(workbooks["zipcode"]))
+    run_stage(benchmark, generate_stats, lambda: (all_members,))
+
+
+def test_update_masshealth_assignments(benchmark, workbooks, tmp_path):
+    all_members = generate_members(workbooks["masshealth"])
+    process_rules(all_members, generate_capacities_manager(workbooks["capacity"]),
+                  generate_zipcodes_manager(workbooks["zipcode"]))
+    masshealth_copy = str(tmp_path / "masshealth.xlsx")
+
+    def setup():
+        shutil.copyfile(workbooks["masshealth"], masshealth_copy)
+        for member in all_members:
+            member.assignment_written = False
+        return all_members, masshealth_copy, True
+    run_stage(benchmark, update_masshealth_assignments, setup)
@@ -0,0 +1,313 @@
+"""
+Generator for synthetic MassHealth, zipcode and capacity workbooks used for scale testing.  The workbooks follow the
+column layouts read by process_members, process_zipcodes and process_capacity so they can be fed straight into
+process_all.  Every value is drawn from a seeded random generator so the same parameters always produce the same
+workbooks, and nothing is fetched from the network.
+
+Usage:
+    python -m AssignmentProgram.benchmarks.workbook_generator output_directory --rows 100000 --seed 1
+    python -m AssignmentProgram.benchmarks.workbook_generator output_directory --affiliate-mix Lynn=3,Other=1,none=2 \
+        --service-rates accs=0.3,ltts=0.2 --out-of-area-rate 0.1
+"""
+import argparse
+import os
+import random
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from AssignmentProgram.AssignmentProcessing import MEMBER_ATTRIBUTES, MEMBER_SERVICE_FLAGS, \
+    ZIPCODE_BASE_ATTRIBUTES, ZIPCODE_AP_ATTRIBUTES, CAPACITY_ATTRIBUTES
+
+MASSHEALTH_FILE_NAME = 'masshealth.xlsx'
+ZIPCODE_FILE_NAME = 'zipcode.xlsx'
+CAPACITY_FILE_NAME = 'capacity.xlsx'
+
+# The MassHealth extract spans columns A through BI.
+MASSHEALTH_COLUMN_COUNT = column_index_from_string('BI')
+
+# Relative weights of the affiliate written in column AX.  "other" stands in for organizations that are not one of the
+# APs and None for rows without an affiliate, both of which lead members to the no prior history rule.
+DEFAULT_AFFILIATE_MIX = {
+    "Lynn": 10,
+    "NSMHA": 10,
+    "Edinburg": 10,
+    "Riverside": 20,
+    "Uphams": 10,
+    "Dimock": 10,
+    "Brookline": 10,
+    "Other": 10,
+    None: 30
+}
+
+# Probability of each service column holding a 1.
+DEFAULT_SERVICE_RATES = {
+    "accs": 0.10,
+    "pcp": 0.10,
+    "cbfs": 0.10,
+    "pact": 0.05,
+    "respite_or_ccs": 0.05,
+    "out_patient": 0.10,
+    "day_treatment": 0.05,
+    "csp": 0.05,
+    "emergency_svs": 0.05,
+    "ltts": 0.05
+}
+
+IDENTIFICATION_FLAGS = ["ACCS", "BH CP", "LTSS CP"]
+
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+              "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+              "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson"]
+
+FIRST_NAMES = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+               "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+               "Maria", "Daniel", "Nancy", "Matthew", "Lisa", "Anthony", "Betty", "Mark", "Sandra", "Ashley"]
+
+YELLOW_FILL = PatternFill(start_color='FFFFFF00', end_color='FFFFFF00', fill_type='solid')
+
+
+def column_index(column):
+    return column_index_from_string(column) - 1
+
+
+def generate_zipcode_rows(generator, zipcode_count, ap_coverage_rate, priority_rate):
+    """
+    Generate the rows of the zipcode workbook.  Each row is a list of (value, is_priority) pairs.
+    :return: List
+    """
+    rows = []
+    zipcodes = generator.sample(range(1001, 2800), min(zipcode_count, 1799))
+    for zipcode in sorted(zipcodes):
+        row = [(None, False)] * column_index_from_string('I')
+        row[column_index(ZIPCODE_BASE_ATTRIBUTES['city_town'])] = ("Town {0}".format(zipcode), False)
+        # Zipcodes are written as numbers the way Excel stores them, dropping the leading zero.
+        row[column_index(ZIPCODE_BASE_ATTRIBUTES['zipcode'])] = (zipcode, False)
+        serving_aps = [ap for ap in ZIPCODE_AP_ATTRIBUTES if generator.random() < ap_coverage_rate]
+        priority_ap = generator.choice(serving_aps) if serving_aps and generator.random() < priority_rate else None
+        for ap in serving_aps:
+            row[column_index(ZIPCODE_AP_ATTRIBUTES[ap])] = (ap.title(), ap == priority_ap)
+        rows.append(row)
+    return rows
+
+
+def generate_member_rows(generator, row_count, zipcodes, affiliate_mix, service_rates, multi_row_rate,
+                         max_rows_per_member, duplicate_name_rate, out_of_area_rate):
+    """
+    Generate the rows of the MassHealth workbook.  Members with several rows repeat their identity columns on
+    consecutive rows with a different affiliate and services on each row, which is how the extract lists a member with
+    more than one affiliate.
+    :return: Generator of List
+    """
+    affiliates = list(affiliate_mix)
+    affiliate_weights = [affiliate_mix[affiliate] for affiliate in affiliates]
+    identities = []
+    rows_written = 0
+    member_number = 0
+    while rows_written < row_count:
+        member_number += 1
+        if identities and generator.random() < duplicate_name_rate:
+            # Same name and date of birth as an earlier member but listed under a new medicaid ID.
+            last_name, first_name, middle_initial, date_of_birth = generator.choice(identities)
+        else:
+            last_name = generator.choice(LAST_NAMES)
+            first_name = generator.choice(FIRST_NAMES)
+            middle_initial = generator.choice("ABCDEFGHJKLMNPRSTW") if generator.random() < 0.3 else None
+            date_of_birth = "{0:02d}/{1:02d}/{2}".format(generator.randint(1, 12), generator.randint(1, 28),
+                                                         generator.randint(1935, 2000))
+            if len(identities) < 10000:
+                identities.append((last_name, first_name, middle_initial, date_of_birth))
+        medicaid_id = "{0:012d}".format(100000000000 + member_number)
+        if generator.random() < out_of_area_rate:
+            zipcode = generator.randint(2800, 2999)
+        else:
+            zipcode = generator.choice(zipcodes)
+        identification_flag = generator.choice(IDENTIFICATION_FLAGS)
+
+        member_row_count = 1
+        if generator.random() < multi_row_rate:
+            member_row_count = generator.randint(2, max_rows_per_member)
+        for _ in range(min(member_row_count, row_count - rows_written)):
+            row = [None] * MASSHEALTH_COLUMN_COUNT
+            row[column_index(MEMBER_ATTRIBUTES['medicaid_id'])] = medicaid_id
+            row[column_index(MEMBER_ATTRIBUTES['member_last_name'])] = last_name
+            row[column_index(MEMBER_ATTRIBUTES['member_first_name'])] = first_name
+            row[column_index(MEMBER_ATTRIBUTES['member_middle_initial'])] = middle_initial
+            row[column_index(MEMBER_ATTRIBUTES['member_date_of_birth'])] = date_of_birth
+            row[column_index(MEMBER_ATTRIBUTES['residential_address_zipcode_1'])] = zipcode
+            row[column_index(MEMBER_ATTRIBUTES['identification_flag'])] = identification_flag
+            row[column_index(MEMBER_ATTRIBUTES['affiliate'])] = generator.choices(affiliates, affiliate_weights)[0]
+            for service in MEMBER_SERVICE_FLAGS:
+                if generator.random() < service_rates.get(service, 0):
+                    row[column_index(MEMBER_ATTRIBUTES[service])] = 1
+            rows_written += 1
+            yield row
+
+
+def write_member_workbook(file_location, member_rows):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    headers = {column_index(column): attribute for attribute, column in MEMBER_ATTRIBUTES.items()}
+    ws.append([headers.get(index, "Column {0}".format(get_column_letter(index + 1)))
+               for index in range(MASSHEALTH_COLUMN_COUNT)])
+    for row in member_rows:
+        ws.append(row)
+    wb.save(file_location)
+
+
+def write_zipcode_workbook(file_location, zipcode_rows):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["City/Town", "Zipcode"] + [ap.title() for ap in ZIPCODE_AP_ATTRIBUTES])
+    for row in zipcode_rows:
+        cells = []
+        for value, is_priority in row:
+            if is_priority:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.fill = YELLOW_FILL
+                cells.append(cell)
+            else:
+                cells.append(value)
+        ws.append(cells)
+    wb.save(file_location)
+
+
+def write_capacity_workbook(file_location, capacities):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["AP", "Capacity"])
+    for ap, capacity in capacities.items():
+        row = [None] * column_index_from_string(CAPACITY_ATTRIBUTES['capacity'])
+        row[column_index(CAPACITY_ATTRIBUTES['affiliate'])] = ap.title()
+        row[column_index(CAPACITY_ATTRIBUTES['capacity'])] = capacity
+        ws.append(row)
+    wb.save(file_location)
+
+
+def generate_workbooks(output_directory, row_count=1000, seed=0, zipcode_count=300, capacity_ratio=1.0,
+                       affiliate_mix=None, service_rates=None, multi_row_rate=0.25, max_rows_per_member=4,
+                       duplicate_name_rate=0.01, out_of_area_rate=0.02, ap_coverage_rate=0.4, priority_rate=0.5):
+    """
+    Write a MassHealth, zipcode and capacity workbook into output_directory.
+    :param output_directory: String
+    :param row_count: Integer of MassHealth rows to write
+    :param seed: Integer
+    :param zipcode_count: Integer of zipcode rows to write
+    :param capacity_ratio: Float of total AP capacity relative to the number of MassHealth rows
+    :param affiliate_mix: Dict of affiliate name to relative weight, see DEFAULT_AFFILIATE_MIX
+    :param service_rates: Dict of service column to probability of a 1, see DEFAULT_SERVICE_RATES
+    :param multi_row_rate: Float probability of a member spanning several rows
+    :param max_rows_per_member: Integer
+    :param duplicate_name_rate: Float probability of a member reusing an earlier name and date of birth
+    :param out_of_area_rate: Float probability of a member living outside every listed zipcode
+    :param ap_coverage_rate: Float probability of an AP serving a zipcode
+    :param priority_rate: Float probability of a zipcode having a yellow priority AP
+    :return: Dict of workbook locations keyed by masshealth, zipcode and capacity
+    """
+    if not os.path.isdir(output_directory):
+        os.makedirs(output_directory)
+    generator = random.Random(seed)
+    locations = {
+        "masshealth": os.path.join(output_directory, MASSHEALTH_FILE_NAME),
+        "zipcode": os.path.join(output_directory, ZIPCODE_FILE_NAME),
+        "capacity": os.path.join(output_directory, CAPACITY_FILE_NAME)
+    }
+
+    zipcode_rows = generate_zipcode_rows(generator, zipcode_count, ap_coverage_rate, priority_rate)
+    write_zipcode_workbook(locations["zipcode"], zipcode_rows)
+
+    ap_capacity = max(int(row_count * capacity_ratio / len(ZIPCODE_AP_ATTRIBUTES)), 1)
+    write_capacity_workbook(locations["capacity"], {ap: ap_capacity for ap in ZIPCODE_AP_ATTRIBUTES})
+
+    zipcodes = [row[column_index(ZIPCODE_BASE_ATTRIBUTES['zipcode'])][0] for row in zipcode_rows]
+    member_rows = generate_member_rows(generator, row_count, zipcodes, affiliate_mix or DEFAULT_AFFILIATE_MIX,
+                                       service_rates or DEFAULT_SERVICE_RATES, multi_row_rate, max_rows_per_member,
+                                       duplicate_name_rate, out_of_area_rate)
+    write_member_workbook(locations["masshealth"], member_rows)
+    return locations
+
+
+def parse_distribution(distribution, value_type):
+    """
+    Parse a comma separated list of name=value pairs given on the command line, the name none stands for None.
+    :param distribution: String such as "Lynn=10,Other=5,none=30"
+    :param value_type: Function converting each value, such as int or float
+    :return: Dict
+    """
+    parsed_distribution = {}
+    for pair in distribution.split(","):
+        name, separator, value = pair.partition("=")
+        name = name.strip()
+        if not separator or not name:
+            raise argparse.ArgumentTypeError("Expected name=value pairs, got: {0}".format(pair))
+        try:
+            parsed_distribution[None if name.lower() == "none" else name] = value_type(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError("Invalid value for {0}: {1}".format(name, value))
+    return parsed_distribution
+
+
+def affiliate_mix_type(distribution):
+    affiliate_mix = parse_distribution(distribution, int)
+    if any(weight < 0 for weight in affiliate_mix.values()) or not sum(affiliate_mix.values()):
+        raise argparse.ArgumentTypeError("Affiliate weights must not be negative and must not all be 0")
+    return affiliate_mix
+
+
+def service_rates_type(distribution):
+    service_rates = parse_distribution(distribution, float)
+    for service, rate in service_rates.items():
+        if service not in MEMBER_SERVICE_FLAGS:
+            raise argparse.ArgumentTypeError("Unknown service: {0}, expected one of {1}".format(
+                service, ", ".join(MEMBER_SERVICE_FLAGS)))
+        if not 0 <= rate <= 1:
+            raise argparse.ArgumentTypeError("The rate of {0} must be between 0 and 1".format(service))
+    return dict(DEFAULT_SERVICE_RATES, **service_rates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic MassHealth, zipcode and capacity workbooks.')
+    parser.add_argument("output_directory", help='Directory the workbooks are written to.')
+    parser.add_argument("-r", "--rows", help='Number of MassHealth rows to write.', type=int, default=1000)
+    parser.add_argument("-s", "--seed", help='Seed used for the random values.', type=int, default=0)
+    parser.add_argument("-z", "--zipcodes", help='Number of zipcode rows to write.', type=int, default=300)
+    parser.add_argument("--capacity-ratio", help='Total AP capacity relative to the number of MassHealth rows.',
+                        type=float, default=1.0, dest='capacity_ratio')
+    parser.add_argument("--multi-row-rate", help='Probability of a member spanning several rows.',
+                        type=float, default=0.25, dest='multi_row_rate')
+    parser.add_argument("--duplicate-name-rate",
+                        help='Probability of a member reusing an earlier name and date of birth.',
+                        type=float, default=0.01, dest='duplicate_name_rate')
+    parser.add_argument("--max-rows-per-member", help='Largest number of rows of a member spanning several rows.',
+                        type=int, default=4, dest='max_rows_per_member')
+    parser.add_argument("--affiliate-mix",
+                        help='Relative weights of the affiliate column as name=weight pairs, none for rows without '
+                             'an affiliate.  Replaces the default mix.',
+                        type=affiliate_mix_type, default=None, dest='affiliate_mix')
+    parser.add_argument("--service-rates",
+                        help='Probability of each service column holding a 1 as service=rate pairs, services not '
+                             'listed keep their default rate.',
+                        type=service_rates_type, default=None, dest='service_rates')
+    parser.add_argument("--out-of-area-rate", help='Probability of a member living outside every listed zipcode.',
+                        type=float, default=0.02, dest='out_of_area_rate')
+    parser.add_argument("--ap-coverage-rate", help='Probability of an AP serving a zipcode.',
+                        type=float, default=0.4, dest='ap_coverage_rate')
+    parser.add_argument("--priority-rate", help='Probability of a zipcode having a yellow priority AP.',
+                        type=float, default=0.5, dest='priority_rate')
+    args = parser.parse_args()
+
+    locations = generate_workbooks(args.output_directory, row_count=args.rows, seed=args.seed,
+                                   zipcode_count=args.zipcodes, capacity_ratio=args.capacity_ratio,
+                                   affiliate_mix=args.affiliate_mix, service_rates=args.service_rates,
+                                   multi_row_rate=args.multi_row_rate, max_rows_per_member=args.max_rows_per_member,
+                                   duplicate_name_rate=args.duplicate_name_rate,
+                                   out_of_area_rate=args.out_of_area_rate, ap_coverage_rate=args.ap_coverage_rate,
+                                   priority_rate=args.priority_rate)
+    for name, location in sorted(locations.items()):
+        print("{0}: {1}".format(name, location))
+
+
+if __name__ == '__main__':
+    main()
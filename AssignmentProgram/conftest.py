@@ -0,0 +1,12 @@
+import logging
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def quiet_logging():
+    # Rule exceptions are logged for most members, they flood the test output and the handlers are not part of what
+    # the benchmarks measure.
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
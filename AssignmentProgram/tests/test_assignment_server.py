@@ -0,0 +1,107 @@
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from AssignmentProgram.AssignmentProcessing import generate_zipcodes_manager, generate_capacities_manager, \
+    process_zipcodes
+from AssignmentProgram.AssignmentServer import AssignmentService, create_assignment_server
+from AssignmentProgram.CapacityLedger import CapacityLedger
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    return generate_workbooks(str(tmp_path), row_count=100, seed=0)
+
+
+@pytest.fixture
+def assignment_service(workbooks):
+    return AssignmentService(generate_zipcodes_manager(workbooks["zipcode"]),
+                             CapacityLedger(generate_capacities_manager(workbooks["capacity"])))
+
+
+@pytest.fixture
+def server_url(assignment_service):
+    server = create_assignment_server(assignment_service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://{0}:{1}".format(*server.server_address[:2])
+    server.shutdown()
+    server.server_close()
+
+
+def post(server_url, body, path="/assign"):
+    """
+    :return: Tuple of the Integer status and the decoded JSON response
+    """
+    request = Request(server_url + path, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    try:
+        with urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def get_served_zipcode(workbooks):
+    return next(zipcode.zipcode for zipcode in process_zipcodes(workbooks["zipcode"]) if zipcode.all_available_aps)
+
+
+@pytest.mark.parametrize("member_request", [
+    {"zipcode": "01902", "affiliates": ["lynn"]},
+    {"zipcode": "01902", "affiliates": {"name": "lynn"}},
+    {"zipcode": "01902", "affiliates": [{"name": 5}]},
+    {"zipcode": "01902", "affiliates": [{"services": "accs"}]},
+    {"zipcode": "01902", "affiliates": [{"services": [["accs"]]}]},
+    {"zipcode": "01902", "last_name": ["smith"]},
+    {"zipcode": ["01902"]},
+    {"affiliates": [{"name": "lynn"}]},
+    {"zipcode": "01902", "reserve": "false"},
+    {"zipcode": "01902", "reserve": 1},
+    ["01902"],
+])
+def test_assign_rejects_invalid_requests(server_url, member_request):
+    status, response = post(server_url, member_request)
+    assert status == 400
+    assert response["error"].startswith("Error:")
+
+
+def test_assign_without_identification_flag(server_url, workbooks):
+    status, response = post(server_url, {"zipcode": get_served_zipcode(workbooks),
+                                         "affiliates": [{"services": ["cbfs"]}]})
+    assert status == 200
+    assert response["reserved"] is False
+
+
+def test_assign_reserves_only_when_reserve_is_true(server_url, workbooks):
+    member_request = {"zipcode": get_served_zipcode(workbooks), "affiliates": [{"services": ["cbfs"]}]}
+    status, response = post(server_url, dict(member_request, reserve=False))
+    assert status == 200
+    assert response["reserved"] is False
+
+    status, response = post(server_url, dict(member_request, reserve=True))
+    assert status == 200
+    assert response["assigned_to"]
+    assert response["reserved"] is True
+
+
+def test_reserve_attempts_must_be_positive(workbooks):
+    with pytest.raises(ValueError, match="at least 1"):
+        AssignmentService(generate_zipcodes_manager(workbooks["zipcode"]),
+                          CapacityLedger(generate_capacities_manager(workbooks["capacity"])), reserve_attempts=0)
+
+
+def test_unexpected_errors_answer_with_a_server_error(server_url, assignment_service, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("failure")
+    monkeypatch.setattr(assignment_service, "assign", fail)
+    monkeypatch.setattr(assignment_service, "get_capacities", fail)
+
+    status, response = post(server_url, {"zipcode": "01902"})
+    assert status == 500
+    assert response["error"].startswith("Error:")
+    with pytest.raises(HTTPError) as e:
+        urlopen(server_url + "/capacity")
+    assert e.value.code == 500
+    assert json.loads(e.value.read())["error"].startswith("Error:")
@@ -0,0 +1,69 @@
+import logging
+
+from AssignmentProgram.AssignmentSolver import GlobalAssignmentSolver, MinCostFlow
+from AssignmentProgram.Capacity import Capacity, CapacityManager
+from AssignmentProgram.Member import Member, Affiliate, SERVICE_CBFS
+from AssignmentProgram.Zipcode import Zipcode, ZipcodeManager
+
+
+def build_zipcode(zipcode, aps):
+    zipcode_object = Zipcode("town", zipcode)
+    for ap in aps:
+        setattr(zipcode_object, "ap_" + ap, {"record": (ap, False)})
+    return zipcode_object
+
+
+def build_member(medicaid_id, zipcode, affiliate=None, identification_flag=None):
+    member = Member(medicaid_id, "last", "first", None, None, zipcode, identification_flag)
+    member.add_affiliate(affiliate or Affiliate(None))
+    return member
+
+
+def build_capacity(ap, capacity_available, capacity):
+    capacity_object = Capacity(ap, capacity_available)
+    capacity_object.capacity = capacity
+    return capacity_object
+
+
+def test_min_cost_flow_prefers_the_cheapest_paths():
+    # source 0, middle nodes 1 and 2, sink 3
+    min_cost_flow = MinCostFlow(4)
+    min_cost_flow.add_edge(0, 1, 2, 0)
+    min_cost_flow.add_edge(0, 2, 1, 0)
+    cheap_edge = min_cost_flow.add_edge(1, 3, 1, 1)
+    expensive_edge = min_cost_flow.add_edge(1, 3, 5, 10)
+    min_cost_flow.add_edge(2, 3, 1, 2)
+    assert min_cost_flow.solve(0, 3) == (3, 13)
+    assert min_cost_flow.get_edge_flow(cheap_edge) == 1
+    assert min_cost_flow.get_edge_flow(expensive_edge) == 1
+
+
+def test_global_assignment_places_the_members_the_cascade_leaves_out():
+    zipcode_manager = ZipcodeManager([build_zipcode("01901", ["lynn", "riverside"]), build_zipcode("01902", ["lynn"])])
+    # Both APs have one slot left, lynn has the highest available percentage so the cascade gives it to the first
+    # member, although the second member can only go to lynn.
+    capacity_manager = CapacityManager([build_capacity("lynn", 1, 1), build_capacity("riverside", 2, 1)])
+    all_members = [build_member("100000000001", "01901"), build_member("100000000002", "01902")]
+    solver = GlobalAssignmentSolver(capacity_manager, zipcode_manager)
+
+    assert solver.count_greedy_assignments(all_members) == 1
+    assert not any(member.is_assigned for member in all_members)
+    assert solver.solve(all_members) == 2
+
+    assert [member.get_assigned_affiliate() for member in all_members] == ["riverside", "lynn"]
+    assert not capacity_manager.does_affiliate_have_capacity("lynn")
+    assert not capacity_manager.does_affiliate_have_capacity("riverside")
+
+
+def test_global_assignment_does_not_change_the_member_data():
+    zipcode_manager = ZipcodeManager([build_zipcode("01901", ["lynn"])])
+    capacity_manager = CapacityManager([build_capacity("lynn", 1, 1)])
+    # SetACCSRule marks the unnamed CBFS affiliate of an ACCS member as ACCS while the cascade runs.
+    member = build_member("100000000001", "99999", Affiliate(None, SERVICE_CBFS), identification_flag="accs")
+    solver = GlobalAssignmentSolver(capacity_manager, zipcode_manager)
+
+    assert solver.solve([member]) == 0
+
+    assert member.affiliates[0].service_flags == SERVICE_CBFS
+    assert not member.is_assigned
+    assert logging.getLogger("AssignmentProgram.AssignmentSolver.greedy").level == logging.NOTSET
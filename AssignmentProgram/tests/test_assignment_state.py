@@ -0,0 +1,79 @@
+import shutil
+
+import pytest
+from openpyxl import load_workbook
+
+from AssignmentProgram.AssignmentProcessing import generate_zipcodes_manager, generate_capacities_manager, \
+    generate_members, process_rules
+from AssignmentProgram.AssignmentState import AssignmentStateStore, get_member_fingerprint, get_member_identity
+from AssignmentProgram.assignments import process_all
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+ASSIGNED_TO_COLUMN = 60
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    # A low capacity leaves members unassigned, which is the case the incremental mode has to process again.
+    return generate_workbooks(str(tmp_path / "workbooks"), row_count=1000, seed=0, capacity_ratio=0.3)
+
+
+def count_assigned_rows(masshealth_location):
+    worksheet = load_workbook(masshealth_location, read_only=True).active
+    return sum(1 for row in worksheet.iter_rows(min_row=2, values_only=True) if row[ASSIGNED_TO_COLUMN])
+
+
+def test_split_members_processes_unchanged_unassigned_members(workbooks, tmp_path):
+    all_members = generate_members(workbooks["masshealth"])
+    member_fingerprints = [get_member_fingerprint(member) for member in all_members]
+    process_rules(all_members, generate_capacities_manager(workbooks["capacity"]),
+                  generate_zipcodes_manager(workbooks["zipcode"]))
+    assignment_state = AssignmentStateStore(str(tmp_path / "state.db"))
+    assignment_state.save(all_members, member_fingerprints, "context")
+
+    unchanged_members, changed_members = assignment_state.split_members(all_members, member_fingerprints, "context")
+    assignment_state.close()
+
+    assert unchanged_members
+    assert changed_members
+    assert all(member.is_assigned and assigned_to == member.get_assigned_affiliate()
+               for member, assigned_to in unchanged_members)
+    assert [get_member_identity(member) for member in changed_members] == \
+        [get_member_identity(member) for member in all_members if not member.is_assigned]
+
+
+def test_split_members_processes_every_member_when_context_changed(workbooks, tmp_path):
+    all_members = generate_members(workbooks["masshealth"])
+    member_fingerprints = [get_member_fingerprint(member) for member in all_members]
+    assignment_state = AssignmentStateStore(str(tmp_path / "state.db"))
+    assignment_state.save(all_members, member_fingerprints, "context")
+
+    unchanged_members, changed_members = assignment_state.split_members(all_members, member_fingerprints, "changed")
+    assignment_state.close()
+
+    assert unchanged_members == []
+    assert changed_members == all_members
+
+
+def test_incremental_run_assigns_members_left_unassigned_by_previous_run(workbooks, tmp_path):
+    state_location = str(tmp_path / "state.db")
+    first_location = str(tmp_path / "first.xlsx")
+    shutil.copyfile(workbooks["masshealth"], first_location)
+    process_all(workbooks["zipcode"], workbooks["capacity"], first_location, state_location=state_location)
+
+    # Removing members frees the capacity they held for the members the first run could not place.
+    masshealth_workbook = load_workbook(workbooks["masshealth"])
+    masshealth_workbook.active.delete_rows(2, 300)
+    incremental_location = str(tmp_path / "incremental.xlsx")
+    full_location = str(tmp_path / "full.xlsx")
+    masshealth_workbook.save(incremental_location)
+    masshealth_workbook.save(full_location)
+
+    process_all(workbooks["zipcode"], workbooks["capacity"], full_location)
+    run_report = process_all(workbooks["zipcode"], workbooks["capacity"], incremental_location,
+                             state_location=state_location)
+
+    members = run_report.get_stage('generate_members').counters['members']
+    replayed = run_report.get_stage('replay_assignments').counters['members_assigned']
+    assert run_report.get_stage('process_rules').counters['members'] == members - replayed
+    assert count_assigned_rows(incremental_location) >= count_assigned_rows(full_location)
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from AssignmentProgram import assignments
+from AssignmentProgram.AssignmentProcessing import generate_zipcodes_manager, generate_capacities_manager
+from AssignmentProgram.assignments import process_all, process_batch, get_default_output_location, InboxWatcher
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+
+def test_single_pass_rejects_csv_masshealth_input(tmp_path):
+    with pytest.raises(ValueError):
+        process_all(str(tmp_path / "zipcode.csv"), str(tmp_path / "capacity.csv"), str(tmp_path / "masshealth.csv"),
+                    single_pass=True)
+
+
+def test_inbox_watcher_skips_files_removed_after_listing(tmp_path, monkeypatch):
+    member_file_location = tmp_path / "members.xlsx"
+    member_file_location.write_bytes(b"members")
+    removed_file_location = str(tmp_path / "removed.xlsx")
+    # The removed file is listed but deleted before its signature is read.
+    monkeypatch.setattr(assignments, "get_member_file_locations",
+                        lambda member_files: [removed_file_location, str(member_file_location)])
+    inbox_watcher = InboxWatcher(str(tmp_path), None, None)
+
+    assert inbox_watcher.get_ready_files() == []
+    assert inbox_watcher.get_ready_files() == [str(member_file_location)]
+    member_file_location.unlink()
+    assert inbox_watcher.process_file(str(member_file_location)) is None
+
+
+@pytest.fixture
+def batch_workbooks(tmp_path):
+    """
+    Split a generated MassHealth workbook into two files with the same name in different directories.  The capacity
+    only covers part of the members, so the assignments of a file depend on the files processed before it.
+    """
+    workbooks = generate_workbooks(str(tmp_path / "workbooks"), row_count=1200, seed=0, capacity_ratio=0.3)
+    rows = list(load_workbook(workbooks["masshealth"], read_only=True).active.iter_rows(values_only=True))
+    member_file_locations = []
+    for directory, member_rows in (("first", rows[1:601]), ("second", rows[601:])):
+        os.makedirs(str(tmp_path / directory))
+        member_file_location = str(tmp_path / directory / "members.xlsx")
+        workbook = Workbook()
+        for row_values in [rows[0]] + member_rows:
+            workbook.active.append(row_values)
+        workbook.save(member_file_location)
+        member_file_locations.append(member_file_location)
+    return workbooks, member_file_locations
+
+
+def read_output_rows(output_location):
+    return list(load_workbook(output_location, read_only=True).active.iter_rows(values_only=True))
+
+
+def process_sequentially(workbooks, member_file_locations, tmp_path):
+    """
+    Run process_all file by file with shared managers, the way process_batch is expected to consume the capacity.
+    """
+    zipcode_manager = generate_zipcodes_manager(workbooks["zipcode"])
+    capacities_manager = generate_capacities_manager(workbooks["capacity"])
+    outputs = []
+    for index, member_file_location in enumerate(member_file_locations):
+        output_location = str(tmp_path / "sequential_{0}.xlsx".format(index))
+        process_all(workbooks["zipcode"], workbooks["capacity"], member_file_location, output_location=output_location,
+                    zipcode_manager=zipcode_manager, capacities_manager=capacities_manager)
+        outputs.append(read_output_rows(output_location))
+    return outputs
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_batch_consumes_the_capacity_file_by_file_in_order(batch_workbooks, tmp_path, reverse):
+    workbooks, member_file_locations = batch_workbooks
+    if reverse:
+        member_file_locations = member_file_locations[::-1]
+
+    run_report = process_batch(workbooks["zipcode"], workbooks["capacity"], member_file_locations)
+    outputs = [read_output_rows(get_default_output_location(member_file_location))
+               for member_file_location in member_file_locations]
+
+    assert outputs == process_sequentially(workbooks, member_file_locations, tmp_path)
+    # The second file gets less capacity than when it is processed alone.
+    batch_counters = run_report.get_stage("generate_stats {0}".format(member_file_locations[1])).counters
+    alone_counters = process_all(workbooks["zipcode"], workbooks["capacity"], member_file_locations[1],
+                                 output_location=str(tmp_path / "alone.xlsx")).get_stage("generate_stats").counters
+    assert batch_counters['unassigned_members'] > alone_counters['unassigned_members']
+    assert len({metrics.name for metrics in run_report.stages}) == len(run_report.stages)
+
+
+def test_inbox_watcher_forwards_the_run_options(tmp_path):
+    workbooks = generate_workbooks(str(tmp_path / "workbooks"), row_count=100, seed=0)
+    inbox_directory = tmp_path / "inbox"
+    inbox_directory.mkdir()
+    member_file_location = str(inbox_directory / "members.xlsx")
+    shutil.copyfile(workbooks["masshealth"], member_file_location)
+    run_report_location = str(tmp_path / "run_report.json")
+    inbox_watcher = InboxWatcher(str(inbox_directory), workbooks["zipcode"], workbooks["capacity"],
+                                 run_report_location=run_report_location, profile_rules=True, in_place=True)
+
+    run_report = inbox_watcher.process_file(member_file_location)
+
+    processed_location = os.path.join(inbox_watcher.processed_directory, "members.xlsx")
+    assert run_report.get_stage('update_masshealth_assignments').counters['rows']
+    assert not os.path.exists(get_default_output_location(processed_location))
+    assert any(row[60] for row in load_workbook(processed_location, read_only=True).active.iter_rows(
+        min_row=2, values_only=True))
+    with open(run_report_location) as f:
+        assert json.load(f)['rules']['FailedAssignmentRule']['invocations']
+
+
+@pytest.mark.parametrize("arguments", [
+    ["--watch", "inbox", "--output-file", "assignments.csv"],
+    ["--watch", "inbox", "--incremental", "state.sqlite"],
+    ["--batch", "members", "--single-pass"],
+])
+def test_single_file_options_are_rejected_with_batch_and_watch(monkeypatch, capsys, arguments):
+    monkeypatch.setattr("sys.argv", ["assignments.py", "-z", "zipcode.xlsx", "-c", "capacity.xlsx"] + arguments)
+    with pytest.raises(SystemExit) as e:
+        assignments.main()
+    assert e.value.code == 2
+    assert "cannot be used with --batch or --watch" in capsys.readouterr().err
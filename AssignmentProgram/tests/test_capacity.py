@@ -0,0 +1,76 @@
+import random
+
+import pytest
+from openpyxl import Workbook
+
+from AssignmentProgram.AssignmentProcessing import generate_capacities_manager
+from AssignmentProgram.Capacity import Capacity, CapacityManager
+
+
+def write_capacity_workbook(capacity_location, capacities):
+    workbook = Workbook()
+    workbook.active.append(["AP", "Capacity"])
+    for ap, capacity in capacities:
+        workbook.active.append([ap, capacity])
+    workbook.save(capacity_location)
+    return capacity_location
+
+
+def test_capacities_are_looked_up_by_their_lowercase_affiliate(tmp_path):
+    capacities_manager = generate_capacities_manager(write_capacity_workbook(
+        str(tmp_path / "capacity.xlsx"), [("Lynn", 10), (" NSMHA ", 5), ("Riverside", 1)]))
+
+    assert [capacity.ap for capacity in capacities_manager.capacities] == ["lynn", "nsmha", "riverside"]
+    assert capacities_manager.get_capacity_by_affiliate("nsmha") is capacities_manager.capacities[1]
+    assert capacities_manager.get_capacity_size_of_affiliate("lynn") == 10
+    assert not capacities_manager.does_affiliate_have_capacity("dimock")
+
+    capacities_manager.decrement_capacity_from_affiliate("nsmha")
+    capacities_manager.decrement_capacity_from_affiliate("riverside")
+    assert capacities_manager.get_capacity_size_of_affiliate("nsmha") == 4
+    assert capacities_manager.does_affiliate_have_capacity("nsmha")
+    assert not capacities_manager.does_affiliate_have_capacity("riverside")
+
+
+def test_duplicate_affiliate_capacity_is_rejected(tmp_path):
+    capacity_location = write_capacity_workbook(str(tmp_path / "capacity.xlsx"), [("Lynn", 10), ("LYNN", 5)])
+    with pytest.raises(ValueError, match="Multiple capacities 10 and 5 are defined for the same affiliate: lynn"):
+        generate_capacities_manager(capacity_location)
+
+    capacities_manager = CapacityManager([Capacity("lynn", 10)])
+    with pytest.raises(ValueError):
+        capacities_manager.add_capacity(Capacity("lynn", 5))
+    with pytest.raises(ValueError):
+        capacities_manager.capacities = [Capacity("nsmha", 1), Capacity("nsmha", 2)]
+
+
+def get_highest_capacity_percentage_by_sorting(capacities_manager, affiliates):
+    """
+    The selection used before the ranking, sorting the capacities of the affiliates for every member.  Missing and
+    exhausted capacities are left out, the ranking skips them.
+    """
+    capacities = [capacities_manager.get_capacity_by_affiliate(ap) for ap in affiliates]
+    highest_capacities = sorted([capacity for capacity in capacities if capacity and not capacity.is_exhausted()],
+                                key=lambda x: x.available_capacity_percentage(), reverse=True)
+    if highest_capacities:
+        return highest_capacities[0]
+    return None
+
+
+def test_ranking_matches_the_sorted_selection_as_capacity_changes():
+    generator = random.Random(0)
+    aps = ["lynn", "nsmha", "edinburg", "riverside", "uphams", "dimock", "brookline"]
+    capacities_manager = CapacityManager([Capacity(ap, generator.choice([4, 10, 20])) for ap in aps[:-1]])
+
+    selections = 0
+    for _ in range(2000):
+        affiliates = generator.sample(aps, generator.randint(1, 4))
+        highest_capacity = capacities_manager.get_highest_capacity_percentage_by_affiliates(affiliates)
+        assert highest_capacity is get_highest_capacity_percentage_by_sorting(capacities_manager, affiliates)
+        if highest_capacity is not None:
+            selections += 1
+            capacities_manager.decrement_capacity_from_affiliate(highest_capacity.ap)
+        if generator.random() < 0.3:
+            capacities_manager.release_capacity_from_affiliate(generator.choice(aps))
+    assert selections
+    assert any(capacity.is_exhausted() for capacity in capacities_manager.capacities)
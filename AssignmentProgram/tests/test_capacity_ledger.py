@@ -0,0 +1,152 @@
+import threading
+
+import pytest
+
+from AssignmentProgram.AssignmentProcessing import generate_zipcodes_manager, process_zipcodes
+from AssignmentProgram.AssignmentServer import AssignmentService
+from AssignmentProgram.Capacity import Capacity, CapacityManager
+from AssignmentProgram.CapacityLedger import CapacityLedger, SqliteCapacityLedger, RESERVED, COMMITTED, RELEASED
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+
+def build_capacities(size=3):
+    return [Capacity("lynn", size), Capacity("riverside", size)]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def capacity_ledger(request, tmp_path):
+    if request.param == "memory":
+        yield CapacityLedger(CapacityManager(build_capacities()))
+    else:
+        capacity_ledger = SqliteCapacityLedger(str(tmp_path / "ledger.sqlite"), build_capacities())
+        yield capacity_ledger
+        capacity_ledger.close()
+
+
+def get_capacity(capacity_ledger, ap):
+    return capacity_ledger.get_capacity_snapshot().get_capacity_by_affiliate(ap).capacity
+
+
+def test_reserve_commit_and_release(capacity_ledger):
+    committed_id = capacity_ledger.reserve("lynn", "100000000001")
+    released_id = capacity_ledger.reserve("lynn", "100000000002")
+    assert get_capacity(capacity_ledger, "lynn") == 1
+
+    capacity_ledger.commit(committed_id)
+    capacity_ledger.release(released_id)
+
+    assert get_capacity(capacity_ledger, "lynn") == 2
+    assert get_capacity(capacity_ledger, "riverside") == 3
+    assert [(entry.action, entry.reservation_id, entry.ap, entry.medicaid_id)
+            for entry in capacity_ledger.audit_trail] == [
+        (RESERVED, committed_id, "lynn", "100000000001"),
+        (RESERVED, released_id, "lynn", "100000000002"),
+        (COMMITTED, committed_id, "lynn", "100000000001"),
+        (RELEASED, released_id, "lynn", "100000000002")]
+
+
+def test_reserve_fails_without_capacity(capacity_ledger):
+    assert all(capacity_ledger.reserve("lynn") is not None for _ in range(3))
+    assert capacity_ledger.reserve("lynn") is None
+    assert capacity_ledger.reserve("unknown") is None
+    assert get_capacity(capacity_ledger, "lynn") == 0
+
+
+def test_commit_and_release_require_a_reservation(capacity_ledger):
+    reservation_id = capacity_ledger.reserve("lynn")
+    capacity_ledger.commit(reservation_id)
+    with pytest.raises(ValueError):
+        capacity_ledger.commit(reservation_id)
+    with pytest.raises(ValueError):
+        capacity_ledger.release(reservation_id)
+    with pytest.raises(ValueError):
+        capacity_ledger.release(reservation_id + 1)
+    assert get_capacity(capacity_ledger, "lynn") == 2
+
+
+def test_concurrent_reservations_never_oversubscribe(tmp_path):
+    capacity_ledgers = [CapacityLedger(CapacityManager(build_capacities(50))),
+                        SqliteCapacityLedger(str(tmp_path / "ledger.sqlite"), build_capacities(50))]
+    for capacity_ledger in capacity_ledgers:
+        reservation_ids = []
+        barrier = threading.Barrier(8)
+
+        def reserve_slots():
+            barrier.wait()
+            for _ in range(20):
+                reservation_id = capacity_ledger.reserve("lynn")
+                if reservation_id is not None:
+                    reservation_ids.append(reservation_id)
+
+        threads = [threading.Thread(target=reserve_slots) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(reservation_ids) == len(set(reservation_ids)) == 50
+        assert get_capacity(capacity_ledger, "lynn") == 0
+    capacity_ledgers[1].close()
+
+
+def test_sqlite_ledger_persists_across_connections(tmp_path):
+    database_location = str(tmp_path / "ledger.sqlite")
+    capacity_ledger = SqliteCapacityLedger(database_location, build_capacities())
+    committed_id = capacity_ledger.reserve("lynn", "100000000001")
+    reserved_id = capacity_ledger.reserve("riverside", "100000000002")
+    capacity_ledger.commit(committed_id)
+    capacity_ledger.close()
+
+    # The capacity file is only used for the APs missing from the database.
+    capacity_ledger = SqliteCapacityLedger(database_location, build_capacities())
+    assert get_capacity(capacity_ledger, "lynn") == 2
+    assert get_capacity(capacity_ledger, "riverside") == 2
+    assert [entry.action for entry in capacity_ledger.audit_trail] == [RESERVED, RESERVED, COMMITTED]
+    capacity_ledger.release(reserved_id)
+    with pytest.raises(ValueError):
+        capacity_ledger.release(committed_id)
+    assert get_capacity(capacity_ledger, "riverside") == 3
+    capacity_ledger.close()
+
+
+class TakenSlotsLedger(CapacityLedger):
+    """
+    CapacityLedger whose first failed_reservations reservations fail, as if concurrent requests took the slots
+    between the capacity snapshot and the reservation.
+    """
+    def __init__(self, capacity_manager, failed_reservations):
+        super().__init__(capacity_manager)
+        self.failed_reservations = failed_reservations
+        self.reserve_calls = 0
+
+    def reserve(self, ap, medicaid_id=None):
+        self.reserve_calls += 1
+        if self.reserve_calls <= self.failed_reservations:
+            return None
+        return super().reserve(ap, medicaid_id)
+
+
+@pytest.fixture
+def served_zipcode(tmp_path):
+    """
+    :return: Tuple of the ZipcodeManager, the String of a zipcode served by an AP and the String of that AP
+    """
+    workbooks = generate_workbooks(str(tmp_path), row_count=100, seed=0)
+    zipcode = next(zipcode for zipcode in process_zipcodes(workbooks["zipcode"]) if zipcode.all_available_aps)
+    return generate_zipcodes_manager(workbooks["zipcode"]), zipcode.zipcode, zipcode.all_available_aps[0]
+
+
+@pytest.mark.parametrize("failed_reservations, reserved", [(0, True), (2, True), (3, False)])
+def test_assign_retries_a_taken_reservation(served_zipcode, failed_reservations, reserved):
+    zipcode_manager, zipcode, ap = served_zipcode
+    capacity_ledger = TakenSlotsLedger(CapacityManager([Capacity(ap, 3)]), failed_reservations)
+    assignment_service = AssignmentService(zipcode_manager, capacity_ledger, reserve_attempts=3)
+
+    response = assignment_service.assign({"zipcode": zipcode, "affiliates": [{"name": ap, "services": ["accs"]}]},
+                                         reserve=True)
+
+    assert response["reserved"] is reserved
+    assert response["assigned_to"] == (ap if reserved else None)
+    assert (response["reservation_id"] is not None) is reserved
+    assert capacity_ledger.reserve_calls == min(failed_reservations + 1, 3)
+    assert get_capacity(capacity_ledger, ap) == (2 if reserved else 3)
@@ -0,0 +1,141 @@
+import csv
+
+import pytest
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+from AssignmentProgram.AssignmentProcessing import process_members, process_zipcodes, process_capacity, \
+    get_column_indexes, get_record, iter_members, is_empty_member, ZIPCODE_AP_ATTRIBUTES, MEMBER_ATTRIBUTES, \
+    MEMBER_SERVICE_FLAGS, IGNORED_SERVICE_FLAGS
+from AssignmentProgram.Member import Member, Affiliate
+from AssignmentProgram.InputAdapters import ExcelInputAdapter, get_input_format, get_input_adapter, \
+    CsvInputAdapter, PRIORITY_MARKER
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+
+@pytest.fixture(scope="module")
+def workbooks(tmp_path_factory):
+    return generate_workbooks(str(tmp_path_factory.mktemp("workbooks")), row_count=500, seed=0, zipcode_count=50,
+                              multi_row_rate=0.5)
+
+
+def read_text_rows(workbook_location, priority_indexes=None):
+    """
+    Read every row of a workbook, headers included, as text the way it is exported to a flat file.
+    """
+    return [[None if value is None else str(value) for value in row_values]
+            for row_values in ExcelInputAdapter().iter_rows(workbook_location, min_row=1,
+                                                            priority_indexes=priority_indexes)]
+
+
+def write_csv(rows, file_location):
+    with open(file_location, 'w', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+
+def write_parquet(rows, file_location):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    column_count = max(len(row) for row in rows)
+    rows = [row + [None] * (column_count - len(row)) for row in rows[1:]]
+    columns = [[row[index] for row in rows] for index in range(column_count)]
+    pq.write_table(pa.table(columns, names=[get_column_letter(index + 1) for index in range(column_count)]),
+                   file_location)
+
+
+def describe_member(member):
+    return (member.medicaid_id, member.last_name, member.first_name, member.middle_initial, member.date_of_birth,
+            member.residential_address_zipcode_1, member.identification_flag,
+            [(affiliate.affiliate_name, affiliate.service_flags, affiliate.assigned_to)
+             for affiliate in member.affiliates])
+
+
+def describe_zipcode(zipcode):
+    return zipcode.city_town, zipcode.zipcode, zipcode.all_available_aps, zipcode.ap_priority
+
+
+def describe_capacity(capacity):
+    return capacity.ap, capacity.capacity, capacity.capacity_available
+
+
+def get_members_per_cell(member_file_location):
+    """
+    The parsing used before the rows were streamed, looking every record up by its cell name in a fully loaded sheet.
+    """
+    active_sheet = load_workbook(member_file_location).active
+    members = []
+    for row in range(2, active_sheet.max_row + 1):
+        new_obj_member = Member(*[get_record(row, MEMBER_ATTRIBUTES[attribute], active_sheet) for attribute in (
+            'medicaid_id', 'member_last_name', 'member_first_name', 'member_middle_initial', 'member_date_of_birth',
+            'residential_address_zipcode_1', 'identification_flag')])
+        service_flags = 0
+        for service, service_flag in MEMBER_SERVICE_FLAGS.items():
+            if bool(int(get_record(row, MEMBER_ATTRIBUTES[service], active_sheet) or 0)):
+                service_flags |= service_flag
+        new_obj_affiliate = Affiliate(get_record(row, MEMBER_ATTRIBUTES['affiliate'], active_sheet),
+                                      service_flags & ~IGNORED_SERVICE_FLAGS)
+        new_obj_affiliate.assigned_to = get_record(row, MEMBER_ATTRIBUTES['assigned_to'], active_sheet)
+        new_obj_member.add_affiliate(new_obj_affiliate)
+        if not is_empty_member(new_obj_member):
+            members.append(new_obj_member)
+    return members
+
+
+def test_streamed_members_match_the_per_cell_records(workbooks):
+    members = [describe_member(member) for member in iter_members(workbooks["masshealth"])]
+    assert len(members) == 500
+    assert members == [describe_member(member) for member in get_members_per_cell(workbooks["masshealth"])]
+
+
+@pytest.fixture(scope="module", params=["csv", "parquet"])
+def flat_files(request, workbooks, tmp_path_factory):
+    write_file = write_csv if request.param == "csv" else write_parquet
+    directory = tmp_path_factory.mktemp(request.param)
+    priority_indexes = set(get_column_indexes(ZIPCODE_AP_ATTRIBUTES).values())
+    flat_files = {}
+    for name, workbook_location in workbooks.items():
+        flat_files[name] = str(directory / "{0}.{1}".format(name, request.param))
+        write_file(read_text_rows(workbook_location, priority_indexes if name == "zipcode" else None),
+                   flat_files[name])
+    return flat_files
+
+
+def test_flat_files_parse_like_the_excel_workbooks(workbooks, flat_files):
+    excel_zipcodes = [describe_zipcode(zipcode) for zipcode in process_zipcodes(workbooks["zipcode"])]
+    assert any(zipcode[3] for zipcode in excel_zipcodes)
+    assert [describe_zipcode(zipcode) for zipcode in process_zipcodes(flat_files["zipcode"])] == excel_zipcodes
+
+    assert [describe_capacity(capacity) for capacity in process_capacity(flat_files["capacity"])] == \
+        [describe_capacity(capacity) for capacity in process_capacity(workbooks["capacity"])]
+
+    excel_members = [describe_member(member) for member in process_members(workbooks["masshealth"])]
+    assert any(len(member[-1]) > 1 for member in excel_members)
+    assert [describe_member(member) for member in process_members(flat_files["masshealth"])] == excel_members
+
+
+def test_csv_priority_marker_and_blank_cells(tmp_path):
+    zipcode_location = str(tmp_path / "zipcodes.csv")
+    write_csv([["City/Town", "Zipcode", "Lynn", "Nsmha", "Edinburg"],
+               ["Lynn", "1902", "Lynn", "NSMHA" + PRIORITY_MARKER, ""],
+               ["Salem", "01970", "", " ", "Edinburg"]], zipcode_location)
+
+    assert list(CsvInputAdapter().iter_rows(zipcode_location))[1] == ("Salem", "01970", None, " ", "Edinburg")
+
+    zipcodes = process_zipcodes(zipcode_location)
+    assert [describe_zipcode(zipcode) for zipcode in zipcodes] == [
+        ("lynn", "01902", ("nsmha", "lynn"), "nsmha"),
+        ("salem", "01970", ("edinburg",), None)
+    ]
+
+
+def test_input_format_detection():
+    assert get_input_format("members.XLSX") == "excel"
+    assert get_input_format("members.csv") == "csv"
+    assert get_input_format("members.pq") == "parquet"
+    assert get_input_format("members.txt", "csv") == "csv"
+    assert isinstance(get_input_adapter("members.csv"), CsvInputAdapter)
+
+    with pytest.raises(ValueError, match="Unable to determine the input format"):
+        get_input_format("members.txt")
+    with pytest.raises(ValueError, match="Unknown input format: xml"):
+        get_input_format("members.csv", "xml")
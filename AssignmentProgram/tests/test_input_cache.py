@@ -0,0 +1,120 @@
+import os
+
+import pytest
+
+from AssignmentProgram.InputCache import ParsedInputCache, CACHE_FILE_EXTENSION
+
+parsed_locations = []
+
+
+def parse_content(file_location, input_format=None):
+    parsed_locations.append(file_location)
+    with open(file_location) as f:
+        return [f.read()] * 100
+
+
+def parse_unpicklable(file_location, input_format=None):
+    parsed_locations.append(file_location)
+    return [lambda: file_location]
+
+
+@pytest.fixture(autouse=True)
+def clear_parsed_locations():
+    del parsed_locations[:]
+
+
+@pytest.fixture
+def input_locations(tmp_path):
+    input_locations = []
+    for name in ("a", "b", "c"):
+        input_location = tmp_path / "{0}.csv".format(name)
+        input_location.write_text("{0},1\n".format(name))
+        input_locations.append(str(input_location))
+    return input_locations
+
+
+def get_cache_entries(cache_directory):
+    return sorted(file_name for file_name in os.listdir(cache_directory) if file_name.endswith(CACHE_FILE_EXTENSION))
+
+
+def test_cache_hits_until_the_file_content_changes(tmp_path, input_locations):
+    input_cache = ParsedInputCache(str(tmp_path / "cache"))
+    input_location = input_locations[0]
+
+    assert input_cache.load(input_location, parse_content) == ["a,1\n"] * 100
+    assert input_cache.load(input_location, parse_content) == ["a,1\n"] * 100
+    assert (input_cache.hits, input_cache.misses) == (1, 1)
+    assert parsed_locations == [input_location]
+
+    with open(input_location, 'w') as f:
+        f.write("a,2\n")
+    assert input_cache.load(input_location, parse_content) == ["a,2\n"] * 100
+    assert (input_cache.hits, input_cache.misses) == (1, 2)
+    assert len(get_cache_entries(input_cache.cache_directory)) == 2
+
+    # The parser version is part of the key.
+    assert ParsedInputCache(str(tmp_path / "cache"), parser_version=2).load(input_location, parse_content)
+    assert parsed_locations == [input_location] * 3
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, input_locations):
+    cache_directory = str(tmp_path / "cache")
+    input_cache = ParsedInputCache(cache_directory)
+    first_location, second_location, third_location = input_locations
+    input_cache.load(first_location, parse_content)
+    input_cache.load(second_location, parse_content)
+    first_entry, second_entry = (input_cache.get_cache_location(input_cache.get_key(input_location, parse_content))
+                                 for input_location in (first_location, second_location))
+    os.utime(first_entry, (1, 1))
+    os.utime(second_entry, (2, 2))
+
+    # Room for two entries, the first one is used again so the second one is the least recently used.
+    input_cache.max_size_bytes = os.path.getsize(first_entry) * 5 // 2
+    input_cache.load(first_location, parse_content)
+    input_cache.load(third_location, parse_content)
+
+    assert os.path.exists(first_entry)
+    assert not os.path.exists(second_entry)
+    assert len(get_cache_entries(cache_directory)) == 2
+    input_cache.load(second_location, parse_content)
+    assert parsed_locations == [first_location, second_location, third_location, second_location]
+
+
+def test_rebuild_parses_again_and_replaces_the_entry(tmp_path, input_locations):
+    cache_directory = str(tmp_path / "cache")
+    input_location = input_locations[0]
+    ParsedInputCache(cache_directory).load(input_location, parse_content)
+
+    input_cache = ParsedInputCache(cache_directory, rebuild=True)
+    input_cache.load(input_location, parse_content)
+    input_cache.load(input_location, parse_content)
+
+    assert (input_cache.hits, input_cache.misses) == (0, 2)
+    assert parsed_locations == [input_location] * 3
+    assert len(get_cache_entries(cache_directory)) == 1
+
+
+def test_corrupt_entry_is_parsed_again(tmp_path, input_locations):
+    input_cache = ParsedInputCache(str(tmp_path / "cache"))
+    input_location = input_locations[0]
+    input_cache.load(input_location, parse_content)
+    cache_location = input_cache.get_cache_location(input_cache.get_key(input_location, parse_content))
+    with open(cache_location, 'wb') as f:
+        f.write(b"not a pickle")
+
+    assert input_cache.load(input_location, parse_content) == ["a,1\n"] * 100
+    assert input_cache.load(input_location, parse_content) == ["a,1\n"] * 100
+    assert (input_cache.hits, input_cache.misses) == (1, 2)
+
+
+def test_unpicklable_objects_are_returned_without_being_cached(tmp_path, input_locations):
+    cache_directory = str(tmp_path / "cache")
+    input_cache = ParsedInputCache(cache_directory)
+    input_location = input_locations[0]
+
+    parsed_objects = input_cache.load(input_location, parse_unpicklable)
+    assert parsed_objects[0]() == input_location
+    input_cache.load(input_location, parse_unpicklable)
+
+    assert parsed_locations == [input_location] * 2
+    assert os.listdir(cache_directory) == []
@@ -0,0 +1,52 @@
+import json
+
+from AssignmentProgram.assignments import process_all
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+from AssignmentProgram.Instrumentation import RunReport
+
+
+def test_run_report_records_stage_counters(tmp_path):
+    run_report = RunReport()
+    with run_report.stage('parse') as stage:
+        stage.count('rows', 3)
+        stage.count('members', 2)
+    with run_report.stage('assign') as stage:
+        stage.count('members', 2)
+
+    assert [metrics.name for metrics in run_report.stages] == ['parse', 'assign']
+    assert run_report.get_stage('parse').counters == {'rows': 3, 'members': 2}
+    assert run_report.get_stage('missing') is None
+    assert all(metrics.wall_time >= 0 and metrics.cpu_time >= 0 for metrics in run_report.stages)
+
+    summary_lines = run_report.summary_lines()
+    assert summary_lines[0].startswith('parse') and summary_lines[0].endswith('rows=3, members=2')
+    assert summary_lines[-1].startswith('total')
+
+    report_location = str(tmp_path / "report.json")
+    run_report.write_json(report_location)
+    with open(report_location) as f:
+        report = json.load(f)
+    assert [stage['counters'] for stage in report['stages']] == [{'rows': 3, 'members': 2}, {'members': 2}]
+    assert report['rules'] is None
+
+
+def test_rule_profile_counts_every_rule_evaluation(tmp_path):
+    workbooks = generate_workbooks(str(tmp_path / "workbooks"), row_count=300, seed=0, capacity_ratio=0.5)
+    run_report = process_all(workbooks["zipcode"], workbooks["capacity"], workbooks["masshealth"], profile_rules=True,
+                             output_location=str(tmp_path / "assignments.csv"))
+    rule_profiles = run_report.rule_profiler.rule_profiles
+    process_rules_counters = run_report.get_stage('process_rules').counters
+    stats_counters = run_report.get_stage('generate_stats').counters
+
+    assert sum(rule_profile.invocations for rule_profile in rule_profiles.values()) == \
+        process_rules_counters['rule_evaluations']
+    assert sum(sum(rule_profile.exceptions.values()) for rule_profile in rule_profiles.values()) == \
+        process_rules_counters['rule_exceptions']
+    # Every member ends the cascade on a match or on FailedAssignmentRule, which never counts as a match.
+    failed_profile = rule_profiles['FailedAssignmentRule']
+    assert failed_profile.matches == 0
+    assert failed_profile.invocations == failed_profile.exceptions['AssignmentError'] > 0
+    assert sum(rule_profile.matches for rule_profile in rule_profiles.values()) + failed_profile.invocations == \
+        process_rules_counters['members']
+    assert failed_profile.invocations <= stats_counters['unassigned_members']
+    assert run_report.to_dict()['rules']['FailedAssignmentRule']['matches'] == 0
@@ -0,0 +1,120 @@
+import shutil
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from AssignmentProgram.AssignmentProcessing import get_members_by_medicaid_id, update_masshealth_assignments, \
+    process_members, process_sheet_members
+from AssignmentProgram.Member import Member, Affiliate
+from AssignmentProgram.assignments import process_all
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+# Medicaid ID of every MassHealth row, None for a blank row and an ID without a member for a row that is not matched.
+ROW_MEDICAID_IDS = ["100000000001", "100000000002", "100000000001", None, "100000000003", "100000000009",
+                    "100000000002", "100000000004", "100000000001", "100000000004"]
+
+
+def build_members():
+    """
+    Build the members of the rows, 100000000004 is shared by two members with different names.
+    """
+    all_members = []
+    for medicaid_id, last_name, assigned_to in [("100000000001", "smith", "lynn"), ("100000000002", "jones", None),
+                                                ("100000000003", "lee", "riverside"), ("100000000004", "smith", None),
+                                                ("100000000004", "jones", "nsmha")]:
+        member = Member(medicaid_id, last_name, "ann", None, None, "01902", None)
+        member.add_affiliate(Affiliate("lynn"))
+        if assigned_to:
+            member.assign_first_affiliate(assigned_to)
+        all_members.append(member)
+    return all_members
+
+
+@pytest.fixture
+def masshealth_location(tmp_path):
+    workbook = Workbook()
+    active_sheet = workbook.active
+    active_sheet["A1"] = "Medicaid ID"
+    for row, medicaid_id in enumerate(ROW_MEDICAID_IDS, start=2):
+        active_sheet["A{0}".format(row)] = medicaid_id
+    masshealth_location = str(tmp_path / "masshealth.xlsx")
+    workbook.save(masshealth_location)
+    return masshealth_location
+
+
+def update_masshealth_assignments_linearly(all_members, masshealth_location, mark_duplicates):
+    """
+    Write the assignments by comparing every row with every member, as was done before the members were grouped by
+    medicaid ID.
+    """
+    workbook = load_workbook(masshealth_location)
+    active_sheet = workbook.active
+    for row in range(2, active_sheet.max_row + 1):
+        medicaid_id = active_sheet["A{0}".format(row)].value
+        assigned_to_cell = active_sheet["BI{0}".format(row)]
+        if medicaid_id:
+            for member in all_members:
+                if member.medicaid_id == medicaid_id:
+                    if not member.assignment_written:
+                        assigned_to_cell.value = member.get_assigned_affiliate() or ""
+                        member.assignment_written = True
+                    elif mark_duplicates:
+                        assigned_to_cell.value = "DUPLICATE"
+    workbook.save(masshealth_location)
+
+
+def read_assigned_to(masshealth_location):
+    active_sheet = load_workbook(masshealth_location).active
+    return [active_sheet["BI{0}".format(row)].value or None for row in range(2, len(ROW_MEDICAID_IDS) + 2)]
+
+
+def test_members_are_grouped_by_medicaid_id_in_order():
+    all_members = build_members()
+    members_by_medicaid_id = get_members_by_medicaid_id(all_members)
+
+    assert members_by_medicaid_id["100000000004"] == all_members[3:]
+    for medicaid_id, members in members_by_medicaid_id.items():
+        assert members == [member for member in all_members if member.medicaid_id == medicaid_id]
+
+
+@pytest.mark.parametrize("mark_duplicates", [False, True])
+def test_assignments_written_match_the_linear_scan(masshealth_location, tmp_path, mark_duplicates):
+    linear_location = str(tmp_path / "linear.xlsx")
+    load_workbook(masshealth_location).save(linear_location)
+
+    update_masshealth_assignments(build_members(), masshealth_location, mark_duplicates)
+    update_masshealth_assignments_linearly(build_members(), linear_location, mark_duplicates)
+
+    assigned_to = read_assigned_to(masshealth_location)
+    assert "lynn" in assigned_to
+    assert ("DUPLICATE" in assigned_to) is mark_duplicates
+    assert assigned_to == read_assigned_to(linear_location)
+
+
+def read_workbook_assigned_to(masshealth_location):
+    active_sheet = load_workbook(masshealth_location, read_only=True).active
+    return [row[60] or None for row in active_sheet.iter_rows(min_row=2, values_only=True)]
+
+
+def test_source_rows_are_only_recorded_for_the_single_pass_writeback(masshealth_location):
+    assert all(member.source_rows is None for member in process_members(masshealth_location))
+
+    all_members = process_sheet_members(load_workbook(masshealth_location).active)
+    assert [member.source_rows for member in all_members][:3] == [[2, 4, 10], [3, 8], [6]]
+
+
+@pytest.mark.parametrize("mark_duplicates", [False, True])
+def test_single_pass_writes_the_same_assignments_as_the_in_place_writeback(tmp_path, mark_duplicates):
+    workbooks = generate_workbooks(str(tmp_path / "workbooks"), row_count=1000, seed=0, multi_row_rate=0.5,
+                                   capacity_ratio=0.5)
+    assigned_to = {}
+    for single_pass in (False, True):
+        masshealth_location = str(tmp_path / "masshealth_{0}.xlsx".format(single_pass))
+        shutil.copyfile(workbooks["masshealth"], masshealth_location)
+        process_all(workbooks["zipcode"], workbooks["capacity"], masshealth_location, mark_duplicates=mark_duplicates,
+                    single_pass=single_pass)
+        assigned_to[single_pass] = read_workbook_assigned_to(masshealth_location)
+
+    assert any(assigned_to[False])
+    assert ("DUPLICATE" in assigned_to[False]) is mark_duplicates
+    assert assigned_to[True] == assigned_to[False]
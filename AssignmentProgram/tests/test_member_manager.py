@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from AssignmentProgram.AssignmentProcessing import member_exists, get_existing_member, \
+    member_has_different_medicaid_id, update_member_affiliates
+from AssignmentProgram.Member import Member, Affiliate, MemberManager
+
+
+@pytest.fixture
+def row_members():
+    """
+    One Member per MassHealth row, the way they are parsed before being merged.  Many members span several rows and
+    share their name and date of birth with a member of another medicaid ID.
+    """
+    generator = random.Random(0)
+    identities = []
+    for index in range(200):
+        if identities and generator.random() < 0.2:
+            _, last_name, first_name, middle_initial, date_of_birth = generator.choice(identities)
+        else:
+            last_name, first_name = generator.choice(["smith", "jones", "lee"]), generator.choice(["ann", "bob"])
+            middle_initial = generator.choice([None, "a", "b"])
+            date_of_birth = "19{0:02d}-01-01".format(generator.randrange(100))
+        identities.append(("1{0:011d}".format(index), last_name, first_name, middle_initial, date_of_birth))
+
+    row_members = []
+    for _ in range(600):
+        member = Member(*generator.choice(identities), "01902", None)
+        member.add_affiliate(Affiliate(generator.choice([None, "lynn", "riverside", "nsmha"])))
+        row_members.append(member)
+    return row_members
+
+
+def describe_member(member):
+    return MemberManager.identity_key(member), [affiliate.affiliate_name for affiliate in member.affiliates]
+
+
+def merge_members_linearly(row_members):
+    """
+    Merge the rows with the list scans used before the members were indexed.
+    """
+    all_members = []
+    for new_member in row_members:
+        if member_exists(all_members, new_member):
+            update_member_affiliates(all_members, new_member)
+        else:
+            all_members.append(new_member)
+    return all_members
+
+
+def test_merged_members_match_the_linear_scan(row_members):
+    member_manager = MemberManager()
+    for new_member in row_members:
+        member_manager.merge_member(new_member)
+    linear_members = merge_members_linearly(row_members)
+
+    assert len(member_manager) < len(row_members)
+    assert [describe_member(member) for member in member_manager.members] == \
+        [describe_member(member) for member in linear_members]
+
+
+def test_member_lookups_match_the_linear_scan(row_members):
+    member_manager = MemberManager()
+    for new_member in row_members[:300]:
+        member_manager.merge_member(new_member)
+    linear_members = merge_members_linearly(row_members[:300])
+
+    members_found = members_with_different_id = 0
+    for new_member in row_members:
+        exists = member_exists(member_manager, new_member)
+        assert exists is member_exists(linear_members, new_member)
+        existing_member = get_existing_member(member_manager, new_member)
+        assert (existing_member is None) is not exists
+        if exists:
+            assert describe_member(existing_member) == \
+                describe_member(get_existing_member(linear_members, new_member))
+        indexed_matches = member_has_different_medicaid_id(member_manager, new_member)
+        assert [describe_member(member) for member in indexed_matches] == \
+            [describe_member(member) for member in member_has_different_medicaid_id(linear_members, new_member)]
+        members_found += exists
+        members_with_different_id += bool(indexed_matches)
+    assert 0 < members_found < len(row_members)
+    assert members_with_different_id
@@ -0,0 +1,81 @@
+import csv
+import json
+import shutil
+
+import pytest
+from openpyxl import load_workbook
+
+from AssignmentProgram.AssignmentProcessing import generate_zipcodes_manager, generate_capacities_manager, \
+    generate_members, process_rules, update_masshealth_assignments, write_assignment_records
+from AssignmentProgram.OutputSinks import ExcelAssignmentSink, CsvAssignmentSink, JsonlAssignmentSink, \
+    get_output_sink
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+
+@pytest.fixture(scope="module")
+def workbooks(tmp_path_factory):
+    return generate_workbooks(str(tmp_path_factory.mktemp("workbooks")), row_count=500, seed=0, multi_row_rate=0.5,
+                              capacity_ratio=0.5)
+
+
+def generate_assigned_members(workbooks):
+    all_members = generate_members(workbooks["masshealth"])
+    process_rules(all_members, generate_capacities_manager(workbooks["capacity"]),
+                  generate_zipcodes_manager(workbooks["zipcode"]))
+    return all_members
+
+
+def read_excel_records(output_location):
+    active_sheet = load_workbook(output_location, read_only=True).active
+    return [tuple(row_values) for row_values in active_sheet.iter_rows(min_row=2, values_only=True)]
+
+
+def read_csv_records(output_location):
+    with open(output_location, newline='') as f:
+        return [(int(row), medicaid_id, assigned_to, duplicate == "True")
+                for row, medicaid_id, assigned_to, duplicate in list(csv.reader(f))[1:]]
+
+
+def read_jsonl_records(output_location):
+    with open(output_location) as f:
+        return [(record["row"], record["medicaid_id"], record["assigned_to"], record["duplicate"])
+                for record in map(json.loads, f)]
+
+
+RECORD_READERS = {
+    ".xlsx": read_excel_records,
+    ".csv": read_csv_records,
+    ".jsonl": read_jsonl_records
+}
+
+
+def test_output_sink_is_chosen_by_extension():
+    assert isinstance(get_output_sink("assignments.xlsx"), ExcelAssignmentSink)
+    assert isinstance(get_output_sink("assignments.CSV"), CsvAssignmentSink)
+    assert isinstance(get_output_sink("assignments.jsonl"), JsonlAssignmentSink)
+    assert get_output_sink("assignments.csv").output_location == "assignments.csv"
+
+    with pytest.raises(ValueError, match="Unable to determine the output format"):
+        get_output_sink("assignments.json")
+
+
+@pytest.mark.parametrize("extension", sorted(RECORD_READERS))
+def test_records_match_the_in_place_writeback(workbooks, tmp_path, extension):
+    masshealth_location = str(tmp_path / "masshealth.xlsx")
+    shutil.copyfile(workbooks["masshealth"], masshealth_location)
+    rows_matched = update_masshealth_assignments(generate_assigned_members(workbooks), masshealth_location, True)
+    active_sheet = load_workbook(masshealth_location, read_only=True).active
+    assigned_to_by_row = {row: row_values[60] or None
+                          for row, row_values in enumerate(active_sheet.iter_rows(min_row=2, values_only=True), 2)}
+
+    output_location = str(tmp_path / "assignments{0}".format(extension))
+    assert write_assignment_records(generate_assigned_members(workbooks), workbooks["masshealth"],
+                                    output_location) == rows_matched
+    records = RECORD_READERS[extension](output_location)
+
+    assert len(records) == rows_matched
+    assert any(duplicate for _, _, _, duplicate in records)
+    written_by_row = {row: "DUPLICATE" if duplicate else assigned_to or None
+                      for row, _, assigned_to, duplicate in records}
+    assert written_by_row == {row: assigned_to_by_row[row] for row in written_by_row}
+    assert not any(assigned_to for row, assigned_to in assigned_to_by_row.items() if row not in written_by_row)
@@ -0,0 +1,64 @@
+import logging
+import os
+import shutil
+
+from openpyxl import load_workbook
+
+from AssignmentProgram.AssignmentProcessing import generate_members, generate_zipcodes_manager, iter_members_candidates
+from AssignmentProgram.assignments import process_all
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+
+def read_assigned_to(masshealth_location):
+    active_sheet = load_workbook(masshealth_location, read_only=True).active
+    return [row[60] or None for row in active_sheet.iter_rows(min_row=2, values_only=True)]
+
+
+def test_workers_write_the_same_assignments_as_a_sequential_run(tmp_path):
+    # A low capacity makes the result depend on the order the capacity is consumed in.
+    workbooks = generate_workbooks(str(tmp_path / "workbooks"), row_count=2500, seed=0, capacity_ratio=0.5)
+    assignments = {}
+    rule_profiles = {}
+    for workers in (1, 2):
+        masshealth_location = str(tmp_path / "masshealth_{0}.xlsx".format(workers))
+        shutil.copyfile(workbooks["masshealth"], masshealth_location)
+        run_report = process_all(workbooks["zipcode"], workbooks["capacity"], masshealth_location,
+                                 mark_duplicates=True, profile_rules=True, workers=workers)
+        assignments[workers] = read_assigned_to(masshealth_location)
+        rule_profiles[workers] = {rule_name: (rule_profile.invocations, rule_profile.matches)
+                                  for rule_name, rule_profile in run_report.rule_profiler.rule_profiles.items()}
+
+    assert any(assignments[1])
+    assert assignments[2] == assignments[1]
+    assert rule_profiles[2] == rule_profiles[1]
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_worker_log_records_reach_the_parent_handlers(tmp_path):
+    workbooks = generate_workbooks(str(tmp_path / "workbooks"), row_count=200, seed=0)
+    all_members = generate_members(workbooks["masshealth"])
+    zipcode_manager = generate_zipcodes_manager(workbooks["zipcode"])
+    root_logger = logging.getLogger()
+    root_level = root_logger.level
+    recording_handler = RecordingHandler()
+    logging.disable(logging.NOTSET)
+    root_logger.addHandler(recording_handler)
+    root_logger.setLevel(logging.DEBUG)
+    try:
+        assert len(list(iter_members_candidates(all_members, zipcode_manager, workers=2, chunk_size=50))) == \
+            len(all_members)
+    finally:
+        root_logger.removeHandler(recording_handler)
+        root_logger.setLevel(root_level)
+
+    worker_records = [record for record in recording_handler.records if record.process != os.getpid()]
+    assert worker_records
+    assert all(record.getMessage().startswith("Rule ") for record in worker_records)
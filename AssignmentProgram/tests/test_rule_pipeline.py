@@ -0,0 +1,62 @@
+import pytest
+
+from AssignmentProgram.AssignmentProcessing import generate_zipcodes_manager, generate_capacities_manager, \
+    generate_members, build_rule_pipeline
+from AssignmentProgram.Rule import RuleProcessing, ClientZipcodeInAPServiceAreaRule, \
+    CurrentACCSclientAPorganizationRule, SetACCSRule, CurrentPCPClientAPOrganizationRule, \
+    FormerCBFSWithoutTransitionACCSRule, ClientOfBehavioralServiceAPRule, ClientOfLTSSatAPRule, \
+    ClientNoPriorHistoryZipcodeCapacityMatchRule, FailedAssignmentRule
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+
+@pytest.fixture(scope="module")
+def workbooks(tmp_path_factory):
+    # A low capacity makes later members depend on the capacity consumed by the earlier ones.
+    return generate_workbooks(str(tmp_path_factory.mktemp("workbooks")), row_count=1000, seed=0, capacity_ratio=0.4)
+
+
+def describe_assignment(member, rule_exceptions):
+    return member.medicaid_id, member.get_assigned_affiliate(), [
+        (rule_exception.rule.__class__.__name__, rule_exception.assignment_error_type.__class__.__name__,
+         rule_exception.exception_message) for rule_exception in rule_exceptions]
+
+
+def process_rules_per_member(all_members, capacity_manager, zipcode_manager):
+    """
+    Apply the rules the way process_rules did before the pipeline, with a RuleProcessing and new rules per member.
+    """
+    assignments = []
+    for member in all_members:
+        rp = RuleProcessing(member, capacity_manager, zipcode_manager)
+        rp.assign_rule(ClientZipcodeInAPServiceAreaRule())
+        rp.assign_rule(CurrentACCSclientAPorganizationRule())
+        rp.assign_rule(SetACCSRule())
+        rp.assign_rule(CurrentPCPClientAPOrganizationRule())
+        rp.assign_rule(FormerCBFSWithoutTransitionACCSRule())
+        rp.assign_rule(ClientOfBehavioralServiceAPRule())
+        rp.assign_rule(ClientOfLTSSatAPRule())
+        rp.assign_rule(ClientNoPriorHistoryZipcodeCapacityMatchRule())
+        rp.assign_rule(FailedAssignmentRule())
+        rp.process()
+        assignments.append(describe_assignment(member, rp.member_rule_exceptions))
+    return assignments
+
+
+def test_pipeline_matches_rule_processing_per_member(workbooks):
+    zipcode_manager = generate_zipcodes_manager(workbooks["zipcode"])
+    processing_capacities = generate_capacities_manager(workbooks["capacity"])
+    pipeline_capacities = generate_capacities_manager(workbooks["capacity"])
+
+    expected_assignments = process_rules_per_member(generate_members(workbooks["masshealth"]), processing_capacities,
+                                                    zipcode_manager)
+    rule_pipeline = build_rule_pipeline(pipeline_capacities, zipcode_manager)
+    assignments = [describe_assignment(member, rule_pipeline.process(member))
+                   for member in generate_members(workbooks["masshealth"])]
+
+    assert any(assigned_to for _, assigned_to, _ in assignments)
+    assert any(not assigned_to for _, assigned_to, _ in assignments)
+    assert assignments == expected_assignments
+    assert [capacity.capacity for capacity in pipeline_capacities.capacities] == \
+        [capacity.capacity for capacity in processing_capacities.capacities]
+    assert rule_pipeline.members_processed == len(assignments)
+    assert rule_pipeline.rule_exceptions == sum(len(rule_exceptions) for _, _, rule_exceptions in assignments)
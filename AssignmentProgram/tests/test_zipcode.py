@@ -0,0 +1,46 @@
+import pickle
+
+from AssignmentProgram.AssignmentProcessing import process_zipcodes
+from AssignmentProgram.Zipcode import Zipcode, ZipcodeManager
+from AssignmentProgram.benchmarks.workbook_generator import generate_workbooks
+
+
+def get_affiliates_linearly(zipcode_objects, requested_zipcode):
+    """
+    The lookup used before the aps were resolved by ZipcodeManager, scanning the zipcodes and moving the priority ap
+    to the front of the aps in column order.
+    """
+    for zipcode_object in zipcode_objects:
+        if zipcode_object.zipcode == requested_zipcode:
+            all_available_aps = [ap for ap in (zipcode_object.ap_lynn, zipcode_object.ap_nsmha,
+                                               zipcode_object.ap_edinburg, zipcode_object.ap_riverside,
+                                               zipcode_object.ap_uphams, zipcode_object.ap_dimock,
+                                               zipcode_object.ap_brookline) if ap]
+            if zipcode_object.ap_priority:
+                all_available_aps.insert(0, all_available_aps.pop(all_available_aps.index(zipcode_object.ap_priority)))
+            return all_available_aps
+    return []
+
+
+def test_affiliates_match_the_linear_lookup(tmp_path):
+    workbooks = generate_workbooks(str(tmp_path), row_count=10, seed=0, zipcode_count=200)
+    zipcode_objects = process_zipcodes(workbooks["zipcode"])
+    # A second row for a zipcode is ignored, as the linear lookup stopped at the first one.
+    duplicate_zipcode = Zipcode("salem", zipcode_objects[0].zipcode)
+    duplicate_zipcode.ap_dimock = {"record": ("dimock", True)}
+    zipcode_objects.append(duplicate_zipcode)
+    zipcode_manager = ZipcodeManager(zipcode_objects)
+
+    assert any(zipcode_object.ap_priority for zipcode_object in zipcode_objects)
+    for requested_zipcode in [zipcode_object.zipcode for zipcode_object in zipcode_objects] + ["99999"]:
+        affiliates = zipcode_manager.get_affiliates_from_zipcode(requested_zipcode)
+        assert isinstance(affiliates, tuple)
+        assert list(affiliates) == get_affiliates_linearly(zipcode_objects, requested_zipcode)
+        # Looking the aps up again never reorders them.
+        assert zipcode_manager.get_affiliates_from_zipcode(requested_zipcode) == affiliates
+        assert zipcode_manager.contains_zipcode(requested_zipcode) is (requested_zipcode != "99999")
+
+    unpickled_manager = pickle.loads(pickle.dumps(zipcode_manager))
+    assert [unpickled_manager.get_affiliates_from_zipcode(zipcode_object.zipcode) for zipcode_object in
+            zipcode_objects] == [zipcode_manager.get_affiliates_from_zipcode(zipcode_object.zipcode) for
+                                 zipcode_object in zipcode_objects]